@@ -0,0 +1,322 @@
+# alerts.py - tail한 로그 객체의 슬라이딩 윈도 집계(링 버퍼)와 임계값/변화율 알림
+import argparse
+import calendar
+import json
+import os
+import sys
+import time
+from array import array
+from collections import OrderedDict
+
+from log_parser import parse_requestdatetime
+
+# 슬롯 길이(초)와 슬롯 수: 5초 x 144 = 12분 (알림 윈도 + 변화율 기준 구간)
+DEFAULT_SLOT_SECONDS = 5
+DEFAULT_SLOTS = 144
+# 추적하는 시계열 최대 수 (넘으면 가장 오래 갱신되지 않은 시계열 제거)
+DEFAULT_MAX_SERIES = 10000
+
+# 시계열 범위: 버킷, 버킷/키 접두사(첫 '/'까지), 요청자, 오류 코드
+SCOPES = ('bucket', 'prefix', 'requester', 'errorcode')
+
+# 윈도 집계 값: rate(초당 요청), 4xx_ratio, 5xx_ratio, errors(4xx + 5xx 수), bytes_rate(초당 전송 바이트)
+METRICS = ('requests', 'rate', '4xx_ratio', '5xx_ratio', 'errors', 'bytes_sent', 'bytes_rate')
+
+# 기본 알림 규칙
+# threshold: window초 값이 threshold 초과 / change: window초 값이 이전 baseline초 평균의 change배 초과
+DEFAULT_RULES = [
+    {'name': 'High 5xx ratio', 'scope': 'bucket', 'metric': '5xx_ratio', 'threshold': 0.05,
+     'window': 60, 'min_requests': 50},
+    {'name': 'High 4xx ratio', 'scope': 'prefix', 'metric': '4xx_ratio', 'threshold': 0.25,
+     'window': 60, 'min_requests': 100},
+    {'name': 'Request spike', 'scope': 'bucket', 'metric': 'rate', 'change': 3.0,
+     'window': 60, 'baseline': 600, 'min_requests': 100},
+    {'name': 'Requester spike', 'scope': 'requester', 'metric': 'rate', 'change': 5.0,
+     'window': 60, 'baseline': 600, 'min_requests': 200},
+    {'name': 'Error code burst', 'scope': 'errorcode', 'metric': 'errors', 'change': 4.0,
+     'window': 60, 'baseline': 600, 'min_requests': 20},
+    {'name': 'Egress spike', 'scope': 'bucket', 'metric': 'bytes_rate', 'change': 4.0,
+     'window': 60, 'baseline': 600, 'min_requests': 100},
+]
+
+
+class SlidingWindow:
+    """고정 크기 링 버퍼 슬롯별 요청/4xx/5xx/전송 바이트 카운터 (시계열 하나)
+
+    슬롯 수가 고정이므로 시계열당 메모리가 일정하고, 오래된 슬롯은 다시 쓰일 때 초기화됩니다.
+    카운터는 array('q')라 슬롯당 8바이트이며 int 객체를 따로 만들지 않습니다.
+    """
+
+    __slots__ = ('slot_seconds', 'first_slot', 'epochs', 'requests', 'client_errors', 'server_errors',
+                 'bytes_sent')
+
+    def __init__(self, slots=DEFAULT_SLOTS, slot_seconds=DEFAULT_SLOT_SECONDS):
+        self.slot_seconds = slot_seconds
+        # 처음 관측한 슬롯 (변화율 기준 구간이 다 찼는지 판단)
+        self.first_slot = None
+        self.epochs = array('q', [-1]) * slots
+        self.requests = array('q', [0]) * slots
+        self.client_errors = array('q', [0]) * slots
+        self.server_errors = array('q', [0]) * slots
+        self.bytes_sent = array('q', [0]) * slots
+
+    def add(self, slot, requests, client_errors=0, server_errors=0, bytes_sent=0):
+        """slot(= 시각 // slot_seconds) 위치에 누적 (링 범위보다 오래된 슬롯은 무시)"""
+        index = slot % len(self.epochs)
+        epoch = self.epochs[index]
+        if epoch > slot:
+            return False
+        # 받아들인 샘플만 기준 구간 시작으로 인정 (버린 오래된 샘플로 앞당기지 않음)
+        if self.first_slot is None or slot < self.first_slot:
+            self.first_slot = slot
+        if epoch != slot:
+            self.epochs[index] = slot
+            self.requests[index] = requests
+            self.client_errors[index] = client_errors
+            self.server_errors[index] = server_errors
+            self.bytes_sent[index] = bytes_sent
+            return True
+        self.requests[index] += requests
+        self.client_errors[index] += client_errors
+        self.server_errors[index] += server_errors
+        self.bytes_sent[index] += bytes_sent
+        return True
+
+    def totals(self, first_slot, last_slot):
+        """[first_slot, last_slot] 슬롯 합계 (요청, 4xx, 5xx, 전송 바이트)"""
+        requests = client_errors = server_errors = bytes_sent = 0
+        for index, epoch in enumerate(self.epochs):
+            if first_slot <= epoch <= last_slot:
+                requests += self.requests[index]
+                client_errors += self.client_errors[index]
+                server_errors += self.server_errors[index]
+                bytes_sent += self.bytes_sent[index]
+        return requests, client_errors, server_errors, bytes_sent
+
+    def stats(self, last_slot, slots):
+        """last_slot에서 끝나는 slots개 슬롯의 집계 값 dict"""
+        requests, client_errors, server_errors, bytes_sent = self.totals(last_slot - slots + 1, last_slot)
+        seconds = slots * self.slot_seconds
+        return {
+            'requests': requests,
+            'rate': requests / seconds,
+            '4xx_ratio': client_errors / requests if requests else 0.0,
+            '5xx_ratio': server_errors / requests if requests else 0.0,
+            'errors': client_errors + server_errors,
+            'bytes_sent': bytes_sent,
+            'bytes_rate': bytes_sent / seconds,
+        }
+
+
+def key_prefix(bucket_name, key):
+    """'bucket', 'images/2024/a.png' -> 'bucket/images/' (접두사 없는 키는 'bucket/')"""
+    cut = key.find('/') + 1 if key else 0
+    return f"{bucket_name}/{key[:cut]}"
+
+
+class AlertEngine:
+    """로그 배치를 시계열별 슬라이딩 윈도에 누적하고 규칙을 평가하는 알림 엔진
+
+    시간은 로그의 requestdatetime(이벤트 시각) 기준이며, 지금까지 본 가장 늦은 시각이
+    평가 시점입니다. 새 객체를 처리할 때마다 evaluate()를 호출하면 갱신된 시계열만 평가합니다.
+    """
+
+    def __init__(self, rules=None, slots=DEFAULT_SLOTS, slot_seconds=DEFAULT_SLOT_SECONDS,
+                 max_series=DEFAULT_MAX_SERIES, cooldown=300):
+        self.rules = rules or DEFAULT_RULES
+        self.slots = slots
+        self.slot_seconds = slot_seconds
+        self.max_series = max_series
+        self.cooldown = cooldown
+        # (범위, 이름) -> SlidingWindow (LRU 순서)
+        self.series = OrderedDict()
+        self.evicted = 0
+        self.rows = 0
+        self.watermark = None
+        # (규칙 이름, 범위, 이름) -> 발생 시각 (해소될 때까지 유지)
+        self.active = {}
+        self._last_fired = {}
+        self._dirty = set()
+        self._slot_cache = {}
+        needed = max(rule.get('window', 60) + rule.get('baseline', 0) for rule in self.rules)
+        if needed > slots * slot_seconds:
+            raise ValueError(f"rules need {needed}s of history but windows hold {slots * slot_seconds}s")
+
+    def _slot(self, value):
+        """requestdatetime -> 슬롯 번호 (같은 초 문자열은 캐시)"""
+        slot = self._slot_cache.get(value)
+        if slot is None:
+            if len(self._slot_cache) > 100000:
+                self._slot_cache.clear()
+            moment = parse_requestdatetime(value)
+            slot = calendar.timegm(moment.timetuple()) // self.slot_seconds if moment else None
+            self._slot_cache[value] = slot
+        return slot
+
+    def _window(self, series_key):
+        window = self.series.get(series_key)
+        if window is None:
+            if len(self.series) >= self.max_series:
+                evicted, _ = self.series.popitem(last=False)
+                self._dirty.discard(evicted)
+                self.evicted += 1
+            window = self.series[series_key] = SlidingWindow(self.slots, self.slot_seconds)
+        else:
+            self.series.move_to_end(series_key)
+        return window
+
+    def update(self, batch):
+        """LogBatch 하나를 누적 (배치 안에서 시계열/슬롯별로 먼저 합산)"""
+        columns = batch.columns
+        pending = {}
+        latest = self.watermark
+        for bucket_name, key, requester, status, error, sent, when in zip(
+                columns['bucket_name'], columns['key'], columns['requester'], columns['httpstatus'],
+                columns['errorcode'], columns['bytessent'], columns['requestdatetime']):
+            slot = self._slot(when)
+            if slot is None:
+                continue
+            if latest is None or slot > latest:
+                latest = slot
+            client_error = 1 if status[:1] == '4' else 0
+            server_error = 1 if status[:1] == '5' else 0
+            sent = sent or 0
+            targets = [('bucket', bucket_name), ('prefix', key_prefix(bucket_name, key)),
+                       ('requester', requester)]
+            if error and error != '-':
+                targets.append(('errorcode', error))
+            for target in targets:
+                counts = pending.get((target, slot))
+                if counts is None:
+                    pending[(target, slot)] = [1, client_error, server_error, sent]
+                else:
+                    counts[0] += 1
+                    counts[1] += client_error
+                    counts[2] += server_error
+                    counts[3] += sent
+
+        for (series_key, slot), counts in pending.items():
+            if self._window(series_key).add(slot, *counts):
+                self._dirty.add(series_key)
+        self.rows += batch.num_rows
+        self.watermark = latest
+        return self
+
+    def _check(self, rule, window):
+        """규칙 조건 충족 시 (값, 기준값), 아니면 None"""
+        window_slots = max(1, rule.get('window', 60) // self.slot_seconds)
+        current = window.stats(self.watermark, window_slots)
+        if current['requests'] < rule.get('min_requests', 1):
+            return None
+        value = current[rule['metric']]
+        if 'threshold' in rule:
+            return (value, rule['threshold']) if value > rule['threshold'] else None
+        baseline_slots = max(1, rule.get('baseline', 600) // self.slot_seconds)
+        if window.first_slot > self.watermark - window_slots - baseline_slots + 1:
+            # 기준 구간을 다 채우기 전(첫 관측 직후)에는 판단하지 않음
+            return None
+        # 기준 구간: 현재 윈도 직전 baseline초 (윈도 길이로 정규화)
+        previous = window.stats(self.watermark - window_slots, baseline_slots)
+        if rule['metric'] in ('requests', 'errors', 'bytes_sent'):
+            base = previous[rule['metric']] * window_slots / baseline_slots
+        else:
+            base = previous[rule['metric']]
+        limit = base * rule['change']
+        return (value, limit) if value > limit else None
+
+    def evaluate(self, now=None):
+        """갱신된 시계열과 발생 중인 알림을 평가: 새로 발생/해소된 알림 목록"""
+        if self.watermark is None:
+            return []
+        now = now or time.time()
+        candidates = set(self._dirty)
+        candidates.update((scope, name) for _, scope, name in self.active)
+        self._dirty.clear()
+
+        events = []
+        event_time = self.watermark * self.slot_seconds
+        for series_key in candidates:
+            window = self.series.get(series_key)
+            for rule in self.rules:
+                if rule['scope'] != series_key[0]:
+                    continue
+                alert_key = (rule['name'],) + series_key
+                result = self._check(rule, window) if window is not None else None
+                if result is not None and alert_key not in self.active:
+                    if now - self._last_fired.get(alert_key, 0) < self.cooldown:
+                        continue
+                    self.active[alert_key] = now
+                    self._last_fired[alert_key] = now
+                    events.append(self._event('firing', rule, series_key, result, event_time))
+                elif result is None and alert_key in self.active:
+                    del self.active[alert_key]
+                    events.append(self._event('resolved', rule, series_key, None, event_time))
+        return events
+
+    def _event(self, state, rule, series_key, result, event_time):
+        event = {
+            'state': state,
+            'rule': rule['name'],
+            'scope': series_key[0],
+            'series': series_key[1],
+            'metric': rule['metric'],
+            'log_time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(event_time)),
+        }
+        if result is not None:
+            event['value'], event['limit'] = result
+        return event
+
+    def snapshot(self, scope='bucket', window=60, top=20):
+        """범위별 최근 window초 집계 상위 top개 (요청 수 순)"""
+        if self.watermark is None:
+            return []
+        slots = max(1, window // self.slot_seconds)
+        rows = [dict(self.series[series_key].stats(self.watermark, slots), series=series_key[1])
+                for series_key in list(self.series) if series_key[0] == scope]
+        return sorted(rows, key=lambda row: row['requests'], reverse=True)[:top]
+
+
+def load_rules(path):
+    with open(path, encoding='utf-8') as f:
+        rules = json.load(f)
+    for rule in rules:
+        if rule.get('scope') not in SCOPES or rule.get('metric') not in METRICS:
+            raise ValueError(f"Invalid rule: {rule}")
+        if ('threshold' in rule) == ('change' in rule):
+            raise ValueError(f"Rule '{rule.get('name')}' needs exactly one of 'threshold' or 'change'")
+    return rules
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Real-time alerts over newly landed S3 access logs")
+    parser.add_argument('location', help="log location, e.g. s3://log-bucket/logs/")
+    parser.add_argument('--index', default=os.path.expanduser('~/.s3_log_index.sqlite'))
+    parser.add_argument('--region', default=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    parser.add_argument('--interval', type=int, default=15, help="polling interval in seconds")
+    parser.add_argument('--rules', help="JSON rule file (default: built-in rules)")
+    parser.add_argument('--max-series', type=int, default=DEFAULT_MAX_SERIES)
+    args = parser.parse_args()
+
+    import boto3
+    from log_index import LogObjectIndex
+    from s3_utils import split_s3_uri
+
+    s3_client = boto3.client('s3', region_name=args.region)
+    bucket_name, prefix = split_s3_uri(args.location)
+    engine = AlertEngine(load_rules(args.rules) if args.rules else None, max_series=args.max_series)
+    index = LogObjectIndex(args.index)
+
+    # 객체 하나를 처리할 때마다 평가하므로 알림 지연은 목록 조회 간격 + 객체 처리 시간
+    def handler(key, batch):
+        engine.update(batch)
+        for event in engine.evaluate():
+            print(json.dumps(event), flush=True)
+
+    for keys, _ in index.tail(s3_client, bucket_name, prefix, args.interval, handler):
+        if keys:
+            print(f"# {len(keys)} objects, {engine.rows:,} rows, {len(engine.series)} series, "
+                  f"{len(engine.active)} active alerts", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,138 @@
 # app.py - 완전 수정 버전
 import streamlit as st
 import boto3
-from datetime import datetime
-import time
+from datetime import datetime, timedelta
 import os
+from contextlib import nullcontext
+
+from log_layout import (
+    LAYOUT_FLAT, LAYOUT_SIMPLE_DATE, PARTITION_COLUMN, detect_layout, has_dated_keys, is_partitioned,
+    day_location
+)
+from compaction import LogCompactor, compacted_table_ddl
+from rollups import ANALYSES, RollupManager
+from parallel import ParallelLogProcessor
+from provisioning import GlueProvisioner, access_log_table_ddl, describe_action
+from query_manager import QueryExecutionManager
+from query_results import iter_result_pages, iter_csv_result_batches, result_metadata
+from query_cache import QueryResultCache, cache_key, result_reuse_configuration
+from s3_utils import iter_objects, split_s3_uri
+from aws_clients import ClientPool, ListingCache, credential_fingerprint
+from discovery import BucketDiscovery
+from inventory import InventoryScanner, estimate_query_costs, format_bytes
+from metrics import MetricsRecorder
+from query_guard import DEFAULT_SCAN_BUDGET_BYTES, GB, TEMPLATES, QueryGuard, template_sql
 
 st.set_page_config(page_title="S3 Log Analyzer Setup", page_icon="📊")
 
 class AthenaTableCreator:
-    def __init__(self, region_name='us-east-1'):
+    def __init__(self, region_name='us-east-1', credentials=None, client_pool=None, listing_cache=None):
         self.region = region_name
-        self.s3_client = boto3.client('s3', region_name=region_name)
-        self.athena_client = boto3.client('athena', region_name=region_name)
-        self.glue_client = boto3.client('glue', region_name=region_name)
+        self.credentials = credentials or {}
+        self.credential_key = credential_fingerprint(**self.credentials)
+        self.client_pool = client_pool
+        if client_pool is None:
+            self.s3_client = boto3.client('s3', region_name=region_name, **self.credentials)
+            self.athena_client = boto3.client('athena', region_name=region_name, **self.credentials)
+            self.glue_client = boto3.client('glue', region_name=region_name, **self.credentials)
+        else:
+            # 풀에서 (리전, 자격 증명)별로 만들어 둔 클라이언트 재사용
+            self.s3_client = client_pool.client('s3', region_name, **self.credentials)
+            self.athena_client = client_pool.client('athena', region_name, **self.credentials)
+            self.glue_client = client_pool.client('glue', region_name, **self.credentials)
+        # S3 목록 캐시 (None이면 매번 조회)
+        self.listing_cache = listing_cache
+        # 날짜 경로별 마지막 로그 객체 키 (data_watermark의 StartAfter)
+        self.data_watermarks = {}
+        self.query_timeout = 300
+        self._query_manager = None
+        # 결과 캐시 (None이면 사용 안 함), 서버 측 결과 재사용 시간(분)
+        self.query_cache = None
+        self.cache_namespace = None
+        self.result_reuse_minutes = None
+        # 쿼리/목록 조회 계측 (None이면 기록 안 함)
+        self.metrics = None
+        # 스캔 예산/작업 그룹 가드 (None이면 기본 작업 그룹 사용)
+        self.query_guard = None
+    
+    @property
+    def query_manager(self):
+        """현재 athena_client에 연결된 쿼리 실행 관리자"""
+        if self._query_manager is None or self._query_manager.athena_client is not self.athena_client:
+            self._query_manager = QueryExecutionManager(self.athena_client, timeout=self.query_timeout,
+                                                        metrics=self.metrics)
+        self._query_manager.metrics = self.metrics
+        return self._query_manager
+    
+    def s3_client_for(self, region_name):
+        """다른 리전 버킷 조회용 S3 클라이언트"""
+        if region_name == self.region:
+            return self.s3_client
+        if self.client_pool is not None:
+            return self.client_pool.client('s3', region_name, **self.credentials)
+        return boto3.client('s3', region_name=region_name, **self.credentials)
+    
+    @property
+    def discovery(self):
+        return BucketDiscovery(self.s3_client_for, default_region=self.region)
+    
+    def _listing_timer(self, operation, bucket_name=None, prefix=''):
+        """S3 목록 조회 시간 측정 (metrics가 없으면 측정 안 함)"""
+        if self.metrics is None:
+            return nullcontext({})
+        return self.metrics.listing(operation, bucket_name, prefix)
+    
+    def _cached_listing(self, key, loader):
+        def timed_loader():
+            bucket_name = key[2] if len(key) > 2 else None
+            prefix = key[3] if len(key) > 3 else ''
+            with self._listing_timer(key[0], bucket_name, prefix) as timing:
+                value = loader()
+                timing['objects'] = len(value)
+            return value
         
-    def list_s3_buckets(self):
-        """S3 버킷 목록 가져오기"""
-        try:
+        if self.listing_cache is None:
+            return timed_loader()
+        return self.listing_cache.get_or_load(key, timed_loader)
+        
+    def list_s3_buckets(self, region_only=False, log_buckets_only=False):
+        """S3 버킷 목록 가져오기
+        
+        region_only이면 현재 리전 버킷만, log_buckets_only이면 Access Log를 보관하는 버킷만 반환합니다.
+        버킷 리전과 로깅 설정은 병렬로 조회합니다.
+        """
+        def load():
             response = self.s3_client.list_buckets()
             return [bucket['Name'] for bucket in response['Buckets']]
+        
+        try:
+            buckets = self._cached_listing(('buckets', self.credential_key), load)
+            if not region_only and not log_buckets_only:
+                return buckets
+            
+            regions = self._cached_listing(
+                ('bucket_regions', self.credential_key),
+                lambda: self.discovery.resolve_regions(buckets)
+            )
+            if log_buckets_only:
+                log_buckets = self._cached_listing(
+                    ('log_buckets', self.credential_key),
+                    lambda: self.discovery.find_log_buckets(regions)
+                )
+                buckets = [name for name in buckets if name in log_buckets]
+            if region_only:
+                buckets = [name for name in buckets if regions.get(name) == self.region]
+            return buckets
         except Exception as e:
             st.error(f"Error listing buckets: {str(e)}")
             return []
     
-    def list_s3_folders(self, bucket_name, prefix=''):
-        """S3 버킷 내 폴더 목록 가져오기"""
-        try:
+    def list_s3_folders(self, bucket_name, prefix='', depth=1):
+        """S3 버킷 내 폴더 목록 가져오기 (depth > 1이면 하위 폴더까지 병렬 탐색)"""
+        def load():
+            if depth > 1:
+                return self.discovery.walk_prefixes(bucket_name, self.region, prefix, max_depth=depth)
+            
             paginator = self.s3_client.get_paginator('list_objects_v2')
             folders = set()
             
@@ -35,6 +142,9 @@ class AthenaTableCreator:
                         folders.add(prefix_info['Prefix'])
             
             return sorted(list(folders))
+        
+        try:
+            return self._cached_listing(('folders', self.credential_key, bucket_name, prefix, depth), load)
         except Exception as e:
             st.error(f"Error listing folders: {str(e)}")
             return []
@@ -42,11 +152,13 @@ class AthenaTableCreator:
     def verify_log_files(self, bucket_name, prefix=''):
         """로그 파일 존재 확인"""
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=bucket_name,
-                Prefix=prefix,
-                MaxKeys=5
-            )
+            with self._listing_timer('verify', bucket_name, prefix) as timing:
+                response = self.s3_client.list_objects_v2(
+                    Bucket=bucket_name,
+                    Prefix=prefix,
+                    MaxKeys=5
+                )
+                timing['objects'] = response.get('KeyCount', 0)
             
             if 'Contents' in response:
                 files = [obj['Key'] for obj in response['Contents']]
@@ -56,6 +168,33 @@ class AthenaTableCreator:
         except Exception as e:
             return False, [str(e)]
     
+    def detect_log_layout(self, bucket_name, prefix='', sample_size=1000):
+        """로그 저장 경로 레이아웃 감지 (날짜 파티션 여부)"""
+        try:
+            with self._listing_timer('layout', bucket_name, prefix) as timing:
+                response = self.s3_client.list_objects_v2(
+                    Bucket=bucket_name,
+                    Prefix=prefix,
+                    MaxKeys=sample_size
+                )
+                timing['objects'] = response.get('KeyCount', 0)
+            keys = [obj['Key'] for obj in response.get('Contents', [])]
+            return detect_layout(bucket_name, keys)
+        except Exception as e:
+            st.error(f"Error detecting log layout: {str(e)}")
+            return {'layout': LAYOUT_FLAT}
+    
+    def inventory_log_files(self, bucket_name, prefix='', manifest_uri=None):
+        """로그 인벤토리 (객체 수, 총 용량, 일별 분포) - 키 범위 병렬 스캔 또는 S3 Inventory manifest"""
+        scanner = InventoryScanner(self.s3_client)
+        with self._listing_timer('inventory', bucket_name, prefix) as timing:
+            if manifest_uri:
+                inventory = scanner.scan_manifest(manifest_uri, bucket_name, prefix)
+            else:
+                inventory = scanner.scan(bucket_name, prefix)
+            timing['objects'] = inventory.objects
+        return inventory
+    
     def create_database(self, database_name, s3_output_location):
         """Athena 데이터베이스 생성"""
         query = f"CREATE DATABASE IF NOT EXISTS {database_name}"
@@ -67,49 +206,13 @@ class AthenaTableCreator:
         
         return response['QueryExecutionId']
     
-    def create_s3_access_log_table(self, database_name, table_name, s3_location, s3_output_location):
-        """S3 Access Log 테이블 자동 생성 - 올바른 RegEx 패턴"""
-        
-        # 올바른 이스케이프 처리
-        create_table_query = f"""
-        CREATE EXTERNAL TABLE IF NOT EXISTS `{database_name}.{table_name}`(
-          `bucketowner` STRING, 
-          `bucket_name` STRING, 
-          `requestdatetime` STRING, 
-          `remoteip` STRING, 
-          `requester` STRING, 
-          `requestid` STRING, 
-          `operation` STRING, 
-          `key` STRING, 
-          `request_uri` STRING, 
-          `httpstatus` STRING, 
-          `errorcode` STRING, 
-          `bytessent` BIGINT, 
-          `objectsize` BIGINT, 
-          `totaltime` STRING, 
-          `turnaroundtime` STRING, 
-          `referrer` STRING, 
-          `useragent` STRING, 
-          `versionid` STRING, 
-          `hostid` STRING, 
-          `sigv` STRING, 
-          `ciphersuite` STRING, 
-          `authtype` STRING, 
-          `endpoint` STRING, 
-          `tlsversion` STRING,
-          `accesspointarn` STRING,
-          `aclrequired` STRING)
-        ROW FORMAT SERDE 
-          'org.apache.hadoop.hive.serde2.RegexSerDe' 
-        WITH SERDEPROPERTIES ( 
-          'input.regex'='([^ ]*) ([^ ]*) \\\\[(.*?)\\\\] ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) (\"[^\"]*\"|-) (-|[0-9]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) (\"[^\"]*\"|-) ([^ ]*)(?: ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*))?.*$$') 
-        STORED AS INPUTFORMAT 
-          'org.apache.hadoop.mapred.TextInputFormat' 
-        OUTPUTFORMAT 
-          'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat'
-        LOCATION
-          '{s3_location}'
+    def create_s3_access_log_table(self, database_name, table_name, s3_location, s3_output_location,
+                                   layout=None):
+        """S3 Access Log 테이블 자동 생성 (RegEx 패턴은 log_parser.SERDE_INPUT_REGEX)
+        
+        layout이 날짜 파티션 레이아웃이면 파티션 프로젝션 테이블을 생성합니다.
         """
+        create_table_query = access_log_table_ddl(database_name, table_name, s3_location, layout)
         
         response = self.athena_client.start_query_execution(
             QueryString=create_table_query,
@@ -119,6 +222,128 @@ class AthenaTableCreator:
         
         return response['QueryExecutionId']
     
+    def provision_with_glue(self, database_name, table_name, s3_location, layout=None):
+        """Athena DDL 쿼리 대신 Glue API로 데이터베이스/테이블 생성 (이미 같으면 변경 없음)"""
+        spec = {'database': database_name, 'table': table_name, 'location': s3_location,
+                'partitioning': 'projection', 'layout': layout or {'layout': LAYOUT_FLAT}}
+        try:
+            results = GlueProvisioner(self.glue_client, self.s3_client).provision([spec])
+        except Exception as e:
+            st.error(f"Error provisioning with Glue: {str(e)}")
+            return 'FAILED', []
+        for result in results:
+            if result['status'] == 'FAILED':
+                st.error(describe_action(result))
+        failed = any(result['status'] == 'FAILED' for result in results)
+        return ('FAILED' if failed else 'SUCCEEDED'), results
+    
+    def create_compacted_table(self, database_name, table_name, s3_location, s3_output_location,
+                               start_date):
+        """Parquet 압축 테이블 생성 (dt/hour 파티션 프로젝션)"""
+        response = self.athena_client.start_query_execution(
+            QueryString=compacted_table_ddl(database_name, table_name, s3_location, start_date),
+            QueryExecutionContext={'Database': database_name},
+            ResultConfiguration={'OutputLocation': s3_output_location}
+        )
+        
+        return response['QueryExecutionId']
+    
+    def compact_access_logs(self, database_name, raw_table, compacted_table, source_location,
+                            compacted_location, s3_output_location, layout=None):
+        """원본 로그 테이블 -> Parquet 테이블 증분 압축 (Athena INSERT INTO)
+        
+        이미 압축된 시간은 건너뛰며, (압축된 시간 목록, 상태)를 반환합니다.
+        """
+        compactor = LogCompactor(self.s3_client, source_location, compacted_location)
+        raw_objects = compactor.raw_objects_by_hour()
+        if not raw_objects:
+            return [], 'NO_DATA'
+        
+        # 가장 이른 객체에는 전날 마지막 시간의 레코드가 있을 수 있으므로 레코드 시각 기준
+        start_date = compactor.record_hours(raw_objects)[0][:10]
+        table_query_id = self.create_compacted_table(
+            database_name, compacted_table, compacted_location, s3_output_location, start_date
+        )
+        status, _ = self.wait_for_query(table_query_id)
+        if status != 'SUCCEEDED':
+            return [], status
+        
+        compacted = []
+        for query, hours in compactor.athena_queries(database_name, compacted_table, raw_table,
+                                                     layout, raw_objects):
+            response = self.athena_client.start_query_execution(
+                QueryString=query,
+                QueryExecutionContext={'Database': database_name},
+                ResultConfiguration={'OutputLocation': s3_output_location}
+            )
+            status, _ = self.wait_for_query(response['QueryExecutionId'])
+            if status != 'SUCCEEDED':
+                return compacted, status
+            compactor.mark_completed(hours)
+            compacted.extend(hours)
+        
+        return compacted, 'SUCCEEDED'
+
+    def refresh_rollups(self, database_name, raw_table, source_location, rollup_location,
+                        s3_output_location, layout=None):
+        """시간별 롤업 테이블 증분 갱신: (롤업별 갱신된 시간 수, 상태)
+        
+        롤업끼리는 동시에 갱신하고, 한 롤업의 구간 INSERT는 시간순으로 하나씩 실행합니다.
+        구간이 실패하면 그 롤업은 거기서 멈추므로, 완료 표시 없이 데이터만 쓰인 구간이 남지 않습니다
+        (다음 갱신에서 같은 구간을 다시 넣어 중복 집계되는 일 방지).
+        """
+        manager = RollupManager(self.s3_client, source_location, rollup_location)
+        raw_objects = manager.raw_objects_by_hour()
+        if not raw_objects:
+            return {}, 'NO_DATA'
+        
+        start_date = manager.record_hours(raw_objects)[0][:10]
+        ddls = [ddl for _, ddl in manager.table_ddls(database_name, raw_table, start_date)]
+        for _, status, _ in self.query_manager.run_many(ddls, database_name, s3_output_location):
+            if status != 'SUCCEEDED':
+                return {}, status
+        
+        chunks = {}
+        for name, sql, hours in manager.refresh_queries(database_name, raw_table, raw_table, layout,
+                                                        raw_objects):
+            chunks.setdefault(name, []).append((sql, hours))
+        
+        def refresh(name):
+            refreshed_hours = 0
+            for sql, hours in chunks[name]:
+                _, status, _ = self.query_manager.run(sql, database_name, s3_output_location)
+                if status != 'SUCCEEDED':
+                    return refreshed_hours, status
+                manager.mark_completed(name, hours)
+                refreshed_hours += len(hours)
+            return refreshed_hours, 'SUCCEEDED'
+        
+        refreshed = {}
+        final_status = 'SUCCEEDED'
+        names = list(chunks)
+        for name, (hours, status) in zip(names, self.query_manager.map(refresh, names)):
+            if hours:
+                refreshed[name] = hours
+            if status != 'SUCCEEDED':
+                final_status = status
+        return refreshed, final_status
+
+    def run_builtin_analysis(self, analysis, database_name, raw_table, source_location, rollup_location,
+                             s3_output_location, layout=None, since_hour=None):
+        """기본 분석을 롤업 테이블(+ 미집계 시간만 원본 테이블)로 실행: (상태, 결과 배치 목록)"""
+        manager = RollupManager(self.s3_client, source_location, rollup_location)
+        open_from = manager.open_from([ANALYSES[analysis]['rollup']])
+        query = manager.analysis_sql(analysis, database_name, raw_table, raw_table, open_from,
+                                     layout, since_hour)
+        watermark = f"{open_from}|{self.data_watermark(layout)}"
+        return self.run_query_cached(query, database_name, s3_output_location, watermark)
+
+    def process_logs_locally(self, bucket_name, prefix='', max_workers=None, with_sketch=False,
+                             progress=None):
+        """Athena 없이 로컬 CPU 코어 전체로 로그 객체를 병렬 처리 (LogAggregate 반환)"""
+        processor = ParallelLogProcessor(max_workers, self.region, self.credentials, with_sketch)
+        return processor.process_prefix(self.s3_client, bucket_name, prefix, progress)
+    
     def test_table_query(self, database_name, table_name, s3_output_location):
         """테이블 데이터 테스트 쿼리"""
         test_query = f"SELECT COUNT(*) as row_count FROM {database_name}.{table_name}"
@@ -146,23 +371,104 @@ class AthenaTableCreator:
         except:
             return 'Error'
     
-    def wait_for_query(self, query_execution_id):
-        """쿼리 실행 완료 대기"""
-        max_attempts = 30
-        for i in range(max_attempts):
-            response = self.athena_client.get_query_execution(
-                QueryExecutionId=query_execution_id
-            )
-            status = response['QueryExecution']['Status']['State']
-            
-            if status in ['SUCCEEDED', 'FAILED', 'CANCELLED']:
-                return status, response
-            
-            time.sleep(1)
+    def data_watermark(self, layout):
+        """테이블 데이터 워터마크: 오늘 날짜 경로의 가장 최근 로그 객체 키 (날짜 키 레이아웃만)
+        
+        날짜 경로별로 마지막으로 본 키를 기억해 두고 그 이후(StartAfter)만 목록 조회하므로,
+        캐시 적중 때도 새로 올라온 객체만 읽습니다.
+        """
+        if not has_dated_keys(layout):
+            return None
+        bucket_name, prefix = split_s3_uri(day_location(layout, datetime.utcnow()))
+        latest = self.data_watermarks.get((bucket_name, prefix), '')
+        with self._listing_timer('watermark', bucket_name, prefix) as timing:
+            objects = 0
+            for obj in iter_objects(self.s3_client, bucket_name, prefix, latest or None):
+                latest = max(latest, obj['Key'])
+                objects += 1
+            timing['objects'] = objects
+        self.data_watermarks[bucket_name, prefix] = latest
+        return latest
+    
+    def run_query_cached(self, query, database_name, s3_output_location, watermark=None, ttl=None):
+        """캐시를 거쳐 쿼리 실행: (상태, 결과 배치 목록)
+        
+        같은 정규화 SQL/데이터베이스/워터마크 결과가 캐시에 있으면 Athena를 호출하지 않습니다.
+        """
+        key = cache_key(query, database_name, watermark, self.cache_namespace)
+        if self.query_cache is not None:
+            cached = self.query_cache.get(key)
+            if cached is not None:
+                return 'SUCCEEDED', cached
+        
+        params = {}
+        if self.result_reuse_minutes:
+            params['ResultReuseConfiguration'] = result_reuse_configuration(self.result_reuse_minutes)
+        if self.query_guard is not None and self.query_guard.workgroup:
+            # 쿼리당 스캔 한도가 설정된 작업 그룹에서 실행
+            params['WorkGroup'] = self.query_guard.workgroup
+        query_execution_id, status, _ = self.query_manager.run(
+            query, database_name, s3_output_location, **params
+        )
+        if status != 'SUCCEEDED':
+            return status, []
         
-        return 'TIMEOUT', response
+        batches = list(self.iter_query_results(query_execution_id))
+        if self.query_cache is not None:
+            self.query_cache.set(key, batches, ttl)
+        return status, batches
+    
+    def ensure_query_workgroup(self, s3_output_location):
+        """스캔 한도 작업 그룹 생성/갱신: (작업 그룹 이름, 결과) 또는 (None, 오류)"""
+        try:
+            return self.query_guard.ensure_workgroup(s3_output_location)
+        except Exception as e:
+            st.error(f"Error configuring workgroup: {str(e)}")
+            return None, str(e)
+    
+    def count_table_rows(self, database_name, table_name, s3_output_location, watermark=None):
+        """테이블 행 수 (캐시 사용): (상태, 행 수 문자열)"""
+        query = f"SELECT COUNT(*) as row_count FROM {database_name}.{table_name}"
+        status, batches = self.run_query_cached(query, database_name, s3_output_location, watermark)
+        if status != 'SUCCEEDED':
+            return status, 'Error'
+        for batch in batches:
+            if batch.num_rows:
+                return status, str(batch.columns['row_count'][0])
+        return status, '0'
+    
+    def iter_query_results(self, query_execution_id, page_size=1000):
+        """쿼리 결과를 페이지 단위 타입 변환된 컬럼 배치로 스트리밍 (get_query_results + NextToken)"""
+        yield from iter_result_pages(self.athena_client, query_execution_id, page_size)
+    
+    def fetch_query_results(self, query_execution_id, batch_size=100000, max_workers=8):
+        """대용량 결과 빠른 경로: OutputLocation의 CSV를 범위 GET으로 병렬 다운로드하여 스트리밍"""
+        response = self.athena_client.get_query_execution(QueryExecutionId=query_execution_id)
+        output_location = response['QueryExecution']['ResultConfiguration']['OutputLocation']
+        column_names, column_types = result_metadata(self.athena_client, query_execution_id)
+        yield from iter_csv_result_batches(
+            self.s3_client, output_location, column_names, column_types,
+            batch_size=batch_size, max_workers=max_workers
+        )
+    
+    def wait_for_query(self, query_execution_id, timeout=None):
+        """쿼리 실행 완료 대기 (지수 백오프 + 지터, 기본 제한 시간 query_timeout초)"""
+        return self.query_manager.wait(query_execution_id, timeout)
+    
+    def wait_for_queries(self, query_execution_ids, timeout=None):
+        """여러 쿼리 완료 대기 (BatchGetQueryExecution 일괄 조회)"""
+        return self.query_manager.wait_many(query_execution_ids, timeout)
 
 # Streamlit UI
+def get_client_pool():
+    """세션별 boto3 클라이언트 풀 (다른 사용자와 공유하지 않고, 세션이 끝나면 함께 사라짐)
+
+    세션 안에서도 최근 자격 증명 2개만 보관하고, 호출자 정보는 5분마다 다시 확인합니다.
+    """
+    if 'client_pool' not in st.session_state:
+        st.session_state['client_pool'] = ClientPool(max_credentials=2, identity_ttl=300)
+    return st.session_state['client_pool']
+
 def main():
     st.title("🚀 S3 Log Analyzer - Auto Setup")
     st.markdown("S3 Access Log를 위한 Athena 테이블을 자동으로 생성합니다")
@@ -259,59 +565,89 @@ def main():
                 st.error("❌ No credentials found in environment or secrets")
                 st.info("Configure AWS credentials in Streamlit secrets or environment variables")
         
-        # 자격 증명 검증
+        # 자격 증명 검증 (자격 증명별 한 번만 STS 호출)
         if aws_access_key and aws_secret_key:
+            credentials = {
+                'aws_access_key_id': aws_access_key,
+                'aws_secret_access_key': aws_secret_key,
+            }
             try:
-                sts = boto3.client(
-                    'sts', 
-                    region_name=selected_region,
-                    aws_access_key_id=aws_access_key,
-                    aws_secret_access_key=aws_secret_key
-                )
-                identity = sts.get_caller_identity()
+                identity = get_client_pool().caller_identity(selected_region, **credentials)
                 st.success(f"✅ Connected as: {identity['Arn'].split('/')[-1]}")
             except Exception as e:
+                get_client_pool().clear(**credentials)
                 st.error(f"❌ AWS credentials error: {str(e)}")
                 st.info("Please check your credentials and try again")
                 return
         else:
             st.error("❌ Please provide AWS credentials to continue")
             return
+        
+        # 쿼리 결과 캐시 설정
+        st.subheader("⚡ Query Cache")
+        cache_ttl = st.number_input("Cache TTL (seconds)", min_value=0, value=300, step=60,
+                                    help="같은 쿼리/데이터에 대한 결과를 재사용하는 시간 (0 = 사용 안 함)")
+        if cache_ttl:
+            st.caption("날짜 기반 레이아웃은 새 로그 객체가 생기면 캐시가 무효화됩니다. "
+                       "날짜 경로가 없는(flat) 레이아웃은 데이터 워터마크가 없어 TTL이 지나야 새 로그가 반영됩니다.")
+        result_reuse = st.checkbox("Athena Result Reuse", value=False,
+                                   help="Athena 서버 측 결과 재사용 (엔진 v3 작업 그룹 필요)")
+        
+        # 쿼리당 스캔 예산
+        st.subheader("🛡️ Scan Budget")
+        scan_budget_gb = st.number_input("Per-query scan budget (GB)", min_value=0.01,
+                                         value=DEFAULT_SCAN_BUDGET_BYTES / GB, step=1.0,
+                                         help="예상 스캔량이 예산을 넘는 쿼리는 확인 후에만 실행합니다")
     
     # AthenaTableCreator 인스턴스 생성 (자격 증명은 sidebar에서 이미 검증됨)
+    if 'listing_cache' not in st.session_state:
+        st.session_state['listing_cache'] = ListingCache()
     try:
-        creator = AthenaTableCreator(region_name=selected_region)
-        # AWS 클라이언트 재생성 (자격 증명 포함)
-        creator.s3_client = boto3.client(
-            's3', 
+        creator = AthenaTableCreator(
             region_name=selected_region,
-            aws_access_key_id=aws_access_key,
-            aws_secret_access_key=aws_secret_key
-        )
-        creator.athena_client = boto3.client(
-            'athena', 
-            region_name=selected_region,
-            aws_access_key_id=aws_access_key,
-            aws_secret_access_key=aws_secret_key
-        )
-        creator.glue_client = boto3.client(
-            'glue', 
-            region_name=selected_region,
-            aws_access_key_id=aws_access_key,
-            aws_secret_access_key=aws_secret_key
+            credentials=credentials,
+            client_pool=get_client_pool(),
+            listing_cache=st.session_state['listing_cache']
         )
     except Exception as e:
         st.error(f"Failed to initialize AWS clients: {str(e)}")
         return
     
+    # 결과 캐시는 세션별로 유지 (다른 사용자와 공유하지 않음)
+    if cache_ttl:
+        if 'query_cache' not in st.session_state:
+            st.session_state['query_cache'] = QueryResultCache(
+                ttl=cache_ttl, disk_path=os.environ.get('QUERY_CACHE_PATH')
+            )
+        creator.query_cache = st.session_state['query_cache']
+        creator.query_cache.ttl = cache_ttl
+    creator.cache_namespace = identity['Account']
+    # 데이터 워터마크도 세션별로 유지하여 다음 실행 때 새 객체만 목록 조회
+    creator.data_watermarks = st.session_state.setdefault('data_watermarks', {})
+    
+    # 쿼리/목록 조회 계측 (세션별, METRICS_LOG_PATH 설정 시 JSON lines로도 기록)
+    if 'metrics' not in st.session_state:
+        st.session_state['metrics'] = MetricsRecorder(jsonl_path=os.environ.get('METRICS_LOG_PATH'))
+    creator.metrics = st.session_state['metrics']
+    creator.result_reuse_minutes = 60 if result_reuse else None
+    creator.query_guard = QueryGuard(creator.athena_client, int(scan_budget_gb * GB),
+                                     workgroup=st.session_state.get('guard_workgroup'))
+    
     # Main UI
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader("📁 S3 Log Location")
         
+        # 목록 캐시 무효화
+        if st.button("🔄 Refresh Buckets & Folders"):
+            creator.listing_cache.invalidate()
+        
         # 버킷 선택
-        buckets = creator.list_s3_buckets()
+        region_only = st.checkbox("Only buckets in selected region", value=False)
+        log_buckets_only = st.checkbox("Only buckets receiving access logs", value=False,
+                                       help="소스 버킷 로깅 설정과 키 이름 패턴으로 로그 버킷을 찾습니다")
+        buckets = creator.list_s3_buckets(region_only=region_only, log_buckets_only=log_buckets_only)
         if not buckets:
             st.warning("No S3 buckets found in this region")
             return
@@ -320,7 +656,9 @@ def main():
         
         # 폴더 선택 (선택사항)
         if selected_bucket:
-            folders = creator.list_s3_folders(selected_bucket)
+            folder_depth = st.number_input("Folder Depth", min_value=1, max_value=6, value=1,
+                                           help="하위 폴더까지 탐색할 깊이 (날짜 폴더는 4~6)")
+            folders = creator.list_s3_folders(selected_bucket, depth=folder_depth)
             if folders:
                 selected_folder = st.selectbox("Select Folder (Optional)", [''] + folders)
             else:
@@ -350,6 +688,20 @@ def main():
     st.info(f"📍 S3 Location: `{s3_location}`")
     st.info(f"🌍 Region: `{selected_region}`")
     
+    # 날짜 파티션 프로젝션 사용 여부
+    use_partition_projection = st.checkbox(
+        "📅 Use Partition Projection",
+        value=True,
+        help="날짜 기반 로그 경로를 감지하면 파티션 프로젝션 테이블을 생성합니다 (날짜 조건으로 스캔량 감소)"
+    )
+    
+    # Athena DDL 쿼리 대신 Glue 카탈로그 API 직접 호출 (쿼리 대기 없음, 기존 테이블과 비교 후 변경분만 적용)
+    use_glue_api = st.checkbox(
+        "⚙️ Create via Glue API",
+        value=False,
+        help="Glue CreateDatabase/CreateTable을 직접 호출합니다. 여러 버킷 일괄 생성은 provisioning.py를 사용하세요"
+    )
+    
     # 로그 파일 존재 확인
     if st.button("🔍 Verify Log Files"):
         prefix = selected_folder if selected_folder else ''
@@ -364,40 +716,111 @@ def main():
             st.warning("⚠️ No log files found in this location")
             st.info("Make sure S3 Server Access Logging is enabled and logs have been generated")
     
+    # 로그 용량 및 비용 추정
+    with st.expander("📦 Log Inventory & Cost Estimate"):
+        manifest_uri = st.text_input(
+            "S3 Inventory manifest (Optional)",
+            help="예: s3://inventory-bucket/source-bucket/config-id/2024-01-15T00-00Z/manifest.json"
+        )
+        estimate_days = st.number_input("Partitioned query range (days)", min_value=1, value=1)
+        if st.button("📦 Scan Inventory"):
+            with st.spinner("Scanning log objects..."):
+                try:
+                    inventory = creator.inventory_log_files(
+                        selected_bucket, selected_folder, manifest_uri or None
+                    )
+                except Exception as e:
+                    st.error(f"Error scanning inventory: {str(e)}")
+                    inventory = None
+                else:
+                    # 쿼리 가드 스캔량 추정에 재사용
+                    st.session_state[f"inventory:{selected_bucket}/{selected_folder}"] = inventory
+            
+            if inventory is not None:
+                st.success(f"✅ {inventory.objects:,} objects, {format_bytes(inventory.bytes)} "
+                           f"({inventory.source})")
+                histogram = inventory.day_histogram()
+                if histogram:
+                    st.bar_chart({'MB': {day: size / (1024 * 1024) for day, _, size in histogram}})
+                st.table([
+                    {
+                        'Table': f"{estimate['table']} ({estimate['days']}d)",
+                        'Scan per query': format_bytes(estimate['bytes']),
+                        'Cost per query ($)': f"{estimate['cost']:.4f}",
+                    }
+                    for estimate in estimate_query_costs(inventory, days=estimate_days)
+                ])
+                st.caption("텍스트 로그 테이블은 컬럼 단위로 읽지 않으므로 샘플 쿼리(COUNT, 상태별 집계, 404 검색 등)는 "
+                           "모두 같은 양을 스캔합니다. 차이는 읽는 날짜 범위(파티션)에서만 생깁니다.")
+    
     # 생성 버튼
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         if st.button("🎯 Create Database & Table", type="primary", use_container_width=True):
             with st.spinner("Creating resources..."):
                 try:
+                    layout = None
+                    if use_partition_projection:
+                        layout = creator.detect_log_layout(selected_bucket, selected_folder)
+                        if is_partitioned(layout):
+                            st.info(f"📅 Detected `{layout['layout']}` layout → partition `{PARTITION_COLUMN}` "
+                                    f"({layout['date_format']}) at `{layout['location']}`")
+                        elif layout.get('layout') == LAYOUT_SIMPLE_DATE:
+                            st.info("📅 Detected `simple_date` layout (dates in file names, not folders). "
+                                    "Athena partitions must be folders, so creating an unpartitioned table")
+                        else:
+                            st.info("No date-based layout detected, creating unpartitioned table")
+                    
                     # 1. 데이터베이스 생성
                     st.write("1️⃣ Creating database...")
-                    db_query_id = creator.create_database(db_name, athena_output)
-                    status, _ = creator.wait_for_query(db_query_id)
+                    if use_glue_api:
+                        # Glue 프로비저닝은 데이터베이스와 테이블을 한 번에 처리하므로
+                        # 데이터베이스 결과는 create_database 작업 결과로 보고
+                        table_status, results = creator.provision_with_glue(db_name, table_name, s3_location, layout)
+                        database_results = [r for r in results if r['action'] == 'create_database']
+                        if database_results:
+                            status = 'FAILED' if database_results[0]['status'] == 'FAILED' else 'SUCCEEDED'
+                            database_message = 'created' if database_results[0]['status'] == 'OK' else 'already exists'
+                        else:
+                            # 작업이 없으면 이미 있는 데이터베이스 (프로비저닝 자체가 실패하면 결과가 비어 있음)
+                            status = 'SUCCEEDED' if results or table_status == 'SUCCEEDED' else table_status
+                            database_message = 'already exists'
+                    else:
+                        db_query_id = creator.create_database(db_name, athena_output)
+                        status, _ = creator.wait_for_query(db_query_id)
+                        database_message = 'created'
                     
                     if status == 'SUCCEEDED':
-                        st.success(f"✅ Database '{db_name}' created!")
+                        st.success(f"✅ Database '{db_name}' {database_message}!")
                     else:
                         st.error(f"Failed to create database: {status}")
                         return
                     
                     # 2. 테이블 생성
                     st.write("2️⃣ Creating table...")
-                    table_query_id = creator.create_s3_access_log_table(
-                        db_name, table_name, s3_location, athena_output
-                    )
-                    status, response = creator.wait_for_query(table_query_id)
+                    if use_glue_api:
+                        status, response = table_status, {}
+                        table_results = [r for r in results if r['action'] != 'create_database']
+                        for result in table_results:
+                            st.write(f"`{describe_action(result)}`")
+                        if not table_results and status == 'SUCCEEDED':
+                            st.write("`Table already up to date`")
+                    else:
+                        table_query_id = creator.create_s3_access_log_table(
+                            db_name, table_name, s3_location, athena_output, layout=layout
+                        )
+                        status, response = creator.wait_for_query(table_query_id)
                     
                     if status == 'SUCCEEDED':
                         st.success(f"✅ Table '{db_name}.{table_name}' created!")
                         
-                        # 3. 데이터 확인
+                        # 3. 데이터 확인 (같은 데이터에 대한 반복 COUNT는 캐시 사용)
                         st.write("3️⃣ Verifying data...")
-                        test_query_id = creator.test_table_query(db_name, table_name, athena_output)
-                        test_status, _ = creator.wait_for_query(test_query_id)
+                        test_status, row_count = creator.count_table_rows(
+                            db_name, table_name, athena_output, watermark=creator.data_watermark(layout)
+                        )
                         
                         if test_status == 'SUCCEEDED':
-                            row_count = creator.get_query_result(test_query_id)
                             if row_count != '0' and row_count != 'Error':
                                 st.success(f"✅ Table contains {row_count} rows of data!")
                             else:
@@ -420,12 +843,23 @@ def main():
                         
                         st.balloons()
                         
+                        partition_example = ''
+                        if is_partitioned(layout):
+                            partition_example = f"""
+                            -- Query one day only (partition pruning)
+                            SELECT COUNT(*) FROM {db_name}.{table_name}
+                            WHERE {PARTITION_COLUMN} = '{layout['start_date']}';
+                            """
+                        
                         with st.expander("📋 Sample Queries"):
+                            st.caption("상태 코드/404/인기 파일 분석은 아래 'Built-in Analyses'에서 "
+                                       "시간별 롤업 테이블로 실행하면 전체 로그를 스캔하지 않습니다. "
+                                       "직접 쿼리는 'Guarded Query'에서 스캔량을 확인한 뒤 실행하세요.")
                             st.markdown(f"""
                             ```sql
                             -- Check if data exists
                             SELECT COUNT(*) FROM {db_name}.{table_name};
-                            
+                            {partition_example}
                             -- View first 10 logs
                             SELECT * FROM {db_name}.{table_name} LIMIT 10;
                             
@@ -459,6 +893,241 @@ def main():
                 except Exception as e:
                     st.error(f"Error: {str(e)}")
     
+    # Parquet 압축
+    with st.expander("🗜️ Compact Logs to Parquet"):
+        st.markdown("""
+        원본 로그를 `dt`/`hour` 파티션 Parquet 테이블로 증분 압축합니다.
+        이미 압축된 시간은 건너뛰고, 지연 도착을 고려해 2시간이 지난 시간만 처리합니다.
+        """)
+        compacted_table = st.text_input("Parquet Table Name", value=f"{table_name}_parquet")
+        compacted_location = st.text_input(
+            "Parquet Location",
+            value=f"{athena_output.rstrip('/')}/compacted/{db_name}/{compacted_table}/",
+            help="원본 로그 LOCATION 바깥의 경로를 지정하세요"
+        )
+        if st.button("🗜️ Compact Now"):
+            with st.spinner("Compacting..."):
+                try:
+                    layout = None
+                    if use_partition_projection:
+                        layout = creator.detect_log_layout(selected_bucket, selected_folder)
+                    hours, status = creator.compact_access_logs(
+                        db_name, table_name, compacted_table, s3_location,
+                        compacted_location, athena_output, layout=layout
+                    )
+                    if status == 'SUCCEEDED':
+                        st.success(f"✅ Compacted {len(hours)} hours into '{db_name}.{compacted_table}'")
+                    elif status == 'NO_DATA':
+                        st.warning("⚠️ No log files found in this location")
+                    else:
+                        st.error(f"Compaction stopped after {len(hours)} hours: {status}")
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+    
+    # 시간별 롤업 기반 기본 분석
+    with st.expander("📈 Built-in Analyses (Hourly Rollups)"):
+        st.markdown("""
+        상태 코드/작업/오류 코드별, 키별, 클라이언트 IP별 요청 수를 시간 단위로 미리 집계한
+        롤업 테이블에서 기본 분석을 실행합니다. 아직 집계되지 않은 최근 시간만 원본 테이블에서 읽습니다.
+        """)
+        rollup_location = st.text_input(
+            "Rollup Location",
+            value=f"{athena_output.rstrip('/')}/rollups/{db_name}/{table_name}/",
+            help="원본 로그 LOCATION 바깥의 경로를 지정하세요"
+        )
+        
+        if st.button("🔄 Refresh Rollups"):
+            with st.spinner("Aggregating closed hours..."):
+                try:
+                    analysis_layout = None
+                    if use_partition_projection:
+                        analysis_layout = creator.detect_log_layout(selected_bucket, selected_folder)
+                    refreshed, status = creator.refresh_rollups(
+                        db_name, table_name, s3_location, rollup_location, athena_output,
+                        layout=analysis_layout
+                    )
+                    if status == 'SUCCEEDED':
+                        summary = ', '.join(f"{name}: {hours}h" for name, hours in refreshed.items())
+                        st.success("✅ Rollups up to date" + (f" ({summary})" if summary else ""))
+                    elif status == 'NO_DATA':
+                        st.warning("⚠️ No log files found in this location")
+                    else:
+                        st.error(f"Rollup refresh stopped: {status}")
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+        
+        analysis = st.selectbox("Analysis", list(ANALYSES))
+        since_hours = st.number_input("Last N hours (0 = all)", min_value=0, max_value=24 * 365, value=0)
+        if st.button("▶️ Run Analysis"):
+            with st.spinner("Running..."):
+                try:
+                    analysis_layout = None
+                    if use_partition_projection:
+                        analysis_layout = creator.detect_log_layout(selected_bucket, selected_folder)
+                    since_hour = None
+                    if since_hours:
+                        since_hour = (datetime.utcnow() - timedelta(hours=since_hours)).strftime('%Y-%m-%d-%H')
+                    status, batches = creator.run_builtin_analysis(
+                        analysis, db_name, table_name, s3_location, rollup_location, athena_output,
+                        layout=analysis_layout, since_hour=since_hour
+                    )
+                    if status == 'SUCCEEDED':
+                        st.dataframe([dict(zip(batch.column_names, row))
+                                      for batch in batches for row in batch.rows()])
+                    else:
+                        st.error(f"Query failed: {status}")
+                except Exception as e:
+                    st.error(f"Error: {str(e)}")
+    
+    # 로컬 병렬 처리
+    with st.expander("⚡ Process Logs Locally (All CPU Cores)"):
+        st.markdown("""
+        Athena가 제한(throttling)되거나 비용이 클 때, 로그 객체를 이 머신의 프로세스 풀로 나누어
+        내려받고 파싱/집계합니다.
+        """)
+        local_day = None
+        if use_partition_projection:
+            local_day = st.date_input("Log Date (date-based layouts only)", value=datetime.utcnow().date())
+        local_workers = st.number_input("Workers", min_value=1, max_value=256, value=os.cpu_count() or 1)
+        local_sketch = st.checkbox("Also estimate distinct IPs / top keys / latency", value=False)
+        if st.button("⚡ Process Now"):
+            progress_bar = st.progress(0.0)
+            try:
+                local_prefix = selected_folder
+                if local_day is not None:
+                    local_layout = creator.detect_log_layout(selected_bucket, selected_folder)
+                    if has_dated_keys(local_layout):
+                        local_prefix = split_s3_uri(day_location(local_layout, local_day))[1]
+                aggregate = creator.process_logs_locally(
+                    selected_bucket, local_prefix, int(local_workers), local_sketch,
+                    progress=lambda done, total: progress_bar.progress(done / total)
+                )
+                result = aggregate.summary.to_dict()
+                st.success(f"✅ {aggregate.objects} objects, {result['rows']:,} rows "
+                           f"({format_bytes(result['bytes_read'])})")
+                st.json({name: result[name] for name in ['status_counts', 'operation_counts', 'error_counts']})
+                if aggregate.sketch is not None:
+                    st.json(aggregate.sketch.summary(10))
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+    
+    # 쿼리 비용/지연 시간 계측
+    with st.expander("📊 Query & Listing Metrics"):
+        metrics = creator.metrics
+        queries = metrics.query_records()
+        if queries:
+            total_scanned = sum(record['data_scanned_bytes'] or 0 for record in queries)
+            total_cost = sum(record['cost_usd'] for record in queries)
+            col1, col2, col3 = st.columns(3)
+            col1.metric("Queries", len(queries))
+            col2.metric("Data Scanned", format_bytes(total_scanned))
+            col3.metric("Estimated Cost", f"${total_cost:.4f}")
+            
+            st.markdown("**By table**")
+            st.dataframe([
+                dict(label=label, **stats) for label, stats in metrics.summary_by_label().items()
+            ])
+            st.markdown("**Recent queries**")
+            st.dataframe([
+                {name: record[name] for name in [
+                    'label', 'statement_type', 'status', 'data_scanned_bytes', 'engine_execution_ms',
+                    'queue_ms', 'planning_ms', 'service_processing_ms', 'wall_ms',
+                    'polling_overhead_ms', 'polls', 'cost_usd'
+                ]}
+                for record in reversed(queries[-50:])
+            ])
+        else:
+            st.info("No Athena queries recorded in this session yet")
+        
+        listings = metrics.listing_records()
+        if listings:
+            st.markdown("**S3 listings**")
+            st.dataframe([
+                {name: record[name] for name in ['operation', 'bucket', 'prefix', 'duration_ms', 'objects', 'error']}
+                for record in reversed(listings[-50:])
+            ])
+        
+        prometheus_text = metrics.to_prometheus()
+        st.download_button("⬇️ Prometheus Metrics", prometheus_text, file_name="s3_log_analyzer.prom",
+                           mime="text/plain")
+        if metrics.jsonl_path:
+            st.caption(f"JSON lines log: `{metrics.jsonl_path}`")
+    
+    # 스캔 예산 기반 쿼리 가드
+    with st.expander("🛡️ Guarded Query (Scan Budget)"):
+        st.markdown(f"""
+        로그 인벤토리로 스캔량을 추정하고, 날짜 파티션 조건과 `LIMIT`을 넣은 뒤 실행합니다.
+        예산({scan_budget_gb:g} GB)을 넘는 쿼리는 확인해야 실행되며, 작업 그룹 한도를 적용하면
+        한도를 넘는 쿼리는 Athena가 취소합니다.
+        """)
+        guard_workgroup = st.session_state.get('guard_workgroup')
+        if guard_workgroup:
+            st.info(f"🛡️ Queries run in workgroup `{guard_workgroup}` "
+                    f"(cutoff {format_bytes(creator.query_guard.budget_bytes)})")
+        if st.button("🛡️ Apply Workgroup Cutoff"):
+            name, result = creator.ensure_query_workgroup(athena_output)
+            if name:
+                st.session_state['guard_workgroup'] = name
+                st.success(f"✅ Workgroup `{name}` {result} "
+                           f"(BytesScannedCutoffPerQuery = {format_bytes(creator.query_guard.budget_bytes)})")
+        
+        guard_template = st.selectbox("Template", list(TEMPLATES) + ['Custom SQL'])
+        guard_days = st.number_input("Date range (days, date-based layouts)", min_value=1, value=1)
+        guard_limit = st.number_input("Row limit", min_value=1, value=1000)
+        table_ref = f"{db_name}.{table_name}"
+        default_sql = template_sql(guard_template, table_ref, limit=guard_limit) \
+            if guard_template in TEMPLATES else f"SELECT * FROM {table_ref}"
+        guard_sql = st.text_area("SQL", value=default_sql, height=150,
+                                 help="날짜 조건은 실행 시 감지한 레이아웃으로 추가됩니다")
+        allow_over_budget = st.checkbox("Allow queries over budget (I accept the cost)", value=False,
+                                        help="작업 그룹 한도를 적용했다면 그 한도는 계속 적용됩니다")
+        
+        estimate_clicked = st.button("🔍 Estimate Scan")
+        run_clicked = st.button("▶️ Run Guarded Query")
+        if estimate_clicked or run_clicked:
+            try:
+                guard_layout = None
+                if use_partition_projection:
+                    guard_layout = creator.detect_log_layout(selected_bucket, selected_folder)
+                inventory_key = f"inventory:{selected_bucket}/{selected_folder}"
+                if inventory_key not in st.session_state:
+                    with st.spinner("Scanning log inventory for estimate..."):
+                        st.session_state[inventory_key] = creator.inventory_log_files(
+                            selected_bucket, selected_folder
+                        )
+                plan = creator.query_guard.plan(
+                    guard_sql, [table_ref, table_name], st.session_state[inventory_key], guard_layout,
+                    days=guard_days, limit=guard_limit
+                )
+                st.code(plan['sql'], language='sql')
+                if plan['changes']:
+                    st.caption("Rewritten: " + ', '.join(plan['changes']))
+                if plan['estimated_bytes'] is None:
+                    st.info("Scan size unknown (query does not read the log table)")
+                else:
+                    st.metric("Estimated scan (upper bound)", format_bytes(plan['estimated_bytes']),
+                              f"${plan['estimated_cost']:.4f}", delta_color="off")
+                
+                if run_clicked:
+                    if plan['over_budget'] and not allow_over_budget:
+                        st.error(f"🛑 Refused: estimated scan {format_bytes(plan['estimated_bytes'])} exceeds "
+                                 f"the {scan_budget_gb:g} GB budget. Narrow the date range or confirm above.")
+                    else:
+                        with st.spinner("Running..."):
+                            status, batches = creator.run_query_cached(
+                                plan['sql'], db_name, athena_output, creator.data_watermark(guard_layout)
+                            )
+                        if status == 'SUCCEEDED':
+                            if creator.query_cache is not None and not has_dated_keys(guard_layout):
+                                st.caption(f"ℹ️ Flat layout: cached results refresh only after the "
+                                           f"{creator.query_cache.ttl}s cache TTL")
+                            st.dataframe([dict(zip(batch.column_names, row))
+                                          for batch in batches for row in batch.rows()])
+                        else:
+                            st.error(f"Query failed: {status} (the workgroup cutoff cancels oversized scans)")
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+    
     # 디버깅 섹션
     with st.expander("🔧 Troubleshooting & Manual DDL"):
         st.markdown("""
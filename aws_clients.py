@@ -0,0 +1,135 @@
+# aws_clients.py - boto3 세션/클라이언트 풀 및 S3 목록 캐시
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+import boto3
+from botocore.config import Config
+
+# 연결 재사용을 위해 풀 크기를 늘리고, 제한(throttling) 시 적응형 재시도
+DEFAULT_CONFIG = Config(
+    max_pool_connections=50,
+    retries={'max_attempts': 10, 'mode': 'adaptive'}
+)
+
+
+def credential_fingerprint(aws_access_key_id=None, aws_secret_access_key=None,
+                           aws_session_token=None):
+    """자격 증명 식별용 해시 (원문은 보관하지 않음, 기본 자격 증명은 'default')"""
+    if not aws_access_key_id:
+        return 'default'
+    raw = '\x1f'.join([aws_access_key_id, aws_secret_access_key or '', aws_session_token or ''])
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+class ClientPool:
+    """(자격 증명 지문, 리전, 서비스)별 boto3 클라이언트 재사용
+
+    boto3 클라이언트는 스레드 안전하지만 Session에서 클라이언트를 만드는 과정은 그렇지 않으므로
+    생성은 잠금 안에서 한 번만 수행합니다. 자격 증명은 최근 사용한 max_credentials개까지만
+    보관하고(LRU), 호출자 정보는 identity_ttl초가 지나면 STS로 다시 확인합니다
+    (폐기된 키가 계속 연결된 것처럼 보이지 않도록).
+    """
+
+    def __init__(self, config=DEFAULT_CONFIG, max_credentials=64, identity_ttl=300):
+        self.config = config
+        self.max_credentials = max_credentials
+        self.identity_ttl = identity_ttl
+        self._sessions = OrderedDict()
+        self._clients = {}
+        self._identities = {}
+        self._lock = threading.Lock()
+
+    def _evict(self, fingerprint):
+        self._sessions.pop(fingerprint, None)
+        self._identities.pop(fingerprint, None)
+        for key in [key for key in self._clients if key[0] == fingerprint]:
+            del self._clients[key]
+
+    def session(self, **credentials):
+        fingerprint = credential_fingerprint(**credentials)
+        with self._lock:
+            if fingerprint not in self._sessions:
+                self._sessions[fingerprint] = boto3.Session(
+                    **{name: value for name, value in credentials.items() if value}
+                )
+                while len(self._sessions) > self.max_credentials:
+                    self._evict(next(iter(self._sessions)))
+            self._sessions.move_to_end(fingerprint)
+            return self._sessions[fingerprint]
+
+    def client(self, service_name, region_name, **credentials):
+        key = (credential_fingerprint(**credentials), region_name, service_name)
+        session = self.session(**credentials)
+        client = self._clients.get(key)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(key)
+                if client is None:
+                    client = session.client(service_name, region_name=region_name, config=self.config)
+                    self._clients[key] = client
+        return client
+
+    def caller_identity(self, region_name, **credentials):
+        """STS get_caller_identity 결과 (자격 증명별로 identity_ttl초 동안 재사용)"""
+        fingerprint = credential_fingerprint(**credentials)
+        cached = self._identities.get(fingerprint)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        identity = self.client('sts', region_name, **credentials).get_caller_identity()
+        with self._lock:
+            if fingerprint in self._sessions:
+                self._identities[fingerprint] = (time.monotonic() + self.identity_ttl, identity)
+        return identity
+
+    def clear(self, **credentials):
+        """특정 자격 증명(없으면 전체)의 세션/클라이언트 제거"""
+        with self._lock:
+            if not credentials:
+                self._sessions.clear()
+                self._clients.clear()
+                self._identities.clear()
+                return
+            self._evict(credential_fingerprint(**credentials))
+
+
+class ListingCache:
+    """S3 버킷/폴더 목록 캐시 (TTL + 명시적 무효화)
+
+    키는 (종류, 자격 증명 지문, 버킷, 접두사, ...) 튜플입니다.
+    """
+
+    def __init__(self, ttl=120, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        """캐시 값이 없거나 만료되면 loader()를 호출해 저장 (예외는 캐시하지 않음)"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                return entry[1]
+
+        value = loader()
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, bucket_name=None, prefix=None):
+        """전체, 버킷 단위, 또는 버킷 + 접두사 하위 항목 무효화"""
+        with self._lock:
+            if bucket_name is None:
+                self._entries.clear()
+                return
+            for key in list(self._entries):
+                if len(key) > 2 and key[2] == bucket_name:
+                    if prefix is None or (len(key) > 3 and key[3].startswith(prefix)):
+                        del self._entries[key]
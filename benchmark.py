@@ -0,0 +1,235 @@
+# benchmark.py - 로컬 처리 성능 벤치마크
+import argparse
+import json
+import math
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+from alerts import AlertEngine, SlidingWindow
+from generate_traffic import LogLineGenerator, write_corpus
+from log_parser import iter_batches, parse_text, LogSummary
+from parallel import ParallelLogProcessor
+from search_index import ObjectIndex, SearchIndexCache
+from sketches import HeavyHitters, HyperLogLog, TDigest
+
+def bench_parser(path, chunk_size, target_mbs=None):
+    """단일 코어 파서 처리량 측정 (MB/s, lines/s)"""
+    summary = LogSummary()
+    started = time.perf_counter()
+    with open(path, 'rb') as f:
+        for batch in iter_batches(f, chunk_size):
+            summary.update(batch)
+    elapsed = time.perf_counter() - started
+    mb = summary.bytes_read / (1024 * 1024)
+    print(f"parser (single core): {mb:.1f} MB, {summary.rows} rows, {summary.invalid_lines} invalid "
+          f"in {elapsed:.2f}s -> {mb / elapsed:.1f} MB/s, {summary.rows / elapsed:,.0f} lines/s")
+    if target_mbs and mb / elapsed < target_mbs:
+        # 단일 코어로는 목표에 못 미치므로 필요한 코어 수를 안내 (실제 합계는 parallel 벤치마크로 측정)
+        print(f"  below the {target_mbs:g} MB/s target on one core; ~{math.ceil(target_mbs / (mb / elapsed))} "
+              f"cores needed with parallel.py (measure with: benchmark.py parallel)")
+    if summary.invalid_lines:
+        # 합성 코퍼스는 모두 올바른 형식이므로 거부된 줄이 있으면 파서 정규식 문제
+        print(f"⚠️ {summary.invalid_lines} lines were rejected by the parser")
+    return summary
+
+
+def bench_parallel(path, workers, chunk_size, target_mbs=None):
+    """프로세스 풀 합계 처리량 측정 (워커 수별 MB/s와 1개 대비 배율, 목표 달성 여부)"""
+    baseline = None
+    best = (0.0, 0)
+    for count in workers:
+        processor = ParallelLogProcessor(max_workers=count, chunk_size=chunk_size,
+                                         task_bytes=64 * 1024 * 1024)
+        started = time.perf_counter()
+        aggregate = processor.process_files([path])
+        elapsed = time.perf_counter() - started
+        mb = aggregate.summary.bytes_read / (1024 * 1024)
+        baseline = baseline or mb / elapsed
+        print(f"parallel x{count}: {mb:.1f} MB, {aggregate.summary.rows} rows in {elapsed:.2f}s "
+              f"-> {mb / elapsed:.1f} MB/s aggregate ({mb / elapsed / baseline:.2f}x)")
+        best = max(best, (mb / elapsed, count))
+    if target_mbs:
+        verdict = 'meets' if best[0] >= target_mbs else 'below'
+        print(f"  best aggregate {best[0]:.1f} MB/s with {best[1]} workers ({os.cpu_count()} cores): "
+              f"{verdict} the {target_mbs:g} MB/s target")
+
+
+def _exact_quantile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def bench_sketches(count, parts=24, seed=0, top_n=20):
+    """스케치 정확도/크기 벤치마크: parts개(시간별) 스케치를 병합한 결과 vs 정확한 값"""
+    rng = random.Random(seed)
+    ips = [f"{rng.getrandbits(32):08x}" for _ in range(count)]
+    keys = [f"key{int(rng.paretovariate(1.1))}" for _ in range(count)]
+    latencies = [rng.lognormvariate(3, 1) for _ in range(count)]
+
+    started = time.perf_counter()
+    hll, hitters, digest = HyperLogLog(), HeavyHitters(), TDigest()
+    step = -(-count // parts)
+    for start in range(0, count, step):
+        part_hll, part_hitters, part_digest = HyperLogLog(), HeavyHitters(), TDigest()
+        part_hll.add_many(ips[start:start + step])
+        part_hitters.add_many(keys[start:start + step])
+        part_digest.add_many(latencies[start:start + step])
+        hll.merge(part_hll)
+        hitters.merge(part_hitters)
+        digest.merge(part_digest)
+    sketch_elapsed = time.perf_counter() - started
+    sketch_bytes = sum(len(json.dumps(sketch.to_dict())) for sketch in (hll, hitters, digest))
+
+    started = time.perf_counter()
+    exact_distinct = len(set(ips))
+    exact_top = Counter(keys).most_common(top_n)
+    sorted_latencies = sorted(latencies)
+    exact_elapsed = time.perf_counter() - started
+
+    estimate = hll.count()
+    print(f"sketches: {count:,} rows in {parts} merged parts, {sketch_bytes / 1024:.0f} KB serialized, "
+          f"{sketch_elapsed:.2f}s (exact in-memory: {exact_elapsed:.2f}s)")
+    print(f"  HyperLogLog distinct: {estimate:,} vs exact {exact_distinct:,} "
+          f"-> {abs(estimate - exact_distinct) / exact_distinct:.2%} error "
+          f"(std. error {hll.relative_error():.2%})")
+
+    bound, probability = hitters.error_bound()
+    estimated_top = hitters.top(top_n)
+    recall = len({key for key, _ in estimated_top} & {key for key, _ in exact_top}) / len(exact_top)
+    exact_counts = Counter(keys)
+    overestimate = max(estimated - exact_counts[key] for key, estimated in estimated_top)
+    print(f"  Count-Min top-{top_n}: recall {recall:.0%}, max overestimate {overestimate:,} "
+          f"(bound {bound:,.0f} with p={probability:.3f})")
+
+    for q in (0.5, 0.9, 0.99, 0.999):
+        approx, exact = digest.quantile(q), _exact_quantile(sorted_latencies, q)
+        rank = sum(1 for value in sorted_latencies if value <= approx) / count
+        print(f"  t-digest p{q * 100:g}: {approx:.2f} vs exact {exact:.2f} "
+              f"-> value error {abs(approx - exact) / exact:.2%}, rank error {abs(rank - q):.3%}")
+
+
+def bench_alerts(count, batch_lines=5000, rate=20000, seed=0):
+    """알림 엔진 처리량: 배치마다 누적 + 평가 (파싱 포함/제외 lines/s, 시계열당 메모리)"""
+    generator = LogLineGenerator(rate=rate, seed=seed, start=datetime(2024, 1, 1))
+    blocks = [''.join(generator.lines(min(batch_lines, count - start)))
+              for start in range(0, count, batch_lines)]
+
+    engine = AlertEngine()
+    parse_seconds = engine_seconds = 0.0
+    events = 0
+    for block in blocks:
+        started = time.perf_counter()
+        batch = parse_text(block)
+        parsed = time.perf_counter()
+        engine.update(batch)
+        events += len(engine.evaluate())
+        engine_seconds += time.perf_counter() - parsed
+        parse_seconds += parsed - started
+
+    # 시계열당 메모리: 윈도 1000개를 만들 때 실제 할당량 (객체 헤더, array 버퍼 포함)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    windows = [SlidingWindow() for _ in range(1000)]
+    series_bytes = (tracemalloc.get_traced_memory()[0] - before) / len(windows)
+    tracemalloc.stop()
+    window = windows[0]
+    print(f"alerts: {engine.rows:,} rows ({count / rate:.0f}s of traffic at {rate:,} req/s), "
+          f"{len(engine.series):,} series, {events} alert events")
+    print(f"  engine only: {engine.rows / engine_seconds:,.0f} lines/s, "
+          f"with parsing: {engine.rows / (engine_seconds + parse_seconds):,.0f} lines/s")
+    print(f"  ~{series_bytes / 1024:.1f} KB per series ({len(window.epochs)} slots x "
+          f"{window.slot_seconds}s), ~{series_bytes * len(engine.series) / 1024 ** 2:.1f} MB total")
+
+
+def bench_search(objects, lines_per_object=200, seed=0):
+    """사이드카 인덱스: 생성 처리량, 원본 대비 크기, 후보 객체 선택 시간과 거짓 양성 객체 수"""
+    generator = LogLineGenerator(rate=10, seed=seed, start=datetime(2024, 1, 1))
+    rng = random.Random(seed)
+    path = os.path.join(tempfile.mkdtemp(prefix='search-index-'), 'cache.sqlite')
+    cache = SearchIndexCache(path)
+    needles = []
+    raw_bytes = index_bytes = 0
+    build_seconds = 0.0
+    for number in range(objects):
+        text = ''.join(generator.lines(lines_per_object))
+        key = f"logs/{generator.current_time:%Y-%m-%d-%H-%M-%S}-{number:08X}"
+        started = time.perf_counter()
+        batch = parse_text(text)
+        index = ObjectIndex('bench', key, len(text)).update(batch).finish()
+        index_bytes += len(index.to_bytes())
+        build_seconds += time.perf_counter() - started
+        raw_bytes += len(text)
+        cache.add(index)
+        if rng.random() < 0.01:
+            row = rng.randrange(batch.num_rows)
+            needles.append((key, batch.columns['requestid'][row]))
+    cache.commit()
+
+    lookups = [({'requestid': value}, {key}) for key, value in needles[:20]]
+    lookups.append(({'requestid': 'NOT-A-REQUEST-ID'}, set()))
+    started = time.perf_counter()
+    false_positives = 0
+    for criteria, expected in lookups:
+        found, _ = cache.candidates('bench', 'logs/', criteria)
+        found = {key for key, _ in found}
+        if not expected <= found:
+            raise AssertionError(f"Bloom filter missed {criteria}")
+        false_positives += len(found - expected)
+    elapsed = (time.perf_counter() - started) / len(lookups)
+    cache.close()
+    rows = objects * lines_per_object
+    print(f"search index: {objects:,} objects, {rows:,} rows, built at {rows / build_seconds:,.0f} lines/s, "
+          f"{index_bytes / objects:,.0f} B per object ({index_bytes / raw_bytes:.2%} of raw logs)")
+    print(f"  requestid lookup: {elapsed * 1000:.0f} ms per query over {objects:,} objects, "
+          f"{false_positives / len(lookups):.1f} false-positive objects per query "
+          f"({false_positives / len(lookups) / objects:.3%})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="S3 Log Analyzer local benchmarks")
+    parser.add_argument('--size-gb', type=float, default=2.0, help="synthetic corpus size")
+    parser.add_argument('--corpus', help="corpus path (generated if missing or smaller than --size-gb)")
+    parser.add_argument('--chunk-mb', type=int, default=8, help="parser read chunk size")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, os.cpu_count() or 1],
+                        help="worker counts for the parallel benchmark")
+    parser.add_argument('--target-mbs', type=float, default=200, help="throughput target to report against")
+    parser.add_argument('--sketch-rows', type=int, default=1000000, help="rows for the sketch benchmark")
+    parser.add_argument('--alert-rows', type=int, default=1000000, help="rows for the alerting benchmark")
+    parser.add_argument('--search-objects', type=int, default=10000, help="objects for the search index benchmark")
+    parser.add_argument('benchmarks', nargs='*', metavar='{parser,parallel,sketches,alerts,search}',
+                        help="default: parser parallel")
+    args = parser.parse_args()
+    # 목록 기본값은 argparse choices 검사를 통과하지 못하므로 직접 검사
+    # (기본은 단일 코어 파서와 프로세스 풀 합계 처리량을 함께 측정)
+    args.benchmarks = args.benchmarks or ['parser', 'parallel']
+    unknown = set(args.benchmarks) - {'parser', 'parallel', 'sketches', 'alerts', 'search'}
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    if 'sketches' in args.benchmarks:
+        bench_sketches(args.sketch_rows)
+    if 'alerts' in args.benchmarks:
+        bench_alerts(args.alert_rows)
+    if 'search' in args.benchmarks:
+        bench_search(args.search_objects)
+    if 'parser' not in args.benchmarks and 'parallel' not in args.benchmarks:
+        return
+
+    path = args.corpus or os.path.join(tempfile.gettempdir(), 's3_access_log_corpus.log')
+    size = int(args.size_gb * 1024 ** 3)
+    if not os.path.exists(path) or os.path.getsize(path) < size:
+        print(f"Generating {args.size_gb} GB corpus at {path} ...")
+        write_corpus(path, size)
+
+    if 'parser' in args.benchmarks:
+        bench_parser(path, args.chunk_mb * 1024 * 1024, args.target_mbs)
+    if 'parallel' in args.benchmarks:
+        bench_parallel(path, args.workers, args.chunk_mb * 1024 * 1024, args.target_mbs)
+
+
+if __name__ == "__main__":
+    main()
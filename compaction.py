@@ -0,0 +1,403 @@
+# compaction.py - 원본 Access Log를 날짜 파티션 Parquet로 압축(compaction)
+import argparse
+import os
+import re
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from log_layout import LAYOUT_DATE_PARTITIONED, LAYOUT_SIMPLE_DATE, classify_key, date_predicate
+from log_parser import COLUMNS, MONTHS, iter_object_batches, parse_requestdatetime
+from s3_utils import iter_objects, split_s3_uri
+
+# 원본 STRING 컬럼 중 Parquet에서 타입을 바꾸는 컬럼
+TYPED_COLUMNS = {
+    'requestdatetime': 'TIMESTAMP',
+    'httpstatus': 'INT',
+    'totaltime': 'INT',
+    'turnaroundtime': 'INT',
+}
+COMPACTED_COLUMNS = [(name, TYPED_COLUMNS.get(name, type_name)) for name, type_name in COLUMNS]
+
+# 완료된 시간 파티션 표시 파일 (Athena/Hive는 '_'로 시작하는 파일을 읽지 않음)
+MARKER_NAME = '_COMPACTED'
+
+# 한 번의 INSERT INTO는 최대 100개 파티션까지 쓸 수 있음
+MAX_HOURS_PER_INSERT = 96
+
+_OBJECT_HOUR_RE = re.compile(r'(\d{4}-\d{2}-\d{2}-\d{2})-\d{2}-\d{2}-[^/]*$')
+_PARTITION_RE = re.compile(r'dt=(\d{4}-\d{2}-\d{2})/hour=(\d{2})/' + MARKER_NAME + '$')
+
+_HOUR_FORMAT = '%Y-%m-%d-%H'
+
+
+def object_hour(key):
+    """로그 객체 이름의 전송 시각(YYYY-MM-DD-HH) 반환 (형식이 다르면 None)"""
+    match = _OBJECT_HOUR_RE.search(key)
+    return match.group(1) if match else None
+
+
+def record_hour(value):
+    """'06/Feb/2019:00:00:38 +0000' -> '2019-02-06-00'"""
+    return f"{value[7:11]}-{MONTHS[value[3:6]]:02d}-{value[0:2]}-{value[12:14]}"
+
+
+def partition_path(hour):
+    """'2024-01-15-07' -> 'dt=2024-01-15/hour=07/'"""
+    return f"dt={hour[:10]}/hour={hour[11:13]}/"
+
+
+def _to_int(values):
+    return [None if not value or value == '-' else int(value) for value in values]
+
+
+def to_typed_arrow(batch):
+    """LogBatch를 Parquet용 타입(timestamp/int) Arrow RecordBatch로 변환"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("pyarrow is required for local compaction (pip install pyarrow)")
+
+    arrow_types = {'STRING': pa.string(), 'BIGINT': pa.int64(), 'INT': pa.int32(),
+                   'TIMESTAMP': pa.timestamp('ms')}
+    arrays = []
+    for name, type_name in COMPACTED_COLUMNS:
+        values = batch.columns[name]
+        if type_name == 'TIMESTAMP':
+            values = [parse_requestdatetime(value) for value in values]
+        elif type_name == 'INT':
+            values = _to_int(values)
+        arrays.append(pa.array(values, type=arrow_types[type_name]))
+    return pa.RecordBatch.from_arrays(arrays, names=[name for name, _ in COMPACTED_COLUMNS])
+
+
+def compacted_table_ddl(database_name, table_name, s3_location, start_date, columns=COMPACTED_COLUMNS):
+    """Parquet 압축 테이블 DDL (dt/hour 파티션 프로젝션)"""
+    columns = ',\n          '.join(f"`{name}` {type_name}" for name, type_name in columns)
+    return f"""
+        CREATE EXTERNAL TABLE IF NOT EXISTS `{database_name}.{table_name}`(
+          {columns})
+        PARTITIONED BY (`dt` STRING, `hour` STRING)
+        STORED AS PARQUET
+        LOCATION
+          '{s3_location}'
+        TBLPROPERTIES (
+          'parquet.compression'='SNAPPY',
+          'projection.enabled'='true',
+          'projection.dt.type'='date',
+          'projection.dt.format'='yyyy-MM-dd',
+          'projection.dt.range'='{start_date},NOW',
+          'projection.dt.interval'='1',
+          'projection.dt.interval.unit'='DAYS',
+          'projection.hour.type'='integer',
+          'projection.hour.range'='0,23',
+          'projection.hour.digits'='2')
+        """
+
+
+REQUEST_TIME_SQL = "parse_datetime(requestdatetime, 'dd/MMM/yyyy:HH:mm:ss Z')"
+
+
+def hour_range_condition(first_hour, last_hour=None, settle_hours=0, layout=None):
+    """레코드 시각이 [first_hour, last_hour + 1시간) 범위인 WHERE 조건
+
+    last_hour가 없으면 first_hour 이후 전체입니다. 원본 테이블이 날짜 파티션이면
+    지연 도착분(settle_hours)까지 포함한 날짜 조건을 앞에 붙여 프루닝합니다.
+    """
+    start = datetime.strptime(first_hour, _HOUR_FORMAT)
+    conditions = [f"{REQUEST_TIME_SQL} >= TIMESTAMP '{start.strftime('%Y-%m-%d %H:00:00')} UTC'"]
+    partition_end = None
+    if last_hour is not None:
+        end = datetime.strptime(last_hour, _HOUR_FORMAT) + timedelta(hours=1)
+        conditions.append(f"{REQUEST_TIME_SQL} < TIMESTAMP '{end.strftime('%Y-%m-%d %H:00:00')} UTC'")
+        partition_end = end + timedelta(hours=settle_hours)
+    partition_condition = date_predicate(layout, start, partition_end)
+    if partition_condition:
+        conditions.insert(0, partition_condition)
+    return '\n          AND '.join(conditions)
+
+
+def insert_hours_sql(database_name, target_table, raw_table, first_hour, last_hour, settle_hours,
+                     layout=None):
+    """[first_hour, last_hour] 구간 레코드를 Parquet 테이블에 INSERT INTO 하는 쿼리"""
+    select_columns = []
+    for name, type_name in COMPACTED_COLUMNS:
+        if type_name == 'TIMESTAMP':
+            select_columns.append(f"CAST({REQUEST_TIME_SQL} AS TIMESTAMP)")
+        elif type_name == 'INT':
+            select_columns.append(f"TRY_CAST({name} AS INTEGER)")
+        else:
+            select_columns.append(f'"{name}"')
+    select_list = ',\n          '.join(select_columns)
+    where_clause = hour_range_condition(first_hour, last_hour, settle_hours, layout)
+
+    return f"""
+        INSERT INTO {database_name}.{target_table}
+        SELECT
+          {select_list},
+          date_format({REQUEST_TIME_SQL}, '%Y-%m-%d') AS dt,
+          date_format({REQUEST_TIME_SQL}, '%H') AS "hour"
+        FROM {database_name}.{raw_table}
+        WHERE {where_clause}
+        """
+
+
+def record_hours(delivery_hours, lag_hours):
+    """전송 시각 목록 -> 레코드가 있을 수 있는 시간 목록 (각 전송 시각과 이전 lag_hours시간)
+
+    S3 로그 객체에는 전송 시각 이전 시간의 레코드가 들어 있으므로, 전송된 객체가 없는
+    시간의 레코드도 처리 대상이 되도록 레코드 시각 범위로 넓힙니다.
+    """
+    hours = set()
+    for hour in delivery_hours:
+        delivered = datetime.strptime(hour, _HOUR_FORMAT)
+        for lag in range(lag_hours + 1):
+            hours.add((delivered - timedelta(hours=lag)).strftime(_HOUR_FORMAT))
+    return sorted(hours)
+
+
+def hour_runs(hours, max_hours=MAX_HOURS_PER_INSERT):
+    """정렬된 시간 목록을 연속 구간 [(first, last), ...]으로 묶기"""
+    runs = []
+    for hour in sorted(hours):
+        current = datetime.strptime(hour, _HOUR_FORMAT)
+        if runs:
+            first, last = runs[-1]
+            previous = datetime.strptime(last, _HOUR_FORMAT)
+            span = current - datetime.strptime(first, _HOUR_FORMAT)
+            if current - previous == timedelta(hours=1) and span < timedelta(hours=max_hours):
+                runs[-1] = (first, hour)
+                continue
+        runs.append((hour, hour))
+    return runs
+
+
+class HourlyPartitionTracker:
+    """원본 로그 시간별 처리 현황 관리 (dt/hour 파티션 대상 경로 기준)
+
+    이미 처리된 시간은 대상 경로의 _COMPACTED 표시 파일로 판단하여 건너뜁니다.
+    S3 로그는 늦게 도착할 수 있으므로 settle_hours가 지난 시간만 처리합니다.
+    처리 대상은 객체 전송 시각이 아니라 객체에 들어 있을 수 있는 레코드 시각 범위로 정하므로,
+    전송된 객체가 없는 시간(다음 시간 객체에만 레코드가 있는 경우)도 빠지지 않습니다.
+    """
+
+    def __init__(self, s3_client, source_location, dest_location, settle_hours=2):
+        self.s3_client = s3_client
+        self.source_bucket, self.source_prefix = split_s3_uri(source_location)
+        self.dest_bucket, self.dest_prefix = split_s3_uri(dest_location)
+        self.dest_location = dest_location
+        self.settle_hours = settle_hours
+        # 객체에 들어 있을 수 있는 레코드의 최대 지연 (시간 경계 직후 전송분 때문에 최소 1시간)
+        self.lag_hours = max(1, settle_hours)
+        # 완료 표시가 있는 마지막 시간 (처음 필요할 때 대상 경로에서 찾음)
+        self.completed_watermark = None
+
+    def last_completed_hour(self):
+        """완료 표시가 있는 마지막 시간 (없으면 None)
+
+        날짜 폴더(dt=)만 구분자로 목록 조회한 뒤 최근 날짜 폴더부터 표시 파일을 찾습니다.
+        """
+        if self.completed_watermark is None:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            day_prefixes = []
+            for page in paginator.paginate(Bucket=self.dest_bucket, Prefix=f"{self.dest_prefix}dt=",
+                                           Delimiter='/'):
+                day_prefixes.extend(prefix['Prefix'] for prefix in page.get('CommonPrefixes', []))
+            for day_prefix in sorted(day_prefixes, reverse=True):
+                hours = [f"{match.group(1)}-{match.group(2)}"
+                         for match in (_PARTITION_RE.search(obj['Key'])
+                                       for obj in iter_objects(self.s3_client, self.dest_bucket, day_prefix))
+                         if match]
+                if hours:
+                    self.completed_watermark = max(hours)
+                    break
+        return self.completed_watermark
+
+    def _source_start_after(self, hour):
+        """hour 전송분부터 원본 목록을 조회할 StartAfter 키 (날짜순 키가 아니면 None)
+
+        원본 경로 바로 아래가 날짜 폴더(YYYY/MM/DD/)이거나 날짜로 시작하는 객체 이름일 때만
+        키 이름이 전송 시각순이므로 범위를 좁힐 수 있습니다.
+        """
+        response = self.s3_client.list_objects_v2(Bucket=self.source_bucket, Prefix=self.source_prefix,
+                                                  MaxKeys=1)
+        contents = response.get('Contents', [])
+        if not contents:
+            return None
+        layout, base, _ = classify_key(contents[0]['Key'])
+        if base != self.source_prefix:
+            return None
+        if layout == LAYOUT_DATE_PARTITIONED:
+            day = datetime.strptime(hour, _HOUR_FORMAT)
+            return f"{base}{day.strftime('%Y/%m/%d')}/{hour}"
+        if layout == LAYOUT_SIMPLE_DATE:
+            return f"{base}{hour}"
+        return None
+
+    def raw_objects_by_hour(self):
+        """원본 로그 객체를 전송 시각(시간 단위)별로 묶기
+
+        완료된 마지막 시간보다 앞선 객체에는 미처리 시간의 레코드가 없으므로,
+        그 시간의 전송분부터만 목록 조회합니다.
+        """
+        since_hour = self.last_completed_hour()
+        start_after = self._source_start_after(since_hour) if since_hour else None
+        objects = {}
+        for obj in iter_objects(self.s3_client, self.source_bucket, self.source_prefix, start_after):
+            hour = object_hour(obj['Key'])
+            if hour:
+                objects.setdefault(hour, []).append(obj['Key'])
+        return objects
+
+    def completed_hours(self, hours=None):
+        """이미 처리 완료된 시간 목록
+
+        hours가 있으면 그 시간들의 표시 파일만 확인합니다
+        (키 이름이 시간순이므로 첫 시간의 날짜 폴더부터 마지막 시간까지만 목록 조회).
+        """
+        start_after = None
+        if hours is not None:
+            hours = set(hours)
+            if not hours:
+                return set()
+            last_hour = max(hours)
+            start_after = f"{self.dest_prefix}dt={min(hours)[:10]}/"
+        completed = set()
+        for obj in iter_objects(self.s3_client, self.dest_bucket, self.dest_prefix, start_after):
+            match = _PARTITION_RE.search(obj['Key'])
+            if not match:
+                continue
+            hour = f"{match.group(1)}-{match.group(2)}"
+            if hours is not None and hour > last_hour:
+                break
+            completed.add(hour)
+        return completed if hours is None else completed & hours
+
+    def record_hours(self, raw_objects):
+        """전송된 객체들에 레코드가 있을 수 있는 시간 목록 (전송 시각 이전 lag_hours시간 포함)"""
+        return record_hours(raw_objects, self.lag_hours)
+
+    def pending_hours(self, raw_objects=None, now=None):
+        """처리 대상 시간 목록 (아직 열려 있거나 지연 도착 대기 중인 시간 제외)"""
+        raw_objects = self.raw_objects_by_hour() if raw_objects is None else raw_objects
+        now = now or datetime.utcnow()
+        cutoff = (now - timedelta(hours=self.settle_hours + 1)).strftime(_HOUR_FORMAT)
+        candidates = [hour for hour in self.record_hours(raw_objects) if hour <= cutoff]
+        done = self.completed_hours(candidates)
+        return [hour for hour in candidates if hour not in done]
+
+    def mark_completed(self, hours):
+        for hour in hours:
+            self.s3_client.put_object(
+                Bucket=self.dest_bucket,
+                Key=f"{self.dest_prefix}{partition_path(hour)}{MARKER_NAME}",
+                Body=b''
+            )
+            self.completed_watermark = max(hour, self.completed_watermark or hour)
+
+    def _source_keys(self, raw_objects, first_hour, last_hour):
+        """구간 레코드가 들어 있을 수 있는 원본 객체 (지연 도착분 포함)"""
+        end = datetime.strptime(last_hour, _HOUR_FORMAT) + timedelta(hours=self.lag_hours)
+        end_hour = end.strftime(_HOUR_FORMAT)
+        keys = []
+        for hour in sorted(raw_objects):
+            if first_hour <= hour <= end_hour:
+                keys.extend(raw_objects[hour])
+        return keys
+
+
+class LogCompactor(HourlyPartitionTracker):
+    """원본 로그 -> dt/hour 파티션 Parquet 증분 압축"""
+
+    def compact_local(self, now=None, hours_per_run=24, compression='snappy'):
+        """로컬 파서로 Parquet 파일을 만들어 업로드 (pyarrow 필요)"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("pyarrow is required for local compaction (pip install pyarrow)")
+
+        raw_objects = self.raw_objects_by_hour()
+        pending = self.pending_hours(raw_objects, now)
+        written = []
+
+        for index in range(0, len(pending), hours_per_run):
+            window = set(pending[index:index + hours_per_run])
+            first_hour, last_hour = min(window), max(window)
+            workdir = tempfile.mkdtemp(prefix='compaction-')
+            writers = {}
+            try:
+                for key in self._source_keys(raw_objects, first_hour, last_hour):
+                    for batch in iter_object_batches(self.s3_client, self.source_bucket, key):
+                        if not batch.num_rows:
+                            continue
+                        # 레코드 시각 기준으로 행을 시간 파티션별로 분배
+                        rows_by_hour = {}
+                        for row, value in enumerate(batch.columns['requestdatetime']):
+                            hour = record_hour(value)
+                            if hour in window:
+                                rows_by_hour.setdefault(hour, []).append(row)
+                        if not rows_by_hour:
+                            continue
+                        record_batch = to_typed_arrow(batch)
+                        for hour, rows in rows_by_hour.items():
+                            if hour not in writers:
+                                path = os.path.join(workdir, f"{hour}.parquet")
+                                writers[hour] = (path, pq.ParquetWriter(
+                                    path, record_batch.schema, compression=compression))
+                            writers[hour][1].write_batch(record_batch.take(pa.array(rows)))
+
+                for hour in sorted(writers):
+                    path, writer = writers[hour]
+                    writer.close()
+                    self.s3_client.upload_file(
+                        path, self.dest_bucket,
+                        f"{self.dest_prefix}{partition_path(hour)}part-00000.parquet"
+                    )
+                # 레코드가 없는 시간도 표시하여 다시 처리하지 않음
+                self.mark_completed(sorted(window))
+                written.extend(sorted(window))
+            finally:
+                for _, writer in writers.values():
+                    if writer.is_open:
+                        writer.close()
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        return written
+
+    def athena_queries(self, database_name, target_table, raw_table, layout=None, raw_objects=None,
+                       now=None):
+        """Athena INSERT INTO 경로: [(쿼리, 해당 시간 목록), ...] 반환"""
+        pending = self.pending_hours(raw_objects, now)
+        queries = []
+        for first_hour, last_hour in hour_runs(pending):
+            hours = [hour for hour in pending if first_hour <= hour <= last_hour]
+            sql = insert_hours_sql(database_name, target_table, raw_table, first_hour, last_hour,
+                                   self.lag_hours, layout)
+            queries.append((sql, hours))
+        return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact raw S3 access logs into partitioned Parquet")
+    parser.add_argument('source', help="raw log location, e.g. s3://log-bucket/logs/")
+    parser.add_argument('dest', help="Parquet location, e.g. s3://log-bucket/compacted/")
+    parser.add_argument('--region', default=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    parser.add_argument('--settle-hours', type=int, default=2, help="wait for late log delivery")
+    parser.add_argument('--interval', type=int, default=0, help="repeat every N seconds (0 = run once)")
+    args = parser.parse_args()
+
+    import boto3
+    compactor = LogCompactor(boto3.client('s3', region_name=args.region), args.source, args.dest,
+                             settle_hours=args.settle_hours)
+    while True:
+        hours = compactor.compact_local()
+        print(f"✓ Compacted {len(hours)} hours" + (f" ({hours[0]} ~ {hours[-1]})" if hours else ""))
+        if not args.interval:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
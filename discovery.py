@@ -0,0 +1,122 @@
+# discovery.py - 대규모 계정용 병렬 버킷/접두사 탐색 (리전 확인, 로그 버킷 탐지, 접두사 트리)
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+from log_layout import LAYOUT_FLAT, classify_key
+
+
+def normalize_location(location_constraint):
+    """GetBucketLocation 값을 리전 이름으로 변환"""
+    if not location_constraint:
+        return 'us-east-1'
+    if location_constraint == 'EU':
+        return 'eu-west-1'
+    return location_constraint
+
+
+class BucketDiscovery:
+    """스레드 풀로 버킷 리전/로그 설정/접두사 트리를 동시에 조회
+
+    client_factory(region)은 해당 리전의 S3 클라이언트를 반환해야 합니다 (ClientPool.client 등).
+    """
+
+    def __init__(self, client_factory, default_region='us-east-1', max_workers=32):
+        self.client_factory = client_factory
+        self.default_region = default_region
+        self.max_workers = max_workers
+
+    def _map(self, fn, items):
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            return list(executor.map(fn, items))
+
+    def bucket_region(self, bucket_name):
+        """버킷 리전 (GetBucketLocation, 실패 시 HeadBucket 응답 헤더, 모두 실패하면 None)"""
+        s3_client = self.client_factory(self.default_region)
+        try:
+            response = s3_client.get_bucket_location(Bucket=bucket_name)
+            return normalize_location(response.get('LocationConstraint'))
+        except ClientError:
+            pass
+        try:
+            response = s3_client.head_bucket(Bucket=bucket_name)
+            headers = response['ResponseMetadata']['HTTPHeaders']
+        except ClientError as e:
+            # 다른 리전 버킷은 301/403 응답에도 리전 헤더가 포함됨
+            headers = e.response.get('ResponseMetadata', {}).get('HTTPHeaders', {})
+        return headers.get('x-amz-bucket-region')
+
+    def resolve_regions(self, bucket_names):
+        """{버킷: 리전} (병렬 조회)"""
+        bucket_names = list(bucket_names)
+        return dict(zip(bucket_names, self._map(self.bucket_region, bucket_names)))
+
+    def logging_target(self, bucket_name, region):
+        """버킷의 서버 액세스 로그 대상 (TargetBucket, TargetPrefix) 또는 None"""
+        try:
+            response = self.client_factory(region or self.default_region).get_bucket_logging(
+                Bucket=bucket_name
+            )
+        except ClientError:
+            return None
+        logging_enabled = response.get('LoggingEnabled')
+        if not logging_enabled:
+            return None
+        return logging_enabled['TargetBucket'], logging_enabled.get('TargetPrefix', '')
+
+    def looks_like_log_bucket(self, bucket_name, region, prefix='', sample_size=50):
+        """키 이름 샘플이 S3 Access Log 형식(날짜 기반 이름)인지 확인"""
+        try:
+            response = self.client_factory(region or self.default_region).list_objects_v2(
+                Bucket=bucket_name, Prefix=prefix, MaxKeys=sample_size
+            )
+        except ClientError:
+            return False
+        keys = [obj['Key'] for obj in response.get('Contents', [])]
+        return bool(keys) and any(classify_key(key)[0] != LAYOUT_FLAT for key in keys)
+
+    def find_log_buckets(self, bucket_regions, sample_keys=True):
+        """로그를 보관하는 버킷 탐지: {대상 버킷: [{'source': 소스 버킷, 'prefix': 접두사}, ...]}
+
+        소스 버킷의 로깅 설정을 병렬로 조회하고, sample_keys이면 설정에 없는 버킷도
+        키 이름 패턴으로 확인합니다 (다른 계정이 로그를 보내는 경우).
+        """
+        items = list(bucket_regions.items())
+        targets = {}
+        for (source, _), target in zip(items, self._map(lambda item: self.logging_target(*item), items)):
+            if target:
+                targets.setdefault(target[0], []).append({'source': source, 'prefix': target[1]})
+
+        if sample_keys:
+            candidates = [(name, region) for name, region in items if name not in targets]
+            matches = self._map(lambda item: self.looks_like_log_bucket(*item), candidates)
+            for (name, _), is_log_bucket in zip(candidates, matches):
+                if is_log_bucket:
+                    targets.setdefault(name, [])
+
+        return {name: sources for name, sources in targets.items() if name in bucket_regions}
+
+    def _child_prefixes(self, s3_client, bucket_name, prefix):
+        paginator = s3_client.get_paginator('list_objects_v2')
+        children = []
+        for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix, Delimiter='/'):
+            children.extend(info['Prefix'] for info in page.get('CommonPrefixes', []))
+        return children
+
+    def walk_prefixes(self, bucket_name, region=None, prefix='', max_depth=3, max_prefixes=10000):
+        """접두사 트리를 깊이별로 동시에 탐색하여 모든 하위 접두사 목록 반환 (정렬)"""
+        s3_client = self.client_factory(region or self.default_region)
+        found = []
+        level = [prefix]
+        for _ in range(max_depth):
+            if not level or len(found) >= max_prefixes:
+                break
+            children = self._map(
+                lambda current: self._child_prefixes(s3_client, bucket_name, current), level
+            )
+            level = [child for group in children for child in group]
+            found.extend(level)
+        return sorted(found[:max_prefixes])
@@ -0,0 +1,339 @@
+# federation.py - 여러 리전/계정의 S3 로그 데이터베이스에 같은 분석을 동시에 실행하고 결과 병합
+#
+# 병합 방식:
+# - sum: 그룹별 합계(COUNT, SUM)를 더함
+# - top: 리전별 상위 후보(limit x TOP_CANDIDATE_FACTOR개)를 합산한 뒤 다시 순위 매김
+#   (어떤 리전의 후보 목록 밖에 있던 값은 그 리전 몫이 빠지므로 순위 경계 근처 값은 근사)
+# - hll: 리전별 HyperLogLog 레지스터(Athena에서 계산)를 최댓값으로 병합해 전체 고유 값 수 추정
+#   (순위 정의는 sketches.HyperLogLog.add_hash와 같지만 해시가 xxhash64라 blake2b를 쓰는
+#    SketchBuilder 스케치와는 같은 값이 다른 레지스터로 가므로 서로 병합하면 안 됨)
+import argparse
+import heapq
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+
+from log_layout import PARTITION_COLUMN
+from query_manager import QueryExecutionManager
+from query_results import iter_result_pages
+from sketches import HyperLogLog
+
+# 기본 분석 대상 데이터베이스 이름 접두사 (앱의 기본 데이터베이스 이름 s3_logs_<bucket>)
+DATABASE_PREFIX = 's3_logs_'
+# 원본 로그 테이블 SerDe (provisioning.py / create_s3_access_log_table과 같음)
+RAW_SERDE = 'org.apache.hadoop.hive.serde2.RegexSerDe'
+# top 병합 시 리전별로 가져올 후보 배수
+TOP_CANDIDATE_FACTOR = 10
+# 임시 자격 증명 만료 전 갱신 여유 (초)
+CREDENTIAL_REFRESH_MARGIN = 300
+
+HLL_PRECISION = 14
+
+# HyperLogLog 레지스터: xxhash64 상위 14비트 = 레지스터, 나머지 50비트의 선행 0 개수 + 1 = 순위 (최대 51)
+# 큰 값의 log2는 double 정밀도 문제가 있어 나머지를 상위 40비트/하위 10비트로 나누어 계산
+# (sketches.HyperLogLog.add_hash와 같은 순위)
+_HLL_SQL = """
+SELECT bucket_index, MAX(register_rank) AS register_rank FROM (
+    SELECT bitwise_right_shift(h, 50) AS bucket_index,
+           CASE WHEN bitwise_right_shift(bitwise_and(h, 1125899906842623), 10) <> 0
+                THEN 40 - CAST(floor(log2(bitwise_right_shift(bitwise_and(h, 1125899906842623), 10))) AS INTEGER)
+                WHEN bitwise_and(h, 1023) <> 0
+                THEN 50 - CAST(floor(log2(bitwise_and(h, 1023))) AS INTEGER)
+                ELSE 51
+           END AS register_rank
+    FROM (
+        SELECT from_big_endian_64(xxhash64(to_utf8({column}))) AS h
+        FROM {table}
+        WHERE {where} AND {column} IS NOT NULL AND {column} <> '-'
+    )
+)
+GROUP BY bucket_index
+"""
+
+# 분석: SQL 템플릿({table}, {where}, {limit}), 병합 방식, 그룹 컬럼, 값 컬럼, 정렬 컬럼
+FEDERATED_ANALYSES = {
+    'Requests by HTTP status': {
+        'sql': "SELECT httpstatus, COUNT(*) AS requests, SUM(COALESCE(bytessent, 0)) AS bytes_sent\n"
+               "FROM {table} WHERE {where} GROUP BY httpstatus",
+        'merge': 'sum', 'group_by': ['httpstatus'], 'values': ['requests', 'bytes_sent'],
+        'order_by': 'requests',
+    },
+    'Errors by code': {
+        'sql': "SELECT errorcode, COUNT(*) AS requests FROM {table}\n"
+               "WHERE {where} AND errorcode <> '-' GROUP BY errorcode",
+        'merge': 'sum', 'group_by': ['errorcode'], 'values': ['requests'], 'order_by': 'requests',
+    },
+    'Top requested files': {
+        'sql': "SELECT bucket_name, key, COUNT(*) AS requests FROM {table}\n"
+               "WHERE {where} AND key IS NOT NULL GROUP BY bucket_name, key ORDER BY requests DESC LIMIT {limit}",
+        'merge': 'top', 'group_by': ['bucket_name', 'key'], 'values': ['requests'], 'order_by': 'requests',
+    },
+    'Top client IPs': {
+        'sql': "SELECT remoteip, COUNT(*) AS requests, SUM(COALESCE(bytessent, 0)) AS bytes_sent FROM {table}\n"
+               "WHERE {where} GROUP BY remoteip ORDER BY requests DESC LIMIT {limit}",
+        'merge': 'top', 'group_by': ['remoteip'], 'values': ['requests', 'bytes_sent'],
+        'order_by': 'requests',
+    },
+    'Distinct client IPs': {
+        'sql': _HLL_SQL.replace('{column}', 'remoteip'),
+        'merge': 'hll', 'group_by': ['bucket_index'], 'values': ['register_rank'], 'order_by': None,
+    },
+    'Distinct requesters': {
+        'sql': _HLL_SQL.replace('{column}', 'requester'),
+        'merge': 'hll', 'group_by': ['bucket_index'], 'values': ['register_rank'], 'order_by': None,
+    },
+}
+
+# Athena 날짜 포맷 -> Python 포맷 (파티션 프로젝션 테이블 날짜 조건용)
+_DATE_FORMATS = {'yyyy/MM/dd': '%Y/%m/%d', 'yyyy-MM-dd': '%Y-%m-%d'}
+
+
+def target_name(target):
+    return f"{target['account']}/{target['region']}/{target['database']}.{target['table']}"
+
+
+def time_condition(target, days, now=None):
+    """최근 days일 조건 (파티션 프로젝션 테이블이면 파티션 조건, 아니면 요청 시각 조건)"""
+    now = now or datetime.now(timezone.utc)
+    start = now - timedelta(days=days - 1) if days else None
+    if start is None:
+        return 'TRUE'
+    python_format = _DATE_FORMATS.get(target.get('partition_format'))
+    if python_format:
+        return f"{PARTITION_COLUMN} >= '{start.strftime(python_format)}'"
+    return (f"parse_datetime(requestdatetime, 'dd/MMM/yyyy:HH:mm:ss Z') >= "
+            f"TIMESTAMP '{start.strftime('%Y-%m-%d')} 00:00:00 UTC'")
+
+
+def analysis_sql(analysis, target, days=1, limit=20):
+    definition = FEDERATED_ANALYSES[analysis]
+    return definition['sql'].format(
+        table=f"{target['database']}.{target['table']}",
+        where=time_condition(target, days),
+        limit=limit * TOP_CANDIDATE_FACTOR,
+    )
+
+
+class ResultMerger:
+    """리전별 부분 결과를 분석의 병합 방식대로 누적"""
+
+    def __init__(self, analysis, limit=20):
+        self.definition = FEDERATED_ANALYSES[analysis]
+        self.limit = limit
+        self.groups = {}
+        self.sketch = HyperLogLog(HLL_PRECISION) if self.definition['merge'] == 'hll' else None
+        self.partials = 0
+
+    def add(self, batches):
+        group_by, values = self.definition['group_by'], self.definition['values']
+        for batch in batches:
+            names = batch.column_names
+            group_indexes = [names.index(name) for name in group_by]
+            value_indexes = [names.index(name) for name in values]
+            for row in batch.rows():
+                if self.sketch is not None:
+                    index, rank = row[group_indexes[0]], row[value_indexes[0]]
+                    if rank > self.sketch.registers[index]:
+                        self.sketch.registers[index] = rank
+                    continue
+                group = tuple(row[index] for index in group_indexes)
+                totals = self.groups.get(group)
+                if totals is None:
+                    totals = self.groups[group] = [0] * len(values)
+                for position, index in enumerate(value_indexes):
+                    totals[position] += row[index] or 0
+        self.partials += 1
+        return self
+
+    def result(self):
+        """병합 결과 행 목록 (dict)"""
+        if self.sketch is not None:
+            return [{'distinct': self.sketch.count(),
+                     'relative_error': round(self.sketch.relative_error(), 4)}]
+        group_by, values = self.definition['group_by'], self.definition['values']
+        rows = [dict(zip(group_by, group), **dict(zip(values, totals)))
+                for group, totals in self.groups.items()]
+        order_by = self.definition['order_by']
+        if self.definition['merge'] == 'top':
+            return heapq.nlargest(self.limit, rows, key=lambda row: row[order_by])
+        return sorted(rows, key=lambda row: row[order_by], reverse=True) if order_by else rows
+
+
+class FederatedQueryRunner:
+    """리전/계정별 클라이언트 풀과 AssumeRole 자격 증명으로 분석을 동시에 실행
+
+    accounts는 [{'role_arn': ..., 'external_id': ...}, ...]이며, 비어 있으면 기본 자격 증명만 사용합니다.
+    결과는 대상이 끝나는 순서대로 스트리밍되므로 전체 시간은 가장 느린 리전의 시간입니다.
+    """
+
+    def __init__(self, client_pool, credentials=None, accounts=None, max_workers=32, timeout=300,
+                 output_location=None, workgroup=None, home_region='us-east-1'):
+        self.client_pool = client_pool
+        self.credentials = credentials or {}
+        self.accounts = accounts or [{}]
+        self.max_workers = max_workers
+        self.timeout = timeout
+        # 결과 위치 템플릿 ({account}, {region} 치환), None이면 작업 그룹 설정 사용
+        self.output_location = output_location
+        self.workgroup = workgroup
+        self.home_region = home_region
+        self._assumed = {}
+        self._lock = threading.Lock()
+
+    def credentials_for(self, account):
+        """계정 설정의 자격 증명 (AssumeRole 결과는 만료 직전까지 재사용)"""
+        role_arn = account.get('role_arn')
+        if not role_arn:
+            return self.credentials
+        with self._lock:
+            cached = self._assumed.get(role_arn)
+            if cached is not None and cached[1] - time.time() > CREDENTIAL_REFRESH_MARGIN:
+                return cached[0]
+            params = {'RoleArn': role_arn, 'RoleSessionName': account.get('session_name', 's3-log-federation')}
+            if account.get('external_id'):
+                params['ExternalId'] = account['external_id']
+            sts_client = self.client_pool.client('sts', self.home_region, **self.credentials)
+            assumed = sts_client.assume_role(**params)['Credentials']
+            credentials = {
+                'aws_access_key_id': assumed['AccessKeyId'],
+                'aws_secret_access_key': assumed['SecretAccessKey'],
+                'aws_session_token': assumed['SessionToken'],
+            }
+            if cached is not None:
+                # 만료된 자격 증명의 클라이언트는 풀에서 제거
+                self.client_pool.clear(**cached[0])
+            self._assumed[role_arn] = (credentials, assumed['Expiration'].timestamp())
+            return credentials
+
+    def _account_id(self, account, credentials):
+        role_arn = account.get('role_arn')
+        if role_arn:
+            return role_arn.split(':')[4]
+        return self.client_pool.caller_identity(self.home_region, **credentials)['Account']
+
+    def _discover_region(self, account, region, database_prefix):
+        credentials = self.credentials_for(account)
+        account_id = self._account_id(account, credentials)
+        glue_client = self.client_pool.client('glue', region, **credentials)
+        targets = []
+        for page in glue_client.get_paginator('get_databases').paginate():
+            for database in page['DatabaseList']:
+                if not database['Name'].startswith(database_prefix):
+                    continue
+                for table_page in glue_client.get_paginator('get_tables').paginate(DatabaseName=database['Name']):
+                    for table in table_page['TableList']:
+                        serde = table.get('StorageDescriptor', {}).get('SerdeInfo', {})
+                        if serde.get('SerializationLibrary') != RAW_SERDE:
+                            continue
+                        targets.append({
+                            'account': account_id,
+                            'role_arn': account.get('role_arn'),
+                            'region': region,
+                            'database': database['Name'],
+                            'table': table['Name'],
+                            'partition_format': table.get('Parameters', {}).get(
+                                f'projection.{PARTITION_COLUMN}.format'),
+                        })
+        return targets
+
+    def discover(self, regions, database_prefix=DATABASE_PREFIX):
+        """계정 x 리전의 Glue 카탈로그에서 원본 로그 테이블 목록 수집: (대상 목록, 실패 목록)"""
+        pairs = [(account, region) for account in self.accounts for region in regions]
+        targets, errors = [], []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pairs) or 1)) as executor:
+            futures = {executor.submit(self._discover_region, account, region, database_prefix): (account, region)
+                       for account, region in pairs}
+            for future in as_completed(futures):
+                account, region = futures[future]
+                try:
+                    targets.extend(future.result())
+                except Exception as e:
+                    errors.append({'account': account.get('role_arn', 'default'), 'region': region,
+                                   'error': str(e)})
+        return sorted(targets, key=target_name), errors
+
+    def _run_target(self, target, sql):
+        account = next((account for account in self.accounts
+                        if account.get('role_arn') == target.get('role_arn')), {})
+        credentials = self.credentials_for(account)
+        athena_client = self.client_pool.client('athena', target['region'], **credentials)
+        manager = QueryExecutionManager(athena_client, timeout=self.timeout, cancel_on_timeout=True)
+        output_location = None
+        if self.output_location:
+            output_location = self.output_location.format(account=target['account'], region=target['region'])
+        params = {'WorkGroup': self.workgroup} if self.workgroup else {}
+        started = time.monotonic()
+        query_execution_id, status, response = manager.run(sql, target['database'], output_location, **params)
+        batches = list(iter_result_pages(athena_client, query_execution_id)) if status == 'SUCCEEDED' else []
+        statistics = (response or {}).get('QueryExecution', {}).get('Statistics', {})
+        return {
+            'target': target,
+            'status': status,
+            'seconds': time.monotonic() - started,
+            'data_scanned_bytes': statistics.get('DataScannedInBytes', 0),
+            'batches': batches,
+            'error': (response or {}).get('QueryExecution', {}).get('Status', {}).get('StateChangeReason'),
+        }
+
+    def run(self, analysis, targets, days=1, limit=20):
+        """모든 대상에 분석을 동시에 실행하고, 대상이 끝날 때마다 (부분 결과, 누적 병합 결과) 생성
+
+        부분 결과의 batches는 병합 후 비우며, 실패한 대상은 병합에서 빠지고 status/error로 표시됩니다.
+        """
+        merger = ResultMerger(analysis, limit)
+        if not targets:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(targets)),
+                                thread_name_prefix='federated-query') as executor:
+            futures = {executor.submit(self._run_target, target, analysis_sql(analysis, target, days, limit)): target
+                       for target in targets}
+            for future in as_completed(futures):
+                try:
+                    partial = future.result()
+                except Exception as e:
+                    partial = {'target': futures[future], 'status': 'FAILED', 'seconds': None,
+                               'data_scanned_bytes': 0, 'batches': [], 'error': str(e)}
+                if partial['status'] == 'SUCCEEDED':
+                    merger.add(partial.pop('batches'))
+                else:
+                    partial.pop('batches')
+                yield partial, merger.result()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run one analysis across regions and accounts")
+    parser.add_argument('analysis', choices=list(FEDERATED_ANALYSES))
+    parser.add_argument('--regions', nargs='+', required=True)
+    parser.add_argument('--role-arn', nargs='*', default=[], help="roles to assume (default: current account)")
+    parser.add_argument('--external-id', help="ExternalId for the assumed roles")
+    parser.add_argument('--database-prefix', default=DATABASE_PREFIX)
+    parser.add_argument('--output-location', help="e.g. s3://athena-results-{account}-{region}/")
+    parser.add_argument('--workgroup')
+    parser.add_argument('--days', type=int, default=1)
+    parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+
+    from aws_clients import ClientPool
+    accounts = [{'role_arn': role_arn, 'external_id': args.external_id} for role_arn in args.role_arn]
+    runner = FederatedQueryRunner(ClientPool(), accounts=accounts, output_location=args.output_location,
+                                  workgroup=args.workgroup,
+                                  home_region=os.environ.get('AWS_DEFAULT_REGION', args.regions[0]))
+    targets, errors = runner.discover(args.regions, args.database_prefix)
+    for error in errors:
+        print(f"discovery failed: {error['account']} {error['region']}: {error['error']}")
+    print(f"{len(targets)} tables in {len(args.regions)} regions")
+
+    started = time.monotonic()
+    merged = []
+    for partial, merged in runner.run(args.analysis, targets, args.days, args.limit):
+        detail = f": {partial['error']}" if partial.get('error') else ''
+        print(f"[{time.monotonic() - started:6.1f}s] {target_name(partial['target'])} {partial['status']} "
+              f"({partial['data_scanned_bytes'] or 0:,} bytes){detail}")
+    for row in merged:
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,34 +1,407 @@
-import boto3
+# generate_traffic.py - 부하 테스트용 S3 트래픽 생성 및 S3 Access Log 형식 로그 코퍼스 생성
+#
+# traffic: 설정한 요청률/동시성/키 분포(Zipf)/오류 비율로 S3 호환 엔드포인트에 GET/HEAD 요청
+#   (오류 요청은 404/403/5xx를 TRAFFIC_ERRORS 비율로 섞음, 5xx는 전용 클라이언트로만 보냄)
+#   python generate_traffic.py traffic --bucket s3log-app --rate 200 --duration 60
+#   python generate_traffic.py traffic --bucket test --endpoint-url http://localhost:9000 --seed-objects
+# corpus: 실제 S3 서버 액세스 로그와 같은 형식/객체 이름의 로그 파일을 디스크 또는 버킷에 기록
+#   python generate_traffic.py corpus /data/logs/ --size-gb 5
+#   python generate_traffic.py corpus s3://log-bucket/logs/ --size-gb 1 --endpoint-url http://localhost:9000
+import argparse
+import base64
+import bisect
+import os
 import random
+import threading
 import time
-from datetime import datetime
-
-s3 = boto3.client('s3')
-bucket = 's3log-app'
-
-# 다양한 패턴의 트래픽 생성
-operations = [
-    ('GET', 'test1.txt'),
-    ('GET', 'test2.txt'),
-    ('GET', 'folder1/test2.txt'),
-    ('HEAD', 'large.txt'),
-    ('GET', 'non-existent.txt'),  # 404 에러 생성
-    ('GET', 'folder2/large.txt'),
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from log_layout import LAYOUT_DATE_PARTITIONED, LAYOUT_SIMPLE_DATE
+from s3_utils import split_s3_uri
+
+# 작업별 (가중치, HTTP 메서드)
+OPERATIONS = {
+    'REST.GET.OBJECT': (70, 'GET'),
+    'REST.HEAD.OBJECT': (20, 'HEAD'),
+    'REST.PUT.OBJECT': (7, 'PUT'),
+    'REST.GET.BUCKET': (3, 'GET'),
+}
+# 오류 응답 (상태, 오류 코드, 가중치)
+ERRORS = [
+    ('404', 'NoSuchKey', 70),
+    ('403', 'AccessDenied', 25),
+    ('500', 'InternalError', 3),
+    ('503', 'SlowDown', 2),
+]
+# traffic 모드 오류 요청 (종류, 가중치): ERRORS와 같은 비율
+# 404 없는 키, 403 버킷 소유자 불일치, 5xx S3가 지원하지 않는 헤더 (501 NotImplemented)
+TRAFFIC_ERRORS = [
+    ('404', 70),
+    ('403', 25),
+    ('5xx', 5),
 ]
+# 5xx 요청 키 접두사 (이 접두사의 PUT에만 S3가 지원하지 않는 헤더를 붙임)
+FAULT_PREFIX = 'loadtest-fault/'
+# 예정 시각보다 이만큼 늦게 보낸 요청은 late로 집계
+LATE_SECONDS = 0.1
+# 버킷 소유자가 아닌 계정 ID (ExpectedBucketOwner 불일치 -> 403 AccessDenied)
+OTHER_ACCOUNT_ID = '000000000000'
+USER_AGENTS = [
+    'aws-cli/2.15.0 Python/3.11.6 Linux/6.1',
+    'Boto3/1.34.0 md/Botocore#1.34.0 ua/2.0 os/linux',
+    'aws-sdk-java/2.21.0 Linux/5.10 OpenJDK_64-Bit_Server_VM',
+    'Mozilla/5.0 (X11; Linux x86_64)',
+]
+OWNER_ID = '79a59df900b949e55d96a1e698fbacedfd6e09d98eacf8f8d5218e7cd47ef2be'
+
+
+def zipf_cum_weights(count, exponent):
+    """1..count 순위의 Zipf 누적 가중치 (random.choices용)"""
+    return list(accumulate(1.0 / rank ** exponent for rank in range(1, count + 1)))
+
+
+class KeySpace:
+    """Zipf 분포로 인기 키가 몰리는 객체 키 집합"""
+
+    def __init__(self, count=5000, exponent=1.1, prefix='', seed=0):
+        rng = random.Random(seed)
+        folders = max(1, count // 100)
+        self.keys = [f"{prefix}folder{rng.randrange(folders)}/file{index}.txt" for index in range(count)]
+        self.cum_weights = zipf_cum_weights(count, exponent)
+
+    def sample(self, rng, k=1):
+        return rng.choices(self.keys, cum_weights=self.cum_weights, k=k)
+
+    def pick(self, rng):
+        return self.keys[bisect.bisect(self.cum_weights, rng.random() * self.cum_weights[-1])]
+
+
+class LogLineGenerator:
+    """S3 서버 액세스 로그 형식(26개 필드)의 합성 로그 라인 생성
+
+    요청 시각은 start부터 초당 rate건씩 증가하므로 같은 설정이면 같은 코퍼스가 만들어집니다.
+    """
+
+    def __init__(self, bucket='s3log-app', keyspace=None, error_ratio=0.05, rate=10, seed=0, start=None,
+                 clients=5000, versioned_ratio=0.3):
+        self.bucket = bucket
+        self.keyspace = keyspace or KeySpace(seed=seed)
+        self.error_ratio = error_ratio
+        # 버전 관리 버킷의 객체 요청 비율 (versionid 필드에 실제 버전 ID 기록)
+        self.versioned_ratio = versioned_ratio
+        self.rate = rate
+        self.rng = random.Random(seed)
+        self.when = start or datetime(2024, 1, 1)
+        self.sent = 0
+        # 클라이언트 IP도 소수가 대부분의 요청을 보내도록 Zipf 분포
+        self.clients = [f"{self.rng.randrange(1, 224)}.{self.rng.randrange(256)}."
+                        f"{self.rng.randrange(256)}.{self.rng.randrange(1, 255)}" for _ in range(clients)]
+        self.client_weights = zipf_cum_weights(clients, 1.0)
+        self.operations = list(OPERATIONS)
+        self.operation_weights = list(accumulate(weight for weight, _ in OPERATIONS.values()))
+        self.error_weights = list(accumulate(weight for _, _, weight in ERRORS))
+
+    @property
+    def current_time(self):
+        return self.when + timedelta(seconds=self.sent / self.rate)
+
+    def lines(self, count):
+        rng = self.rng
+        keys = self.keyspace.sample(rng, count)
+        clients = rng.choices(self.clients, cum_weights=self.client_weights, k=count)
+        operations = rng.choices(self.operations, cum_weights=self.operation_weights, k=count)
+        for key, client, operation in zip(keys, clients, operations):
+            when = self.when + timedelta(seconds=self.sent / self.rate)
+            self.sent += 1
+            method = OPERATIONS[operation][1]
+            size = int(rng.lognormvariate(10, 2)) + 1
+            if rng.random() < self.error_ratio:
+                status, error, _ = ERRORS[bisect.bisect(self.error_weights, rng.random() * self.error_weights[-1])]
+                sent, object_size = '243', '-'
+            else:
+                error = '-'
+                status = '200'
+                sent = str(size) if method == 'GET' else '-'
+                object_size = str(size)
+            if operation == 'REST.GET.BUCKET':
+                key, uri = '-', f"GET /{self.bucket}?list-type=2&prefix=folder HTTP/1.1"
+            else:
+                uri = f"{method} /{self.bucket}/{key} HTTP/1.1"
+            version_id = '-'
+            if key != '-' and rng.random() < self.versioned_ratio:
+                version_id = base64.urlsafe_b64encode(rng.getrandbits(192).to_bytes(24, 'little')).decode()
+            total_time = int(rng.lognormvariate(3, 1)) + 1
+            yield (
+                f"{OWNER_ID} {self.bucket} [{when.strftime('%d/%b/%Y:%H:%M:%S')} +0000] {client} "
+                f"arn:aws:iam::123456789012:user/loadtest {rng.getrandbits(64):016X} {operation} {key} "
+                f"\"{uri}\" {status} {error} {sent} {object_size} {total_time} "
+                f"{max(1, total_time - rng.randrange(total_time))} \"-\" \"{rng.choice(USER_AGENTS)}\" {version_id} "
+                f"{rng.getrandbits(256):064x}= SigV4 TLS_AES_128_GCM_SHA256 AuthHeader "
+                f"{self.bucket}.s3.us-east-1.amazonaws.com TLSv1.3 - -\n"
+            )
+
+
+def write_corpus(path, size_bytes, seed=0, block_lines=20000):
+    """size_bytes 이상이 될 때까지 합성 로그를 파일 하나에 기록"""
+    generator = LogLineGenerator(seed=seed)
+    written = 0
+    with open(path, 'wb') as f:
+        while written < size_bytes:
+            block = ''.join(generator.lines(block_lines)).encode()
+            f.write(block)
+            written += len(block)
+    return written
+
+
+def log_object_key(layout, prefix, when, unique, source_bucket='s3log-app', account='123456789012',
+                   region='us-east-1'):
+    """S3가 로그 객체에 붙이는 이름 (simple_date 또는 date_partitioned 레이아웃)"""
+    name = f"{when.strftime('%Y-%m-%d-%H-%M-%S')}-{unique}"
+    if layout == LAYOUT_DATE_PARTITIONED:
+        return f"{prefix}{account}/{region}/{source_bucket}/{when.strftime('%Y/%m/%d')}/{name}"
+    return f"{prefix}{name}"
+
+
+def write_log_objects(destination, size_bytes, object_bytes=1024 * 1024, layout=LAYOUT_SIMPLE_DATE,
+                      generator=None, s3_client=None, max_workers=16):
+    """destination(로컬 디렉터리 또는 s3://버킷/접두사/)에 로그 객체들을 기록: (객체 수, 바이트)
+
+    각 객체는 약 object_bytes 크기이며, 이름은 객체 안 마지막 요청 시각 기준입니다.
+    """
+    generator = generator or LogLineGenerator()
+    is_s3 = destination.startswith('s3://')
+    if is_s3:
+        bucket_name, prefix = split_s3_uri(destination)
+    else:
+        prefix = ''
+        os.makedirs(destination, exist_ok=True)
+
+    def store(key, body):
+        if is_s3:
+            s3_client.put_object(Bucket=bucket_name, Key=key, Body=body)
+        else:
+            path = os.path.join(destination, key)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(body)
+
+    lines_per_object = max(1, object_bytes // 400)
+    objects = written = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = []
+        while written < size_bytes:
+            body = ''.join(generator.lines(lines_per_object)).encode()
+            key = log_object_key(layout, prefix, generator.current_time,
+                                 f"{generator.rng.getrandbits(64):016X}", generator.bucket)
+            pending.append(executor.submit(store, key, body))
+            objects += 1
+            written += len(body)
+            if len(pending) >= max_workers * 2:
+                pending.pop(0).result()
+        for future in pending:
+            future.result()
+    return objects, written
+
+
+class TrafficGenerator:
+    """요청률 제한 + 스레드 풀 동시 요청으로 S3 호환 엔드포인트에 트래픽 생성
+
+    5xx 요청은 헤더 훅을 등록한 fault_client(이 생성기 전용 클라이언트)로만 보냅니다.
+    fault_client가 없거나 엔드포인트가 헤더를 무시하고 2xx로 답하면 5xx 요청은 건너뜁니다.
+    """
+
+    def __init__(self, s3_client, bucket, keyspace, error_ratio=0.05, head_ratio=0.2, seed=0,
+                 fault_client=None):
+        self.s3_client = s3_client
+        self.fault_client = fault_client
+        self.bucket = bucket
+        self.keyspace = keyspace
+        self.error_ratio = error_ratio
+        self.head_ratio = head_ratio
+        self.rng = random.Random(seed)
+        self.results = Counter()
+        self.latencies = []
+        # 예정보다 LATE_SECONDS 넘게 늦게 보낸 요청 수와 최대 지연
+        self.late = 0
+        self.max_lag = 0.0
+        # 엔드포인트가 5xx용 헤더를 무시하고 저장한 적이 있으면 이후 5xx 요청은 건너뜀
+        self.fault_ignored = False
+        self._lock = threading.Lock()
+        self.error_kinds = [kind for kind, _ in TRAFFIC_ERRORS]
+        self.error_weights = list(accumulate(weight for _, weight in TRAFFIC_ERRORS))
+        if fault_client is not None:
+            # 호출자 클라이언트의 다른 PUT에 헤더가 붙지 않도록 전용 클라이언트에만 등록
+            fault_client.meta.events.register('before-send.s3.PutObject', self._add_fault_header)
+
+    def seed_objects(self, size=1024, max_workers=32):
+        """키 공간의 모든 객체 업로드 (GET/HEAD가 성공하도록)"""
+        body = os.urandom(size)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(
+                lambda key: self.s3_client.put_object(Bucket=self.bucket, Key=key, Body=body),
+                self.keyspace.keys
+            ))
+
+    @staticmethod
+    def _add_fault_header(request, **kwargs):
+        """5xx용 PUT에만 S3가 지원하지 않는 Transfer-Encoding 헤더 추가 (서명 후라 서명에 영향 없음)"""
+        if f"/{FAULT_PREFIX}" in request.url:
+            request.headers['Transfer-Encoding'] = 'identity'
+
+    def _request(self, method, key, error=None):
+        if error == '5xx' and (self.fault_client is None or self.fault_ignored):
+            with self._lock:
+                self.results[f"{method} 5xx skipped"] += 1
+            return
+        started = time.perf_counter()
+        params = {'Bucket': self.bucket, 'Key': key}
+        if error == '403':
+            params['ExpectedBucketOwner'] = OTHER_ACCOUNT_ID
+        try:
+            if method == 'GET':
+                self.s3_client.get_object(**params)['Body'].read()
+            elif method == 'HEAD':
+                self.s3_client.head_object(**params)
+            elif error == '5xx':
+                self.fault_client.put_object(Body=b'', **params)
+            else:
+                self.s3_client.put_object(Body=b'', **params)
+            outcome = f"{method} 200"
+            if error == '5xx':
+                # 엔드포인트가 헤더를 무시하고 저장함: 남은 객체를 지우고 이후 5xx 요청은 건너뜀
+                self.fault_ignored = True
+                self.fault_client.delete_object(Bucket=self.bucket, Key=key)
+                outcome = f"{method} 200 (fault ignored)"
+        except Exception as e:
+            status = getattr(e, 'response', {}).get('ResponseMetadata', {}).get('HTTPStatusCode', 'error')
+            outcome = f"{method} {status}"
+        with self._lock:
+            self.results[outcome] += 1
+            self.latencies.append(time.perf_counter() - started)
+
+    def run(self, rate, duration=None, requests=None, concurrency=32, progress=None):
+        """초당 rate건으로 duration초 동안(또는 requests건) 요청, 결과 Counter 반환"""
+        total = requests if requests is not None else int(rate * (duration or 60))
+        started = time.perf_counter()
+        # 제출 후 끝나지 않은 요청은 동시성의 2배까지만 (엔드포인트가 느리면 제출을 멈추고 late로 집계)
+        slots = threading.BoundedSemaphore(concurrency * 2)
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            for index in range(total):
+                # 요청 i는 시작 후 i / rate초에 보냄 (밀린 요청은 즉시 보냄)
+                due = started + index / rate
+                delay = due - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                error = None
+                if self.rng.random() < self.error_ratio:
+                    error = self.rng.choices(self.error_kinds, cum_weights=self.error_weights)[0]
+                method = 'HEAD' if self.rng.random() < self.head_ratio else 'GET'
+                if error == '404':
+                    key = f"missing/{self.rng.getrandbits(48):012x}.txt"
+                elif error == '5xx':
+                    method, key = 'PUT', f"{FAULT_PREFIX}{self.rng.getrandbits(48):012x}.txt"
+                else:
+                    key = self.keyspace.pick(self.rng)
+                slots.acquire()
+                lag = time.perf_counter() - due
+                if lag > LATE_SECONDS:
+                    self.late += 1
+                self.max_lag = max(self.max_lag, lag)
+                executor.submit(self._request, method, key, error).add_done_callback(lambda _: slots.release())
+                if progress is not None and index and index % 1000 == 0:
+                    progress(index, total)
+        return self.results
+
+    def latency_percentiles(self, quantiles=(0.5, 0.9, 0.99)):
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {}
+        return {q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] for q in quantiles}
+
+
+def _s3_client(args, max_pool_connections=50):
+    import boto3
+    from botocore.config import Config
+    config = Config(max_pool_connections=max_pool_connections,
+                    s3={'addressing_style': 'path' if args.endpoint_url else 'auto'})
+    return boto3.client('s3', region_name=args.region, endpoint_url=args.endpoint_url, config=config)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate S3 traffic or synthetic S3 access log corpora")
+    parser.add_argument('--endpoint-url', help="S3-compatible endpoint (MinIO, moto server, ...)")
+    parser.add_argument('--region', default=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    parser.add_argument('--keys', type=int, default=5000, help="number of distinct object keys")
+    parser.add_argument('--zipf', type=float, default=1.1, help="Zipf exponent of key popularity")
+    parser.add_argument('--error-ratio', type=float, default=0.05)
+    parser.add_argument('--seed', type=int, default=0)
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    traffic = commands.add_parser('traffic', help="send concurrent GET/HEAD requests")
+    traffic.add_argument('--bucket', default='s3log-app')
+    traffic.add_argument('--prefix', default='', help="key prefix of generated objects")
+    traffic.add_argument('--rate', type=float, default=50, help="requests per second")
+    traffic.add_argument('--duration', type=float, default=60, help="seconds to run")
+    traffic.add_argument('--requests', type=int, help="total requests (overrides --duration)")
+    traffic.add_argument('--concurrency', type=int, default=32)
+    traffic.add_argument('--head-ratio', type=float, default=0.2)
+    traffic.add_argument('--seed-objects', action='store_true', help="upload all keys before sending traffic")
+
+    corpus = commands.add_parser('corpus', help="write S3 access log objects to disk or a bucket")
+    corpus.add_argument('destination', help="local directory or s3://bucket/prefix/")
+    corpus.add_argument('--size-gb', type=float, default=1.0)
+    corpus.add_argument('--object-mb', type=float, default=1.0, help="size of each log object")
+    corpus.add_argument('--layout', choices=[LAYOUT_SIMPLE_DATE, LAYOUT_DATE_PARTITIONED],
+                        default=LAYOUT_SIMPLE_DATE)
+    corpus.add_argument('--source-bucket', default='s3log-app', help="bucket name written in log lines")
+    corpus.add_argument('--start', default='2024-01-01', help="first request date (YYYY-MM-DD)")
+    corpus.add_argument('--rate', type=float, default=500, help="simulated requests per second")
+    args = parser.parse_args()
+
+    if args.command == 'traffic':
+        keyspace = KeySpace(args.keys, args.zipf, args.prefix, args.seed)
+        generator = TrafficGenerator(_s3_client(args, args.concurrency), args.bucket, keyspace,
+                                     args.error_ratio, args.head_ratio, args.seed,
+                                     fault_client=_s3_client(args, args.concurrency))
+        if args.seed_objects:
+            print(f"⬆️ Uploading {args.keys} objects to {args.bucket} ...")
+            generator.seed_objects()
+        print(f"🚀 Starting traffic generation at {datetime.now()} ({args.rate:g} req/s)")
+        started = time.perf_counter()
+        results = generator.run(args.rate, args.duration, args.requests, args.concurrency,
+                                progress=lambda done, total: print(f"  {done}/{total} requests sent"))
+        elapsed = time.perf_counter() - started
+        total = sum(results.values())
+        latencies = ', '.join(f"p{q * 100:g}={value * 1000:.0f}ms"
+                              for q, value in generator.latency_percentiles().items())
+        print(f"✓ {total} requests in {elapsed:.1f}s ({total / elapsed:.1f} req/s), {latencies}")
+        for outcome, count in sorted(results.items()):
+            print(f"  {outcome}: {count}")
+        if generator.late:
+            print(f"⚠️ {generator.late} requests were sent more than {LATE_SECONDS * 1000:.0f}ms late "
+                  f"(max {generator.max_lag:.1f}s): the endpoint could not keep up with {args.rate:g} req/s")
+        if generator.fault_ignored:
+            print("⚠️ The endpoint accepted the 5xx fault header, so 5xx requests were skipped")
+        print("⏳ Wait 5-15 minutes for logs to appear...")
+        return
+
+    generator = LogLineGenerator(
+        args.source_bucket, KeySpace(args.keys, args.zipf, seed=args.seed), args.error_ratio,
+        args.rate, args.seed, datetime.strptime(args.start, '%Y-%m-%d')
+    )
+    s3_client = _s3_client(args) if args.destination.startswith('s3://') else None
+    started = time.perf_counter()
+    objects, written = write_log_objects(
+        args.destination, int(args.size_gb * 1024 ** 3), int(args.object_mb * 1024 * 1024),
+        args.layout, generator, s3_client
+    )
+    elapsed = time.perf_counter() - started
+    print(f"✓ Wrote {objects} log objects, {written / 1024 ** 2:.1f} MB in {elapsed:.1f}s "
+          f"({generator.sent} requests, until {generator.current_time})")
+
 
-print(f"🚀 Starting traffic generation at {datetime.now()}")
-
-for i in range(50):
-    op, key = random.choice(operations)
-    try:
-        if op == 'GET':
-            s3.get_object(Bucket=bucket, Key=key)
-        elif op == 'HEAD':
-            s3.head_object(Bucket=bucket, Key=key)
-        print(f"✓ {op} {key}")
-    except:
-        print(f"✗ {op} {key} (expected error)")
-    
-    time.sleep(random.uniform(0.5, 2))
-
-print("⏳ Wait 5-15 minutes for logs to appear...")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# inventory.py - 로그 객체 인벤토리 (객체 수, 용량, 일별 분포) 및 Athena 스캔 비용 추정
+import csv
+import gzip
+import io
+import json
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from urllib.parse import unquote
+
+from log_layout import LAYOUT_FLAT, classify_key
+from s3_utils import split_s3_uri
+
+# Athena 요금: 스캔 1TB당 5달러, 쿼리당 최소 10MB 과금
+ATHENA_PRICE_PER_TB = 5.0
+ATHENA_MIN_BYTES = 10 * 1024 * 1024
+TB = 1024 ** 4
+
+def key_day(key, last_modified=None):
+    """객체의 날짜 (키 이름의 날짜 우선, 없으면 LastModified)"""
+    layout, _, key_date = classify_key(key)
+    if layout != LAYOUT_FLAT:
+        return key_date.replace('/', '-')
+    if last_modified is not None:
+        return last_modified.strftime('%Y-%m-%d')
+    return None
+
+
+class LogInventory:
+    """객체 수/총 용량/일별 히스토그램 (병합 가능)"""
+
+    def __init__(self, source='listing'):
+        self.source = source
+        self.objects = 0
+        self.bytes = 0
+        self.days = {}
+
+    def add(self, key, size, last_modified=None):
+        self.objects += 1
+        self.bytes += size
+        day = key_day(key, last_modified) or 'unknown'
+        stats = self.days.setdefault(day, [0, 0])
+        stats[0] += 1
+        stats[1] += size
+
+    def merge(self, other):
+        self.objects += other.objects
+        self.bytes += other.bytes
+        for day, (objects, size) in other.days.items():
+            stats = self.days.setdefault(day, [0, 0])
+            stats[0] += objects
+            stats[1] += size
+        return self
+
+    def day_histogram(self):
+        """[(날짜, 객체 수, 바이트), ...] 날짜순"""
+        return [(day, stats[0], stats[1]) for day, stats in sorted(self.days.items())]
+
+    def to_dict(self):
+        return {
+            'source': self.source,
+            'objects': self.objects,
+            'bytes': self.bytes,
+            'days': {day: {'objects': objects, 'bytes': size}
+                     for day, objects, size in self.day_histogram()},
+        }
+
+
+def _date_boundaries(first_day, last_day, shards):
+    """날짜 이름 키를 shards개 구간으로 나누는 경계 키 목록"""
+    total_days = (last_day - first_day).days + 1
+    step = max(1, -(-total_days // shards))
+    boundaries = []
+    day = first_day + timedelta(days=step)
+    while day <= last_day:
+        boundaries.append(day)
+        day += timedelta(days=step)
+    return boundaries
+
+
+class InventoryScanner:
+    """키 범위를 나누어 list_objects_v2를 동시에 페이지네이션하는 인벤토리 스캐너
+
+    로그 키가 날짜 이름(YYYY-MM-DD 또는 YYYY/MM/DD)이면 날짜 구간으로 키 범위를 나누고,
+    아니면 첫 단계 하위 폴더별로 나눕니다.
+    """
+
+    def __init__(self, s3_client, max_workers=16, shards=32):
+        self.s3_client = s3_client
+        self.max_workers = max_workers
+        self.shards = shards
+
+    def _scan_range(self, bucket_name, prefix, lower=None, upper=None):
+        """(lower, upper] 범위 키 스캔 (lower가 없으면 처음부터)"""
+        inventory = LogInventory()
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        params = {'Bucket': bucket_name, 'Prefix': prefix}
+        if lower:
+            params['StartAfter'] = lower
+        for page in paginator.paginate(**params):
+            for obj in page.get('Contents', []):
+                if upper is not None and obj['Key'] > upper:
+                    return inventory
+                inventory.add(obj['Key'], obj['Size'], obj.get('LastModified'))
+        return inventory
+
+    def _key_ranges(self, bucket_name, prefix):
+        response = self.s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix, MaxKeys=1)
+        contents = response.get('Contents', [])
+        if not contents:
+            return []
+
+        first_key = contents[0]['Key']
+        layout, base, first_date = classify_key(first_key)
+        if layout != LAYOUT_FLAT:
+            separator = '/' if '/' in first_date else '-'
+            first_day = datetime.strptime(first_date.replace('/', '-'), '%Y-%m-%d').date()
+            days = _date_boundaries(first_day, date.today(), self.shards)
+            keys = [base + day.strftime(f'%Y{separator}%m{separator}%d') for day in days]
+        else:
+            # 날짜 이름이 아니면 하위 폴더 경계로 분할
+            response = self.s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix, Delimiter='/')
+            keys = [info['Prefix'] for info in response.get('CommonPrefixes', [])][1:]
+
+        bounds = [None] + keys + [None]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def scan(self, bucket_name, prefix=''):
+        """접두사 아래 전체 인벤토리 (키 범위별 동시 스캔 후 병합)"""
+        ranges = self._key_ranges(bucket_name, prefix)
+        inventory = LogInventory()
+        if not ranges:
+            return inventory
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(ranges))) as executor:
+            parts = executor.map(lambda bounds: self._scan_range(bucket_name, prefix, *bounds), ranges)
+            for part in parts:
+                inventory.merge(part)
+        return inventory
+
+    def scan_manifest(self, manifest_uri, bucket_name, prefix=''):
+        """S3 Inventory manifest.json(CSV 형식)에서 인벤토리 생성 (목록 API 호출 없음)"""
+        manifest_bucket, manifest_key = split_s3_uri(manifest_uri)
+        manifest = json.loads(
+            self.s3_client.get_object(Bucket=manifest_bucket, Key=manifest_key)['Body'].read()
+        )
+        if manifest.get('fileFormat', 'CSV').upper() != 'CSV':
+            raise ValueError(f"Unsupported inventory format: {manifest.get('fileFormat')} (CSV only)")
+
+        fields = [field.strip() for field in manifest['fileSchema'].split(',')]
+        bucket_index, key_index = fields.index('Bucket'), fields.index('Key')
+        size_index = fields.index('Size')
+        modified_index = fields.index('LastModifiedDate') if 'LastModifiedDate' in fields else None
+        destination_bucket = manifest['destinationBucket'].split(':::')[-1]
+
+        def read_file(file_info):
+            part = LogInventory(source='inventory')
+            body = self.s3_client.get_object(Bucket=destination_bucket, Key=file_info['key'])['Body']
+            with gzip.GzipFile(fileobj=body) as compressed:
+                for row in csv.reader(io.TextIOWrapper(compressed, encoding='utf-8')):
+                    key = unquote(row[key_index])
+                    if row[bucket_index] != bucket_name or not key.startswith(prefix):
+                        continue
+                    last_modified = None
+                    if modified_index is not None and row[modified_index]:
+                        last_modified = datetime.fromisoformat(row[modified_index].replace('Z', '+00:00'))
+                    part.add(key, int(row[size_index] or 0), last_modified)
+            return part
+
+        inventory = LogInventory(source='inventory')
+        files = manifest.get('files', [])
+        if files:
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(files))) as executor:
+                for part in executor.map(read_file, files):
+                    inventory.merge(part)
+        return inventory
+
+
+def query_cost(scanned_bytes, price_per_tb=ATHENA_PRICE_PER_TB):
+    """스캔 바이트에 대한 Athena 요금 (최소 과금 10MB 적용)"""
+    return max(scanned_bytes, ATHENA_MIN_BYTES) / TB * price_per_tb
+
+
+def estimate_query_costs(inventory, days=1, price_per_tb=ATHENA_PRICE_PER_TB):
+    """쿼리 한 번의 예상 스캔량/비용: raw 테이블(전체 스캔) vs 파티션 테이블(최근 days일)
+
+    텍스트 로그 테이블은 컬럼 단위로 읽을 수 없어 샘플 쿼리가 모두 같은 범위를 스캔하므로
+    쿼리별이 아니라 테이블 종류별로 추정합니다.
+    """
+    histogram = inventory.day_histogram()
+    recent = histogram[-days:]
+    recent_bytes = sum(size for _, _, size in recent)
+    return [
+        {'table': 'raw', 'days': len(histogram), 'bytes': inventory.bytes,
+         'cost': query_cost(inventory.bytes, price_per_tb)},
+        {'table': 'partitioned', 'days': len(recent), 'bytes': recent_bytes,
+         'cost': query_cost(recent_bytes, price_per_tb)},
+    ]
+
+
+def format_bytes(size):
+    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
+        if size < 1024 or unit == 'TB':
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
@@ -0,0 +1,211 @@
+# log_index.py - 로그 객체 증분 인덱스 (SQLite) 및 워터마크 기반 tail 모드
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+
+from log_layout import DATE_FORMATS, LAYOUT_DATE_PARTITIONED, classify_key
+from log_parser import LogSummary, sortable_datetime
+from object_reader import PrefetchingObjectReader
+from s3_utils import iter_objects, split_s3_uri
+
+# 로그 객체 이름의 생성 시각 (YYYY-MM-DD-HH-MM-SS)
+_KEY_TIME_RE = re.compile(r'(\d{4}-\d{2}-\d{2}-\d{2}-\d{2}-\d{2})(-[^/]*)$')
+_KEY_TIME_FORMAT = '%Y-%m-%d-%H-%M-%S'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    bucket TEXT NOT NULL,
+    key TEXT NOT NULL,
+    size INTEGER,
+    etag TEXT,
+    last_modified TEXT,
+    first_time TEXT,
+    last_time TEXT,
+    rows INTEGER,
+    processed_at REAL,
+    PRIMARY KEY (bucket, key)
+);
+CREATE INDEX IF NOT EXISTS objects_pending ON objects (bucket, processed_at);
+CREATE TABLE IF NOT EXISTS watermarks (
+    bucket TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    start_after TEXT,
+    updated_at REAL,
+    PRIMARY KEY (bucket, prefix)
+);
+"""
+
+
+def lookback_key(key, minutes):
+    """키 이름의 시각을 minutes분 앞당긴 키 (늦게 업로드된 객체를 놓치지 않기 위한 StartAfter)
+
+    date_partitioned 키는 날짜 폴더(YYYY/MM/DD/)도 함께 앞당겨, 자정 직후 워터마크에서도
+    전날 폴더에 늦게 올라온 객체를 다시 목록 조회합니다.
+    """
+    match = _KEY_TIME_RE.search(key)
+    if not match:
+        return key
+    earlier = datetime.strptime(match.group(1), _KEY_TIME_FORMAT) - timedelta(minutes=minutes)
+    prefix = key[:match.start(1)]
+    layout, base, day = classify_key(key)
+    if layout == LAYOUT_DATE_PARTITIONED:
+        prefix = f"{base}{earlier.strftime(DATE_FORMATS[layout][1])}{prefix[len(base) + len(day):]}"
+    return prefix + earlier.strftime(_KEY_TIME_FORMAT)
+
+
+class LogObjectIndex:
+    """접두사별로 본 로그 객체(키, 크기, ETag, 시간 범위)와 StartAfter 워터마크를 기록
+
+    로그 키 이름은 생성 시각 순으로 정렬되므로, 다음 목록 조회는 워터마크 이후만 읽습니다.
+    하나의 접두사는 하나의 로그 스트림(소스 버킷)을 가리켜야 합니다.
+    """
+
+    def __init__(self, path, lookback_minutes=15):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lookback_minutes = lookback_minutes
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._db.close()
+
+    def watermark(self, bucket_name, prefix):
+        row = self._db.execute(
+            "SELECT start_after FROM watermarks WHERE bucket = ? AND prefix = ?", (bucket_name, prefix)
+        ).fetchone()
+        return row[0] if row else None
+
+    def sync(self, s3_client, bucket_name, prefix=''):
+        """워터마크 이후 새 객체만 목록 조회하여 인덱스에 추가, 새 객체 키 목록 반환"""
+        watermark = self.watermark(bucket_name, prefix)
+        start_after = lookback_key(watermark, self.lookback_minutes) if watermark else None
+
+        new_keys = []
+        latest = watermark or ''
+        with self._lock:
+            for obj in iter_objects(s3_client, bucket_name, prefix, start_after):
+                cursor = self._db.execute(
+                    "INSERT OR IGNORE INTO objects (bucket, key, size, etag, last_modified) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (bucket_name, obj['Key'], obj['Size'], obj.get('ETag', '').strip('"'),
+                     obj['LastModified'].isoformat() if obj.get('LastModified') else None)
+                )
+                if cursor.rowcount:
+                    new_keys.append(obj['Key'])
+                latest = max(latest, obj['Key'])
+
+            if latest:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO watermarks (bucket, prefix, start_after, updated_at) "
+                    "VALUES (?, ?, ?, ?)",
+                    (bucket_name, prefix, latest, time.time())
+                )
+            self._db.commit()
+        return new_keys
+
+    def pending_keys(self, bucket_name, prefix=''):
+        """아직 처리(파싱)하지 않은 객체 키 목록"""
+        return [key for key, _ in self.pending_objects(bucket_name, prefix)]
+
+    def pending_objects(self, bucket_name, prefix=''):
+        """아직 처리(파싱)하지 않은 객체 [(키, 크기), ...]"""
+        return self._db.execute(
+            "SELECT key, size FROM objects WHERE bucket = ? AND processed_at IS NULL "
+            "AND substr(key, 1, length(?)) = ? ORDER BY key",
+            (bucket_name, prefix, prefix)
+        ).fetchall()
+
+    def mark_processed(self, bucket_name, key, first_time, last_time, rows):
+        with self._lock:
+            self._db.execute(
+                "UPDATE objects SET first_time = ?, last_time = ?, rows = ?, processed_at = ? "
+                "WHERE bucket = ? AND key = ?",
+                (first_time, last_time, rows, time.time(), bucket_name, key)
+            )
+            self._db.commit()
+
+    def objects_in_window(self, bucket_name, start_time, end_time):
+        """레코드 시간 범위가 [start_time, end_time]과 겹치는 처리된 객체 키 ('YYYY-MM-DD HH:MM:SS')"""
+        rows = self._db.execute(
+            "SELECT key FROM objects WHERE bucket = ? AND processed_at IS NOT NULL "
+            "AND last_time >= ? AND first_time <= ? ORDER BY key",
+            (bucket_name, start_time, end_time)
+        ).fetchall()
+        return [key for (key,) in rows]
+
+    def stats(self, bucket_name, prefix=''):
+        row = self._db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COUNT(processed_at), MIN(first_time), MAX(last_time) "
+            "FROM objects WHERE bucket = ? AND substr(key, 1, length(?)) = ?",
+            (bucket_name, prefix, prefix)
+        ).fetchone()
+        return dict(zip(['objects', 'bytes', 'processed', 'first_time', 'last_time'], row))
+
+    def process_new(self, s3_client, bucket_name, prefix='', handler=None):
+        """새 객체를 목록 조회 후 파싱하여 요약 (handler(key, batch)로 배치 전달 가능)"""
+        self.sync(s3_client, bucket_name, prefix)
+        summary = LogSummary()
+        objects = self.pending_objects(bucket_name, prefix)
+        # 새 객체를 미리 읽기 리더로 동시에 받아 객체 순서대로 처리
+        reader = PrefetchingObjectReader(s3_client)
+        current = None
+        try:
+            for key, batch in reader.iter_object_batches(bucket_name, objects):
+                if current is None or key != current[0]:
+                    if current is not None:
+                        self.mark_processed(bucket_name, *current)
+                    current = [key, None, None, 0]
+                summary.update(batch)
+                if batch.num_rows:
+                    times = batch.columns['requestdatetime']
+                    batch_first = sortable_datetime(min(times, key=sortable_datetime))
+                    batch_last = sortable_datetime(max(times, key=sortable_datetime))
+                    current[1] = min(current[1] or batch_first, batch_first)
+                    current[2] = max(current[2] or batch_last, batch_last)
+                    current[3] += batch.num_rows
+                if handler is not None:
+                    handler(key, batch)
+            if current is not None:
+                self.mark_processed(bucket_name, *current)
+        finally:
+            reader.close()
+        return [key for key, _ in objects], summary
+
+    def tail(self, s3_client, bucket_name, prefix='', interval=30, handler=None):
+        """interval초마다 새 객체만 처리하는 tail 모드: (새 키 목록, LogSummary)를 계속 생성"""
+        while True:
+            started = time.monotonic()
+            yield self.process_new(s3_client, bucket_name, prefix, handler)
+            time.sleep(max(0, interval - (time.monotonic() - started)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tail S3 access logs using a local object index")
+    parser.add_argument('location', help="log location, e.g. s3://log-bucket/logs/")
+    parser.add_argument('--index', default=os.path.expanduser('~/.s3_log_index.sqlite'))
+    parser.add_argument('--region', default=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    parser.add_argument('--interval', type=int, default=30, help="polling interval in seconds")
+    parser.add_argument('--once', action='store_true', help="process new objects once and exit")
+    args = parser.parse_args()
+
+    import boto3
+    s3_client = boto3.client('s3', region_name=args.region)
+    bucket_name, prefix = split_s3_uri(args.location)
+    index = LogObjectIndex(args.index)
+
+    for keys, summary in index.tail(s3_client, bucket_name, prefix, args.interval):
+        result = summary.to_dict()
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] {len(keys)} new objects, {result['rows']} rows, "
+              f"status {result['status_counts']}, errors {result['error_counts']}")
+        if args.once:
+            break
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# log_layout.py - S3 Access Log 저장 경로 레이아웃 감지 및 파티션 프로젝션 설정
+import re
+from datetime import datetime
+
+# 레이아웃 종류
+LAYOUT_FLAT = 'flat'
+# [DestinationPrefix][SourceAccountId]/[SourceRegion]/[SourceBucket]/YYYY/MM/DD/YYYY-mm-DD-HH-MM-SS-UniqueString
+LAYOUT_DATE_PARTITIONED = 'date_partitioned'
+# [DestinationPrefix]YYYY-mm-DD-HH-MM-SS-UniqueString
+# 날짜가 폴더가 아니라 파일 이름 앞부분이므로 파티션 프로젝션은 쓸 수 없고, 날짜별 목록 조회에만 사용
+LAYOUT_SIMPLE_DATE = 'simple_date'
+
+# 파티션 프로젝션 컬럼 이름
+PARTITION_COLUMN = 'log_date'
+
+# 레이아웃별 (Athena 날짜 포맷, Python 날짜 포맷)
+DATE_FORMATS = {
+    LAYOUT_DATE_PARTITIONED: ('yyyy/MM/dd', '%Y/%m/%d'),
+    LAYOUT_SIMPLE_DATE: ('yyyy-MM-dd', '%Y-%m-%d'),
+}
+
+_DATE_PARTITIONED_RE = re.compile(
+    r'^(?P<base>.*?\d{12}/[a-z0-9-]+/[^/]+/)(?P<date>\d{4}/\d{2}/\d{2})/[^/]+$'
+)
+_SIMPLE_DATE_RE = re.compile(
+    r'^(?P<base>(?:.*/)?[^/]*?)(?P<date>\d{4}-\d{2}-\d{2})-\d{2}-\d{2}-\d{2}-[^/]+$'
+)
+
+
+def classify_key(key):
+    """로그 객체 키의 레이아웃, 날짜 앞부분(base), 날짜 문자열 반환"""
+    match = _DATE_PARTITIONED_RE.match(key)
+    if match:
+        return LAYOUT_DATE_PARTITIONED, match.group('base'), match.group('date')
+
+    match = _SIMPLE_DATE_RE.match(key)
+    if match:
+        return LAYOUT_SIMPLE_DATE, match.group('base'), match.group('date')
+
+    return LAYOUT_FLAT, None, None
+
+
+def detect_layout(bucket_name, keys):
+    """키 샘플로 레이아웃 감지
+
+    모든 키가 같은 레이아웃과 같은 base를 가질 때만 날짜 레이아웃으로 판단합니다.
+    키는 사전순으로 정렬되어 있다고 가정하며, 가장 이른 날짜를 프로젝션 범위 시작으로 사용합니다.
+    template은 날짜별 키 접두사이며, date_partitioned에서만 Athena 파티션 위치(폴더)가 됩니다.
+    """
+    layout = None
+    base = None
+    start_date = None
+
+    for key in keys:
+        key_layout, key_base, key_date = classify_key(key)
+        if key_layout == LAYOUT_FLAT:
+            return {'layout': LAYOUT_FLAT}
+        if layout is None:
+            layout, base = key_layout, key_base
+        elif (key_layout, key_base) != (layout, base):
+            # 여러 소스 버킷/리전이 섞여 있으면 하나의 템플릿으로 표현할 수 없음
+            return {'layout': LAYOUT_FLAT}
+        if start_date is None or key_date < start_date:
+            start_date = key_date
+
+    if layout is None:
+        return {'layout': LAYOUT_FLAT}
+
+    # simple_date 레이아웃은 객체가 base 바로 아래에 있으므로 디렉터리 단위로 LOCATION 지정
+    location_prefix = base if layout == LAYOUT_DATE_PARTITIONED else base[:base.rfind('/') + 1]
+
+    return {
+        'layout': layout,
+        'location': f"s3://{bucket_name}/{location_prefix}",
+        'template': f"s3://{bucket_name}/{base}${{{PARTITION_COLUMN}}}",
+        'date_format': DATE_FORMATS[layout][0],
+        'start_date': start_date,
+    }
+
+
+def is_partitioned(layout_info):
+    """파티션 프로젝션 사용 가능 여부 (날짜가 폴더인 date_partitioned 레이아웃만)
+
+    Athena는 파티션 위치를 폴더로 읽으므로, simple_date의 's3://.../prefix/2024-01-01' 같은
+    파일 이름 접두사는 파티션 위치가 될 수 없습니다 (프로젝션 테이블이 빈 결과를 반환).
+    """
+    return bool(layout_info) and layout_info.get('layout') == LAYOUT_DATE_PARTITIONED
+
+
+def has_dated_keys(layout_info):
+    """날짜별 키 접두사(day_location)로 하루치 객체만 목록 조회할 수 있는지 (date_partitioned, simple_date)"""
+    return bool(layout_info) and layout_info.get('layout') in DATE_FORMATS
+
+
+def projection_properties(layout_info):
+    """Athena 파티션 프로젝션 TBLPROPERTIES 생성"""
+    return {
+        'projection.enabled': 'true',
+        f'projection.{PARTITION_COLUMN}.type': 'date',
+        f'projection.{PARTITION_COLUMN}.format': layout_info['date_format'],
+        f'projection.{PARTITION_COLUMN}.range': f"{layout_info['start_date']},NOW",
+        f'projection.{PARTITION_COLUMN}.interval': '1',
+        f'projection.{PARTITION_COLUMN}.interval.unit': 'DAYS',
+        'storage.location.template': layout_info['template'],
+    }
+
+
+def format_tblproperties(properties):
+    """TBLPROPERTIES 절 문자열 생성"""
+    items = ',\n          '.join(f"'{name}'='{value}'" for name, value in properties.items())
+    return f"TBLPROPERTIES (\n          {items})"
+
+
+def partition_value(layout_info, day):
+    """date/datetime 값을 파티션 컬럼 값 문자열로 변환"""
+    python_format = DATE_FORMATS[layout_info['layout']][1]
+    if isinstance(day, str):
+        day = datetime.strptime(day, '%Y-%m-%d')
+    return day.strftime(python_format)
+
+
+def day_location(layout_info, day):
+    """특정 날짜 로그가 저장되는 S3 경로(접두사) 반환 (has_dated_keys 레이아웃)"""
+    return layout_info['template'].replace(f"${{{PARTITION_COLUMN}}}", partition_value(layout_info, day))
+
+
+def date_predicate(layout_info, start_day, end_day=None):
+    """날짜 범위 WHERE 조건 생성 (파티션 프루닝용)"""
+    if not is_partitioned(layout_info):
+        return ''
+    condition = f"{PARTITION_COLUMN} >= '{partition_value(layout_info, start_day)}'"
+    if end_day is not None:
+        condition += f" AND {PARTITION_COLUMN} <= '{partition_value(layout_info, end_day)}'"
+    return condition
@@ -0,0 +1,245 @@
+# log_parser.py - S3 Access Log 스트리밍 파서 (컬럼 단위 배치 출력)
+import gzip
+import re
+from collections import Counter
+from datetime import datetime
+
+# create_s3_access_log_table과 동일한 26개 컬럼 스키마 (이름, Athena 타입)
+COLUMNS = [
+    ('bucketowner', 'STRING'),
+    ('bucket_name', 'STRING'),
+    ('requestdatetime', 'STRING'),
+    ('remoteip', 'STRING'),
+    ('requester', 'STRING'),
+    ('requestid', 'STRING'),
+    ('operation', 'STRING'),
+    ('key', 'STRING'),
+    ('request_uri', 'STRING'),
+    ('httpstatus', 'STRING'),
+    ('errorcode', 'STRING'),
+    ('bytessent', 'BIGINT'),
+    ('objectsize', 'BIGINT'),
+    ('totaltime', 'STRING'),
+    ('turnaroundtime', 'STRING'),
+    ('referrer', 'STRING'),
+    ('useragent', 'STRING'),
+    ('versionid', 'STRING'),
+    ('hostid', 'STRING'),
+    ('sigv', 'STRING'),
+    ('ciphersuite', 'STRING'),
+    ('authtype', 'STRING'),
+    ('endpoint', 'STRING'),
+    ('tlsversion', 'STRING'),
+    ('accesspointarn', 'STRING'),
+    ('aclrequired', 'STRING'),
+]
+COLUMN_NAMES = [name for name, _ in COLUMNS]
+NUM_COLUMNS = len(COLUMNS)
+
+# 오래된 로그는 versionid(18번째 필드)까지만 존재
+MIN_FIELDS = 18
+
+# Athena/Glue RegexSerDe input.regex (create_s3_access_log_table DDL과 같은 패턴, SQL 이스케이프 전)
+SERDE_INPUT_REGEX = (
+    r'([^ ]*) ([^ ]*) \[(.*?)\] ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ("[^"]*"|-) (-|[0-9]*) '
+    r'([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ("[^"]*"|-) ([^ ]*)'
+    r'(?: ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*) ([^ ]*))?.*$'
+)
+
+# Athena input.regex와 같은 필드 규칙을 소유 수량자(*+)로 작성해 백트래킹 없이 한 번에 토큰화
+_FIELD = r'([^ \n]*+)'
+_QUOTED = r'("[^"\n]*+"|-)'
+_LINE_RE = re.compile(
+    '^' + ' '.join([
+        _FIELD, _FIELD, r'\[([^\]\n]*+)\]', _FIELD, _FIELD, _FIELD, _FIELD, _FIELD, _QUOTED,
+        r'(-|[0-9]*+)', _FIELD, _FIELD, _FIELD, _FIELD, _FIELD, _FIELD, _QUOTED, _FIELD,
+    ]) + '(?: ' + ' '.join([_FIELD] * (NUM_COLUMNS - MIN_FIELDS)) + r')?[^\n]*+$',
+    re.MULTILINE
+)
+_BIGINT_INDEXES = [i for i, (_, type_name) in enumerate(COLUMNS) if type_name == 'BIGINT']
+_OPTIONAL_INDEXES = range(MIN_FIELDS, NUM_COLUMNS)
+
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+MONTHS = {name: index for index, name in enumerate(
+    ['Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec'], 1)}
+
+
+def tokenize_line(line):
+    """로그 한 줄을 26개 필드 튜플로 분리 (형식이 맞지 않으면 None)"""
+    match = _LINE_RE.match(line.rstrip('\r\n'))
+    if match is None:
+        return None
+    return match.groups()
+
+
+def parse_requestdatetime(value):
+    """requestdatetime 문자열을 datetime(UTC)으로 변환 (strptime보다 빠른 고정 위치 파싱)"""
+    if not value:
+        return None
+    return datetime(int(value[7:11]), MONTHS[value[3:6]], int(value[0:2]),
+                    int(value[12:14]), int(value[15:17]), int(value[18:20]))
+
+
+def sortable_datetime(value):
+    """'06/Feb/2019:00:00:38 +0000' -> '2019-02-06 00:00:38' (문자열 비교로 정렬 가능)"""
+    return f"{value[7:11]}-{MONTHS[value[3:6]]:02d}-{value[0:2]} {value[12:20]}"
+
+
+def _to_bigint(values):
+    return [None if value == '-' or value == '' else int(value) for value in values]
+
+
+def _empty_to_none(values):
+    return [value or None for value in values]
+
+
+class LogBatch:
+    """컬럼 단위 로그 배치 (컬럼 이름 -> 값 리스트)"""
+
+    def __init__(self, columns, num_rows, invalid_lines=0, num_bytes=0):
+        self.columns = columns
+        self.num_rows = num_rows
+        self.invalid_lines = invalid_lines
+        self.num_bytes = num_bytes
+
+    def column(self, name):
+        return self.columns[name]
+
+    def to_arrow(self):
+        """pyarrow RecordBatch로 변환 (pyarrow 필요)"""
+        try:
+            import pyarrow as pa
+        except ImportError:
+            raise ImportError("pyarrow is required for Arrow output (pip install pyarrow)")
+
+        arrays = []
+        for name, type_name in COLUMNS:
+            arrow_type = pa.int64() if type_name == 'BIGINT' else pa.string()
+            arrays.append(pa.array(self.columns[name], type=arrow_type))
+        return pa.RecordBatch.from_arrays(arrays, names=COLUMN_NAMES)
+
+
+def parse_text(text, num_bytes=0):
+    """여러 줄 로그 텍스트를 LogBatch 하나로 변환
+
+    청크 전체에 컴파일된 패턴을 한 번 적용(findall)하고, 행 -> 컬럼 전치는 zip으로 처리합니다.
+    """
+    rows = _LINE_RE.findall(text)
+    total_lines = text.count('\n') + (1 if text and not text.endswith('\n') else 0)
+    invalid = total_lines - len(rows)
+
+    if not rows:
+        return LogBatch({name: [] for name in COLUMN_NAMES}, 0, invalid, num_bytes)
+
+    transposed = list(zip(*rows))
+    for index in _BIGINT_INDEXES:
+        transposed[index] = _to_bigint(transposed[index])
+    for index in _OPTIONAL_INDEXES:
+        # 필드가 없는 구형 로그는 Athena와 같이 NULL 처리
+        if '' in transposed[index]:
+            transposed[index] = _empty_to_none(transposed[index])
+
+    columns = {name: list(values) for name, values in zip(COLUMN_NAMES, transposed)}
+    return LogBatch(columns, len(rows), invalid, num_bytes)
+
+
+def parse_lines(lines, num_bytes=0):
+    """로그 라인 목록을 LogBatch 하나로 변환"""
+    return parse_text('\n'.join(line.rstrip('\r\n') for line in lines if line.strip()), num_bytes)
+
+
+def iter_batches(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """바이너리 스트림(파일, boto3 StreamingBody 등)을 읽어 LogBatch를 순서대로 생성"""
+    remainder = b''
+    while True:
+        chunk = stream.read(chunk_size)
+        if not chunk:
+            break
+        data = remainder + chunk
+        cut = data.rfind(b'\n') + 1
+        if cut == 0:
+            remainder = data
+            continue
+        remainder = data[cut:]
+        yield parse_text(data[:cut].decode('utf-8', errors='replace'), num_bytes=cut)
+
+    if remainder:
+        yield parse_text(remainder.decode('utf-8', errors='replace'), num_bytes=len(remainder))
+
+
+def open_log_stream(body, key=''):
+    """gzip 압축 객체면 스트리밍 압축 해제 래퍼 반환"""
+    if key.endswith('.gz'):
+        return gzip.GzipFile(fileobj=body)
+    return body
+
+
+def iter_object_batches(s3_client, bucket_name, key, chunk_size=DEFAULT_CHUNK_SIZE):
+    """S3 로그 객체 하나를 스트리밍으로 읽어 LogBatch 생성"""
+    response = s3_client.get_object(Bucket=bucket_name, Key=key)
+    yield from iter_batches(open_log_stream(response['Body'], key), chunk_size)
+
+
+class LogSummary:
+    """로그 배치 검증/요약 집계 (병합 가능)"""
+
+    def __init__(self):
+        self.rows = 0
+        self.invalid_lines = 0
+        self.bytes_read = 0
+        self.bytes_sent = 0
+        self.status_counts = Counter()
+        self.operation_counts = Counter()
+        self.error_counts = Counter()
+
+    def update(self, batch):
+        self.rows += batch.num_rows
+        self.invalid_lines += batch.invalid_lines
+        self.bytes_read += batch.num_bytes
+        self.bytes_sent += sum(value for value in batch.columns['bytessent'] if value)
+        self.status_counts.update(batch.columns['httpstatus'])
+        self.operation_counts.update(batch.columns['operation'])
+        self.error_counts.update(code for code in batch.columns['errorcode'] if code != '-')
+        return self
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.invalid_lines += other.invalid_lines
+        self.bytes_read += other.bytes_read
+        self.bytes_sent += other.bytes_sent
+        self.status_counts.update(other.status_counts)
+        self.operation_counts.update(other.operation_counts)
+        self.error_counts.update(other.error_counts)
+        return self
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'invalid_lines': self.invalid_lines,
+            'bytes_read': self.bytes_read,
+            'bytes_sent': self.bytes_sent,
+            'status_counts': dict(self.status_counts),
+            'operation_counts': dict(self.operation_counts),
+            'error_counts': dict(self.error_counts),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        summary = cls()
+        summary.rows = data['rows']
+        summary.invalid_lines = data['invalid_lines']
+        summary.bytes_read = data['bytes_read']
+        summary.bytes_sent = data['bytes_sent']
+        summary.status_counts = Counter(data['status_counts'])
+        summary.operation_counts = Counter(data['operation_counts'])
+        summary.error_counts = Counter(data['error_counts'])
+        return summary
+
+
+def summarize_stream(stream, chunk_size=DEFAULT_CHUNK_SIZE):
+    """스트림 전체를 파싱하여 LogSummary 반환"""
+    summary = LogSummary()
+    for batch in iter_batches(stream, chunk_size):
+        summary.update(batch)
+    return summary
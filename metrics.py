@@ -0,0 +1,181 @@
+# metrics.py - Athena 쿼리 비용/지연 시간 및 S3 목록 조회 시간 계측 (JSON lines, Prometheus 텍스트)
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from inventory import query_cost
+
+# get_query_execution 응답의 Statistics 항목 -> 기록 이름
+STATISTICS = {
+    'DataScannedInBytes': 'data_scanned_bytes',
+    'EngineExecutionTimeInMillis': 'engine_execution_ms',
+    'QueryQueueTimeInMillis': 'queue_ms',
+    'QueryPlanningTimeInMillis': 'planning_ms',
+    'ServiceProcessingTimeInMillis': 'service_processing_ms',
+    'TotalExecutionTimeInMillis': 'total_execution_ms',
+}
+
+# 쿼리가 다루는 첫 번째 테이블 (FROM / INSERT INTO / CREATE/DROP TABLE 대상)
+_TABLE_RE = re.compile(
+    r'\b(?:FROM|INTO|TABLE(?:\s+IF\s+(?:NOT\s+)?EXISTS)?|DATABASE(?:\s+IF\s+(?:NOT\s+)?EXISTS)?)\s+([`"]?\w[\w`".]*)',
+    re.IGNORECASE
+)
+
+
+def query_label(sql):
+    """쿼리 분류용 대상 테이블 이름 ('db.table', 없으면 'other', 따옴표/백틱은 제거)"""
+    match = _TABLE_RE.search(sql or '')
+    return re.sub('[`"]', '', match.group(1)).lower() if match else 'other'
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class MetricsRecorder:
+    """쿼리/목록 조회 측정값을 기록하고 누적 카운터로 집계
+
+    jsonl_path가 있으면 측정값마다 한 줄씩 JSON으로 추가합니다.
+    """
+
+    def __init__(self, jsonl_path=None, max_records=1000):
+        self.jsonl_path = jsonl_path
+        self.records = deque(maxlen=max_records)
+        # (지표 이름, 레이블 튜플) -> 누적 값
+        self.counters = {}
+        self._lock = threading.Lock()
+        if jsonl_path:
+            os.makedirs(os.path.dirname(os.path.abspath(jsonl_path)), exist_ok=True)
+
+    def _add(self, name, labels, value):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def _write(self, record):
+        with self._lock:
+            self.records.append(record)
+            if self.jsonl_path:
+                with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record, default=str) + '\n')
+
+    def record_query(self, query_execution_id, status, response, wall_seconds, polls, poll_seconds):
+        """쿼리 하나의 Athena 실행 통계와 클라이언트 측 대기 비용 기록
+
+        polling_overhead_ms는 클라이언트가 기다린 시간 중 Athena 총 실행 시간을 넘는 부분
+        (완료 후 다음 폴링까지의 지연 + API 호출 지연)입니다.
+        """
+        execution = (response or {}).get('QueryExecution', {})
+        statistics = execution.get('Statistics', {})
+        record = {
+            'type': 'query',
+            'time': time.time(),
+            'query_execution_id': query_execution_id,
+            'status': status,
+            'label': query_label(execution.get('Query')),
+            'statement_type': execution.get('StatementType', 'UNKNOWN'),
+            'workgroup': execution.get('WorkGroup'),
+            'reused_result': statistics.get('ResultReuseInformation', {}).get('ReusedPreviousResult', False),
+            'wall_ms': round(wall_seconds * 1000),
+            'polls': polls,
+            'poll_api_ms': round(poll_seconds * 1000),
+        }
+        for source, name in STATISTICS.items():
+            record[name] = statistics.get(source)
+        total_ms = record['total_execution_ms']
+        record['polling_overhead_ms'] = max(0, record['wall_ms'] - total_ms) if total_ms is not None else None
+        scanned = record['data_scanned_bytes'] or 0
+        record['cost_usd'] = query_cost(scanned) if scanned else 0.0
+
+        labels = {'label': record['label'], 'statement_type': record['statement_type']}
+        with self._lock:
+            self._add('athena_queries_total', dict(labels, status=status), 1)
+            self._add('athena_data_scanned_bytes_total', labels, scanned)
+            self._add('athena_cost_dollars_total', labels, record['cost_usd'])
+            for name in ['engine_execution_ms', 'queue_ms', 'planning_ms', 'service_processing_ms']:
+                if record[name] is not None:
+                    self._add(f"athena_{name[:-3]}_seconds_total", labels, record[name] / 1000)
+            self._add('athena_client_wait_seconds_total', labels, wall_seconds)
+            if record['polling_overhead_ms'] is not None:
+                self._add('athena_polling_overhead_seconds_total', labels, record['polling_overhead_ms'] / 1000)
+            self._add('athena_polls_total', labels, polls)
+        self._write(record)
+        return record
+
+    def record_listing(self, operation, bucket_name, prefix, seconds, objects=None, error=None):
+        record = {
+            'type': 'listing',
+            'time': time.time(),
+            'operation': operation,
+            'bucket': bucket_name,
+            'prefix': prefix,
+            'duration_ms': round(seconds * 1000),
+            'objects': objects,
+            'error': error,
+        }
+        labels = {'operation': operation}
+        with self._lock:
+            self._add('s3_listings_total', dict(labels, result='error' if error else 'ok'), 1)
+            self._add('s3_listing_seconds_total', labels, seconds)
+            if objects:
+                self._add('s3_listed_items_total', labels, objects)
+        self._write(record)
+        return record
+
+    @contextmanager
+    def listing(self, operation, bucket_name=None, prefix=''):
+        """목록 조회 시간 측정: with recorder.listing('folders', bucket) as result: result['objects'] = n"""
+        result = {'objects': None}
+        started = time.perf_counter()
+        try:
+            yield result
+        except Exception as e:
+            self.record_listing(operation, bucket_name, prefix, time.perf_counter() - started,
+                                result['objects'], error=type(e).__name__)
+            raise
+        self.record_listing(operation, bucket_name, prefix, time.perf_counter() - started, result['objects'])
+
+    def query_records(self):
+        return [record for record in list(self.records) if record['type'] == 'query']
+
+    def listing_records(self):
+        return [record for record in list(self.records) if record['type'] == 'listing']
+
+    def summary_by_label(self):
+        """테이블(레이블)별 쿼리 수, 스캔량, 비용, 평균 시간"""
+        summary = {}
+        for record in self.query_records():
+            stats = summary.setdefault(record['label'], {
+                'queries': 0, 'data_scanned_bytes': 0, 'cost_usd': 0.0,
+                'engine_execution_ms': 0, 'queue_ms': 0, 'polling_overhead_ms': 0,
+            })
+            stats['queries'] += 1
+            for name in ['data_scanned_bytes', 'cost_usd', 'engine_execution_ms', 'queue_ms',
+                         'polling_overhead_ms']:
+                stats[name] += record[name] or 0
+        for stats in summary.values():
+            for name in ['engine_execution_ms', 'queue_ms', 'polling_overhead_ms']:
+                stats[f"avg_{name}"] = round(stats.pop(name) / stats['queries'])
+        return summary
+
+    def to_prometheus(self):
+        """Prometheus 텍스트 노출 형식의 카운터"""
+        with self._lock:
+            items = sorted(self.counters.items())
+        lines = []
+        current = None
+        for (name, labels), value in items:
+            if name != current:
+                lines.append(f"# TYPE {name} counter")
+                current = name
+            label_text = ','.join(f'{key}="{_escape_label(label)}"' for key, label in labels)
+            series = f"{name}{{{label_text}}}" if label_text else name
+            lines.append(f"{series} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
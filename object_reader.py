@@ -0,0 +1,258 @@
+# object_reader.py - 고정 메모리 예산 안에서 S3 로그 객체를 미리 읽어오는 리더 (병렬 범위 GET, 버퍼 재사용)
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.config import Config
+
+from aws_clients import DEFAULT_CONFIG
+from log_parser import DEFAULT_CHUNK_SIZE, parse_text
+
+# 범위 GET 조각 크기 (이보다 큰 객체는 조각으로 나누어 동시에 받음)
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+# 동시에 받아 둘 수 있는 전체 버퍼 크기
+DEFAULT_MEMORY_BUDGET = 128 * 1024 * 1024
+# 동시에 진행 중인 GET 요청 수 (작은 객체는 지연 시간이 병목이므로 충분히 크게)
+DEFAULT_PREFETCH = 64
+# 가장 작은 버퍼 크기 등급
+MIN_BUFFER_SIZE = 64 * 1024
+
+
+def reader_client(region_name='us-east-1', credentials=None, max_workers=DEFAULT_PREFETCH):
+    """동시 요청 수만큼 연결 풀을 늘리고 TCP keepalive를 켠 S3 클라이언트"""
+    import boto3
+    config = DEFAULT_CONFIG.merge(Config(max_pool_connections=max(max_workers, 50), tcp_keepalive=True))
+    return boto3.client('s3', region_name=region_name, config=config, **(credentials or {}))
+
+
+class BufferPool:
+    """크기 등급(2의 거듭제곱)별 bytearray를 재사용하는 고정 예산 버퍼 풀
+
+    할당된 버퍼(사용 중 + 여유) 합계가 예산을 넘지 않도록, 새 등급이 필요하면 다른 등급의
+    여유 버퍼를 버립니다. 리더의 생성기 스레드에서만 호출하므로 잠금은 없습니다.
+    """
+
+    def __init__(self, budget_bytes=DEFAULT_MEMORY_BUDGET, min_size=MIN_BUFFER_SIZE):
+        self.budget_bytes = budget_bytes
+        self.min_size = min_size
+        self.allocated = 0
+        self.allocations = 0
+        self.reuses = 0
+        self._free = {}
+
+    def size_class(self, size):
+        size_class = self.min_size
+        while size_class < size:
+            size_class *= 2
+        return size_class
+
+    def _drop_free(self, keep_class):
+        for size_class, buffers in self._free.items():
+            if buffers and size_class != keep_class:
+                buffers.pop()
+                self.allocated -= size_class
+                return True
+        return False
+
+    def try_acquire(self, size):
+        """size 바이트 이상 버퍼 (예산이 부족하면 None)"""
+        size_class = self.size_class(size)
+        free = self._free.get(size_class)
+        if free:
+            self.reuses += 1
+            return free.pop()
+        while self.allocated + size_class > self.budget_bytes:
+            if not self._drop_free(size_class):
+                return None
+        self.allocated += size_class
+        self.allocations += 1
+        return bytearray(size_class)
+
+    def release(self, buffer):
+        self._free.setdefault(len(buffer), []).append(buffer)
+
+
+def _read_into(body, view):
+    """스트림에서 view로 직접 읽기 (readinto가 없는 스트림은 읽은 뒤 복사)"""
+    readinto = getattr(body, 'readinto', None)
+    if readinto is not None:
+        try:
+            return readinto(view)
+        except NotImplementedError:
+            pass
+    data = body.read(len(view))
+    view[:len(data)] = data
+    return len(data)
+
+
+class _GzipStream:
+    """gzip 조각을 순서대로 받아 최대 chunk_size 단위로 압축 해제 (다중 멤버 gzip 지원)"""
+
+    def __init__(self, chunk_size):
+        self.chunk_size = chunk_size
+        self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+
+    def feed(self, data):
+        while data:
+            output = self._decompressor.decompress(data, self.chunk_size)
+            if output:
+                yield output
+            if self._decompressor.eof:
+                data = self._decompressor.unused_data
+                self._decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            else:
+                data = self._decompressor.unconsumed_tail
+
+    def flush(self):
+        output = self._decompressor.flush()
+        if output:
+            yield output
+
+
+class PrefetchingObjectReader:
+    """많은 작은 로그 객체와 가끔 있는 큰(gzip) 객체를 순서대로 스트리밍하는 리더
+
+    작은 객체는 객체 하나를 GET 한 번으로, part_size보다 큰 객체는 범위 GET 조각으로 나누어
+    최대 prefetch개 요청을 동시에 진행합니다. 받은 데이터는 예산 안에서 재사용하는 버퍼에
+    담기며, 예산이 차면 소비자가 앞 조각을 처리할 때까지 새 요청을 미룹니다.
+    """
+
+    def __init__(self, s3_client, prefetch=DEFAULT_PREFETCH, memory_budget=DEFAULT_MEMORY_BUDGET,
+                 part_size=DEFAULT_PART_SIZE):
+        self.s3_client = s3_client
+        self.prefetch = prefetch
+        self.part_size = part_size
+        # 예산은 최소한 조각 하나는 담을 수 있어야 함
+        self.pool = BufferPool(max(memory_budget, part_size * 2))
+        self.stats = {'objects': 0, 'requests': 0, 'ranged_objects': 0, 'bytes': 0}
+        self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.prefetch, thread_name_prefix='s3-reader')
+        return self._executor
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _parts(self, objects):
+        """[(키, 크기), ...] -> 요청 단위 (키, 시작, 길이, 마지막 조각 여부, 범위 요청 여부)"""
+        for key, size in objects:
+            if size <= self.part_size:
+                yield key, 0, size, True, False
+                continue
+            self.stats['ranged_objects'] += 1
+            for start in range(0, size, self.part_size):
+                length = min(self.part_size, size - start)
+                yield key, start, length, start + length >= size, True
+
+    def _fetch(self, bucket_name, key, start, length, ranged, buffer):
+        params = {'Bucket': bucket_name, 'Key': key}
+        if ranged:
+            params['Range'] = f"bytes={start}-{start + length - 1}"
+        response = self.s3_client.get_object(**params)
+        body = response['Body']
+        view = memoryview(buffer)
+        try:
+            expected = response.get('ContentLength', length)
+            if expected > len(buffer):
+                raise ValueError(f"s3://{bucket_name}/{key} is larger than its listed size")
+            filled = 0
+            while filled < expected:
+                count = _read_into(body, view[filled:expected])
+                if not count:
+                    break
+                filled += count
+            return filled
+        finally:
+            view.release()
+            body.close()
+
+    def iter_parts(self, bucket_name, objects):
+        """(키, memoryview, 마지막 조각 여부)를 객체/조각 순서대로 생성
+
+        memoryview는 다음 조각을 요청하면 재사용되므로, 필요하면 소비자가 복사해야 합니다.
+        """
+        parts = self._parts(objects)
+        part = next(parts, None)
+        in_flight = deque()
+        try:
+            while part is not None or in_flight:
+                while part is not None and len(in_flight) < self.prefetch:
+                    key, start, length, last, ranged = part
+                    buffer = self.pool.try_acquire(max(length, 1))
+                    if buffer is None:
+                        break
+                    future = self.executor.submit(self._fetch, bucket_name, key, start, length, ranged, buffer)
+                    in_flight.append((key, last, buffer, future))
+                    part = next(parts, None)
+
+                key, last, buffer, future = in_flight.popleft()
+                try:
+                    filled = future.result()
+                    self.stats['requests'] += 1
+                    self.stats['bytes'] += filled
+                    self.stats['objects'] += 1 if last else 0
+                    yield key, memoryview(buffer)[:filled], last
+                finally:
+                    self.pool.release(buffer)
+        finally:
+            # 소비자가 중간에 멈추면 남은 요청을 모두 먼저 취소한 뒤, 이미 진행 중인 요청은
+            # 끝날 때까지 기다려 버퍼 반환 (하나씩 기다리면 그동안 대기 요청이 시작됨)
+            running = [future for _, _, _, future in in_flight if not future.cancel()]
+            for future in running:
+                future.exception()
+            for _, _, buffer, _ in in_flight:
+                self.pool.release(buffer)
+
+    def iter_data(self, bucket_name, objects, chunk_size=DEFAULT_CHUNK_SIZE):
+        """(키, 데이터, 객체 끝 여부) 생성 - '.gz' 객체는 스트리밍으로 압축 해제"""
+        stream = None
+        for key, view, last in self.iter_parts(bucket_name, objects):
+            if key.endswith('.gz'):
+                stream = stream or _GzipStream(chunk_size)
+                for output in stream.feed(view):
+                    yield key, output, False
+                if last:
+                    for output in stream.flush():
+                        yield key, output, False
+                    stream = None
+                    yield key, b'', True
+            else:
+                yield key, view, last
+
+    def _iter_batches(self, bucket_name, objects, chunk_size, per_object):
+        pending = bytearray()
+        emitted = False
+        for key, data, last in self.iter_data(bucket_name, objects, chunk_size):
+            pending += data
+            if last and pending and pending[-1:] != b'\n':
+                pending += b'\n'
+            if not (last and per_object) and len(pending) < chunk_size:
+                continue
+            cut = len(pending) if last and per_object else pending.rfind(b'\n') + 1
+            if cut:
+                with memoryview(pending) as view, view[:cut] as text:
+                    batch = parse_text(str(text, 'utf-8', 'replace'), num_bytes=cut)
+                del pending[:cut]
+                emitted = True
+                yield key, batch
+            if per_object and last:
+                # 빈 객체도 빈 배치 하나로 끝을 알림
+                if not emitted:
+                    yield key, parse_text('')
+                emitted = False
+        if pending:
+            yield None, parse_text(pending.decode('utf-8', errors='replace'), num_bytes=len(pending))
+
+    def iter_batches(self, bucket_name, objects, chunk_size=DEFAULT_CHUNK_SIZE):
+        """여러 객체를 이어 붙여 chunk_size 안팎의 LogBatch 생성 (작은 객체가 많을 때 파싱 효율적)"""
+        for _, batch in self._iter_batches(bucket_name, objects, chunk_size, per_object=False):
+            yield batch
+
+    def iter_object_batches(self, bucket_name, objects, chunk_size=DEFAULT_CHUNK_SIZE):
+        """(키, LogBatch)를 객체별로 생성 (큰 객체는 여러 배치, 빈 객체는 빈 배치 하나)"""
+        yield from self._iter_batches(bucket_name, objects, chunk_size, per_object=True)
@@ -0,0 +1,353 @@
+# provisioning.py - 설정 파일 기반 Glue 카탈로그 일괄 프로비저닝 (Athena 쿼리/폴링 없이 Glue API 직접 호출)
+#
+# 설정 파일 (JSON, PyYAML이 있으면 YAML도 가능):
+# {
+#   "region": "us-east-1",
+#   "defaults": {"database": "s3_access_logs_db", "partitioning": "projection"},
+#   "tables": [
+#     {"location": "s3://log-bucket/logs/", "table": "app_logs"},
+#     {"location": "s3://other-logs/", "database": "team_db", "partitioning": "none"}
+#   ]
+# }
+# partitioning: projection(파티션 프로젝션, 기본) | explicit(BatchCreatePartition으로 날짜 파티션 등록) | none
+import argparse
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+
+from botocore.exceptions import ClientError
+
+from log_layout import (LAYOUT_FLAT, PARTITION_COLUMN, day_location, detect_layout, format_tblproperties,
+                        is_partitioned, partition_value, projection_properties)
+from log_parser import COLUMNS, SERDE_INPUT_REGEX
+from s3_utils import split_s3_uri
+
+PARTITIONING_MODES = ('projection', 'explicit', 'none')
+
+# BatchCreatePartition 한 번에 등록 가능한 최대 파티션 수
+BATCH_PARTITION_LIMIT = 100
+
+INPUT_FORMAT = 'org.apache.hadoop.mapred.TextInputFormat'
+OUTPUT_FORMAT = 'org.apache.hadoop.hive.ql.io.HiveIgnoreKeyTextOutputFormat'
+SERDE_LIBRARY = 'org.apache.hadoop.hive.serde2.RegexSerDe'
+
+
+def default_table_name(location):
+    """'s3://my-log.bucket/app/' -> 'my_log_bucket_app_logs'"""
+    bucket_name, prefix = split_s3_uri(location)
+    name = re.sub(r'[^a-z0-9]+', '_', f"{bucket_name}_{prefix}".lower()).strip('_')
+    return f"{name}_logs"
+
+
+def load_config(path):
+    """설정 파일을 읽어 테이블 명세 목록 반환 ({database, table, location, partitioning, layout})"""
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("PyYAML is required for YAML config files (pip install pyyaml)")
+            config = yaml.safe_load(f)
+        else:
+            config = json.load(f)
+
+    defaults = {'database': 's3_access_logs_db', 'partitioning': 'projection'}
+    defaults.update(config.get('defaults', {}))
+    specs = []
+    for entry in config.get('tables', []):
+        spec = dict(defaults, **entry)
+        if 'location' not in spec:
+            spec['location'] = f"s3://{spec['bucket']}/{spec.get('prefix', '')}"
+        spec.setdefault('table', default_table_name(spec['location']))
+        if spec['partitioning'] not in PARTITIONING_MODES:
+            raise ValueError(f"Unknown partitioning '{spec['partitioning']}' for {spec['location']}")
+        specs.append(spec)
+    return config.get('region'), specs
+
+
+def access_log_table_input(table_name, location, layout=None, partitioning='projection'):
+    """S3 Access Log 테이블 Glue TableInput (create_s3_access_log_table DDL과 같은 스키마/SerDe)"""
+    parameters = {'EXTERNAL': 'TRUE'}
+    partition_keys = []
+    if partitioning != 'none' and is_partitioned(layout):
+        location = layout['location']
+        partition_keys = [{'Name': PARTITION_COLUMN, 'Type': 'string'}]
+        if partitioning == 'projection':
+            parameters.update(projection_properties(layout))
+
+    return {
+        'Name': table_name,
+        'TableType': 'EXTERNAL_TABLE',
+        'Parameters': parameters,
+        'PartitionKeys': partition_keys,
+        'StorageDescriptor': {
+            'Columns': [{'Name': name, 'Type': type_name.lower()} for name, type_name in COLUMNS],
+            'Location': location,
+            'InputFormat': INPUT_FORMAT,
+            'OutputFormat': OUTPUT_FORMAT,
+            'SerdeInfo': {
+                'SerializationLibrary': SERDE_LIBRARY,
+                'Parameters': {'input.regex': SERDE_INPUT_REGEX},
+            },
+        },
+    }
+
+
+def access_log_table_ddl(database_name, table_name, location, layout=None):
+    """S3 Access Log 테이블 Athena DDL (access_log_table_input과 같은 스키마/SerDe)
+
+    layout이 날짜 파티션 레이아웃이면 파티션 프로젝션 테이블을 생성합니다.
+    """
+    partition_clause = ''
+    tblproperties_clause = ''
+    if is_partitioned(layout):
+        location = layout['location']
+        partition_clause = f"PARTITIONED BY (`{PARTITION_COLUMN}` STRING)"
+        tblproperties_clause = format_tblproperties(projection_properties(layout))
+    columns = ',\n          '.join(f"`{name}` {type_name}" for name, type_name in COLUMNS)
+    # SQL 문자열 리터럴 이스케이프 (역슬래시, 작은따옴표)
+    input_regex = SERDE_INPUT_REGEX.replace('\\', '\\\\').replace("'", "\\'")
+    return f"""
+        CREATE EXTERNAL TABLE IF NOT EXISTS `{database_name}.{table_name}`(
+          {columns})
+        {partition_clause}
+        ROW FORMAT SERDE
+          '{SERDE_LIBRARY}'
+        WITH SERDEPROPERTIES (
+          'input.regex'='{input_regex}')
+        STORED AS INPUTFORMAT
+          '{INPUT_FORMAT}'
+        OUTPUTFORMAT
+          '{OUTPUT_FORMAT}'
+        LOCATION
+          '{location}'
+        {tblproperties_clause}
+        """
+
+
+def table_differences(existing, desired):
+    """기존 Glue 테이블과 원하는 TableInput의 차이 항목 이름 목록"""
+    current = existing.get('StorageDescriptor', {})
+    wanted = desired['StorageDescriptor']
+    differences = []
+    if current.get('Location') != wanted['Location']:
+        differences.append('location')
+    if [(c['Name'], c['Type'].lower()) for c in current.get('Columns', [])] != \
+            [(c['Name'], c['Type']) for c in wanted['Columns']]:
+        differences.append('columns')
+    if current.get('SerdeInfo', {}).get('SerializationLibrary') != SERDE_LIBRARY or \
+            current.get('SerdeInfo', {}).get('Parameters', {}).get('input.regex') != SERDE_INPUT_REGEX:
+        differences.append('serde')
+    if [key['Name'] for key in existing.get('PartitionKeys', [])] != \
+            [key['Name'] for key in desired['PartitionKeys']]:
+        differences.append('partition_keys')
+    parameters = existing.get('Parameters', {})
+    managed = {name for name in list(parameters) + list(desired['Parameters'])
+               if name.startswith('projection.') or name == 'storage.location.template'}
+    if any(parameters.get(name) != desired['Parameters'].get(name) for name in managed):
+        differences.append('projection')
+    return differences
+
+
+def daily_partition_values(layout, start_date, end_date=None):
+    """start_date ~ end_date(기본 오늘) 날짜 파티션 값과 위치 [(값, 위치), ...]"""
+    day = datetime.strptime(start_date.replace('/', '-'), '%Y-%m-%d').date()
+    end_date = end_date or date.today()
+    values = []
+    while day <= end_date:
+        values.append((partition_value(layout, day), day_location(layout, day)))
+        day += timedelta(days=1)
+    return values
+
+
+class GlueProvisioner:
+    """Glue CreateDatabase/CreateTable/UpdateTable/BatchCreatePartition으로 테이블 일괄 생성
+
+    plan()은 현재 카탈로그와 비교한 작업 목록만 만들고, apply()가 작업을 동시에 실행합니다.
+    이미 같은 상태이면 아무것도 하지 않으므로 여러 번 실행해도 결과가 같습니다.
+    glue_client/s3_client는 boto3 클라이언트 또는 같은 메서드를 가진 모의 객체(moto 등)입니다.
+    """
+
+    def __init__(self, glue_client, s3_client=None, max_workers=16, update=True):
+        self.glue_client = glue_client
+        self.s3_client = s3_client
+        self.max_workers = max_workers
+        self.update = update
+
+    def _map(self, fn, items):
+        items = list(items)
+        if not items:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(items))) as executor:
+            return list(executor.map(fn, items))
+
+    def detect_layout(self, location, sample_size=1000):
+        bucket_name, prefix = split_s3_uri(location)
+        if self.s3_client is None:
+            return {'layout': LAYOUT_FLAT}
+        response = self.s3_client.list_objects_v2(Bucket=bucket_name, Prefix=prefix, MaxKeys=sample_size)
+        return detect_layout(bucket_name, [obj['Key'] for obj in response.get('Contents', [])])
+
+    def existing_databases(self):
+        names = set()
+        for page in self.glue_client.get_paginator('get_databases').paginate():
+            names.update(database['Name'] for database in page['DatabaseList'])
+        return names
+
+    def _existing_table(self, database_name, table_name):
+        try:
+            return self.glue_client.get_table(DatabaseName=database_name, Name=table_name)['Table']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') == 'EntityNotFoundException':
+                return None
+            raise
+
+    def _existing_partitions(self, database_name, table_name):
+        values = set()
+        paginator = self.glue_client.get_paginator('get_partitions')
+        for page in paginator.paginate(DatabaseName=database_name, TableName=table_name):
+            values.update(partition['Values'][0] for partition in page['Partitions'])
+        return values
+
+    def _plan_table(self, spec, databases):
+        database_name, table_name = spec['database'], spec['table']
+        layout = spec.get('layout') or self.detect_layout(spec['location'])
+        desired = access_log_table_input(table_name, spec['location'], layout, spec['partitioning'])
+        existing = self._existing_table(database_name, table_name) if database_name in databases else None
+
+        actions = []
+        if existing is None:
+            actions.append({'action': 'create_table', 'database': database_name, 'table': table_name,
+                            'input': desired})
+        else:
+            differences = table_differences(existing, desired)
+            if differences:
+                actions.append({'action': 'update_table' if self.update else 'skip_changed',
+                                'database': database_name, 'table': table_name, 'input': desired,
+                                'changes': differences})
+
+        if spec['partitioning'] == 'explicit' and is_partitioned(layout):
+            existing_values = set()
+            if existing is not None and existing.get('PartitionKeys'):
+                existing_values = self._existing_partitions(database_name, table_name)
+            missing = [(value, location) for value, location in
+                       daily_partition_values(layout, spec.get('start_date') or layout['start_date'])
+                       if value not in existing_values]
+            if missing:
+                actions.append({'action': 'create_partitions', 'database': database_name,
+                                'table': table_name, 'partitions': missing,
+                                'storage': desired['StorageDescriptor']})
+        return actions
+
+    def plan(self, specs):
+        """설정과 현재 카탈로그의 차이로 작업 목록 생성 (테이블별 조회는 동시에 실행)"""
+        databases = self.existing_databases()
+        actions = [{'action': 'create_database', 'database': name}
+                   for name in sorted({spec['database'] for spec in specs}) if name not in databases]
+        for table_actions in self._map(lambda spec: self._plan_table(spec, databases), specs):
+            actions.extend(table_actions)
+        return actions
+
+    def _create_partitions(self, action):
+        storage = action['storage']
+        for index in range(0, len(action['partitions']), BATCH_PARTITION_LIMIT):
+            inputs = [
+                {'Values': [value], 'StorageDescriptor': dict(storage, Location=location)}
+                for value, location in action['partitions'][index:index + BATCH_PARTITION_LIMIT]
+            ]
+            response = self.glue_client.batch_create_partition(
+                DatabaseName=action['database'], TableName=action['table'], PartitionInputList=inputs
+            )
+            errors = [error for error in response.get('Errors', [])
+                      if error.get('ErrorDetail', {}).get('ErrorCode') != 'AlreadyExistsException']
+            if errors:
+                raise RuntimeError(errors[0].get('ErrorDetail', {}).get('ErrorMessage', 'partition error'))
+
+    def _apply_one(self, action):
+        try:
+            if action['action'] == 'create_database':
+                self.glue_client.create_database(DatabaseInput={'Name': action['database']})
+            elif action['action'] == 'create_table':
+                self.glue_client.create_table(DatabaseName=action['database'], TableInput=action['input'])
+            elif action['action'] == 'update_table':
+                self.glue_client.update_table(DatabaseName=action['database'], TableInput=action['input'])
+            elif action['action'] == 'create_partitions':
+                self._create_partitions(action)
+            return dict(action, status='OK')
+        except ClientError as e:
+            # 동시에 실행된 다른 프로비저닝이 먼저 만든 경우
+            if e.response.get('Error', {}).get('Code') == 'AlreadyExistsException':
+                return dict(action, status='EXISTS')
+            return dict(action, status='FAILED', error=str(e))
+        except RuntimeError as e:
+            return dict(action, status='FAILED', error=str(e))
+
+    def apply(self, actions):
+        """데이터베이스 생성 후 테이블 작업을 동시에 실행 (테이블별 작업은 순서대로): 결과 목록"""
+        results = self._map(self._apply_one, [a for a in actions if a['action'] == 'create_database'])
+        by_table = {}
+        for action in actions:
+            if action['action'] != 'create_database':
+                by_table.setdefault((action['database'], action['table']), []).append(action)
+
+        def apply_table(table_actions):
+            table_results = []
+            for action in table_actions:
+                result = self._apply_one(action) if action['action'] != 'skip_changed' else dict(action, status='SKIPPED')
+                table_results.append(result)
+                if result['status'] == 'FAILED':
+                    break
+            return table_results
+
+        for table_results in self._map(apply_table, by_table.values()):
+            results.extend(table_results)
+        return results
+
+    def provision(self, specs, dry_run=False):
+        actions = self.plan(specs)
+        return actions if dry_run else self.apply(actions)
+
+
+def describe_action(action):
+    target = action['database'] if action['action'] == 'create_database' else \
+        f"{action['database']}.{action['table']}"
+    detail = ''
+    if action.get('changes'):
+        detail = f" ({', '.join(action['changes'])})"
+    elif action.get('partitions'):
+        detail = f" ({len(action['partitions'])} partitions)"
+    status = f" [{action['status']}]" if 'status' in action else ''
+    error = f": {action['error']}" if action.get('error') else ''
+    return f"{action['action']:<18} {target}{detail}{status}{error}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Provision Glue tables for many S3 access log locations")
+    parser.add_argument('config', help="JSON (or YAML) config file")
+    parser.add_argument('--region', help="AWS region (default: config 'region' or AWS_DEFAULT_REGION)")
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--dry-run', action='store_true', help="only print the planned changes")
+    parser.add_argument('--no-update', action='store_true', help="do not update tables that differ")
+    args = parser.parse_args()
+
+    config_region, specs = load_config(args.config)
+    region = args.region or config_region or os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
+
+    from aws_clients import ClientPool
+    pool = ClientPool()
+    provisioner = GlueProvisioner(pool.client('glue', region), pool.client('s3', region),
+                                  max_workers=args.workers, update=not args.no_update)
+    results = provisioner.provision(specs, dry_run=args.dry_run)
+    for result in results:
+        print(describe_action(result))
+    failed = [result for result in results if result.get('status') == 'FAILED']
+    print(f"{'Planned' if args.dry_run else 'Applied'} {len(results)} changes for {len(specs)} tables"
+          + (f", {len(failed)} failed" if failed else ""))
+    if failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
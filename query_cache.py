@@ -0,0 +1,154 @@
+# query_cache.py - 쿼리 결과 캐시 (정규화 SQL 키, TTL, LRU, 메모리/디스크 2단계)
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# 문자열/따옴표 식별자를 먼저 찾아야 그 안의 '--', '/*'를 주석으로 오인하지 않음
+_LITERAL_OR_COMMENT_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/", re.DOTALL)
+_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|\s+|[^'\"\s]+")
+
+
+def strip_comments(sql):
+    """문자열/따옴표 식별자 밖의 SQL 주석을 공백으로 바꾼 SQL"""
+    return _LITERAL_OR_COMMENT_RE.sub(
+        lambda m: m.group(0) if m.group(0)[0] in "'\"" else ' ', sql
+    )
+
+
+def normalize_sql(sql):
+    """주석 제거, 공백 정리, 문자열/따옴표 식별자 밖은 소문자로 통일"""
+    sql = strip_comments(sql)
+    parts = []
+    for token in _TOKEN_RE.findall(sql):
+        if token[0] in "'\"":
+            parts.append(token)
+        elif token.isspace():
+            parts.append(' ')
+        else:
+            parts.append(token.lower())
+    return ''.join(parts).strip().rstrip(';').strip()
+
+
+def cache_key(sql, database=None, watermark=None, namespace=None):
+    """캐시 키: 정규화 SQL + 데이터베이스 + 데이터 워터마크 + 네임스페이스(계정 등)"""
+    raw = '\x1f'.join([namespace or '', database or '', watermark or '', normalize_sql(sql)])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class QueryResultCache:
+    """TTL + 크기 제한 LRU 캐시
+
+    메모리 계층은 OrderedDict, 선택적 디스크 계층은 SQLite 파일을 사용합니다.
+    디스크에서 찾은 값은 메모리 계층으로 다시 올립니다.
+    """
+
+    def __init__(self, max_entries=256, ttl=300, disk_path=None, disk_max_entries=4096):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_max_entries = disk_max_entries
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk = None
+        self.hits = 0
+        self.misses = 0
+
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute(
+                "CREATE TABLE IF NOT EXISTS query_cache ("
+                "key TEXT PRIMARY KEY, expires_at REAL, accessed_at REAL, value BLOB)"
+            )
+            self._disk.commit()
+
+    def get(self, key):
+        """캐시 값 반환 (없거나 만료되면 None)"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._disk is not None:
+                row = self._disk.execute(
+                    "SELECT expires_at, value FROM query_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    expires_at, blob = row
+                    if expires_at > now:
+                        self._disk.execute(
+                            "UPDATE query_cache SET accessed_at = ? WHERE key = ?", (now, key)
+                        )
+                        self._disk.commit()
+                        value = pickle.loads(blob)
+                        self._set_memory(key, expires_at, value)
+                        self.hits += 1
+                        return value
+                    self._disk.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+                    self._disk.commit()
+
+            self.misses += 1
+            return None
+
+    def _set_memory(self, key, expires_at, value):
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def set(self, key, value, ttl=None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._set_memory(key, expires_at, value)
+            if self._disk is not None:
+                self._disk.execute(
+                    "INSERT OR REPLACE INTO query_cache (key, expires_at, accessed_at, value) "
+                    "VALUES (?, ?, ?, ?)",
+                    (key, expires_at, now, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+                )
+                # 만료 항목 삭제 후 오래 사용하지 않은 항목부터 제거
+                self._disk.execute("DELETE FROM query_cache WHERE expires_at <= ?", (now,))
+                self._disk.execute(
+                    "DELETE FROM query_cache WHERE key IN ("
+                    "SELECT key FROM query_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                    (self.disk_max_entries,)
+                )
+                self._disk.commit()
+
+    def invalidate(self, key):
+        with self._lock:
+            self._memory.pop(key, None)
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM query_cache WHERE key = ?", (key,))
+                self._disk.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._disk is not None:
+                self._disk.execute("DELETE FROM query_cache")
+                self._disk.commit()
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'memory_entries': len(self._memory)}
+
+
+def result_reuse_configuration(max_age_minutes):
+    """Athena 서버 측 결과 재사용 설정 (엔진 v3 작업 그룹 필요)"""
+    return {
+        'ResultReuseByAgeConfiguration': {
+            'Enabled': True,
+            'MaxAgeInMinutes': max_age_minutes,
+        }
+    }
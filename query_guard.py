@@ -0,0 +1,217 @@
+# query_guard.py - 스캔량 예산 기반 쿼리 가드 (스캔량 추정, 날짜 조건/LIMIT 주입, 작업 그룹 스캔 한도)
+import os
+import re
+from datetime import date, timedelta
+
+from botocore.exceptions import ClientError
+
+from inventory import ATHENA_MIN_BYTES, query_cost
+from log_layout import PARTITION_COLUMN, date_predicate, is_partitioned
+from query_cache import strip_comments
+
+GB = 1024 ** 3
+
+# 쿼리당 스캔 예산 (초과하면 확인 필요), 작업 그룹 스캔 한도는 예산과 같은 값 사용
+DEFAULT_SCAN_BUDGET_BYTES = int(float(os.environ.get('ATHENA_SCAN_BUDGET_GB', '10')) * GB)
+DEFAULT_WORKGROUP = os.environ.get('ATHENA_GUARD_WORKGROUP', 's3loglift-guarded')
+
+# 기본 템플릿: 이름 -> SQL ({table}, {where}, {limit} 치환), 기본 행 제한
+TEMPLATES = {
+    'Check if data exists (COUNT)': (
+        "SELECT COUNT(*) AS row_count FROM {table}{where}", None),
+    'View recent logs': (
+        "SELECT * FROM {table}{where}{limit}", 100),
+    'Count by HTTP status': (
+        "SELECT httpstatus, COUNT(*) AS count FROM {table}{where}\n"
+        "GROUP BY httpstatus ORDER BY count DESC{limit}", 100),
+    'Find 404 errors': (
+        "SELECT requestdatetime, key, remoteip, httpstatus FROM {table}{where}\n"
+        "ORDER BY requestdatetime DESC{limit}", 1000),
+    'Top requested files': (
+        "SELECT key, COUNT(*) AS requests FROM {table}{where}\n"
+        "GROUP BY key ORDER BY requests DESC{limit}", 20),
+}
+
+# 템플릿별 고정 조건
+_TEMPLATE_CONDITIONS = {
+    'Count by HTTP status': 'httpstatus IS NOT NULL',
+    'Find 404 errors': "httpstatus = '404'",
+    'Top requested files': 'key IS NOT NULL',
+}
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+_CLAUSE_END_RE = re.compile(r"\b(?:GROUP\s+BY|HAVING|ORDER\s+BY|LIMIT|OFFSET|FETCH)\b", re.IGNORECASE)
+_COMPLEX_RE = re.compile(r"\b(?:JOIN|UNION|INTERSECT|EXCEPT)\b|\(\s*SELECT\b|;", re.IGNORECASE)
+_PARTITION_RANGE_RE = re.compile(
+    rf"\b{PARTITION_COLUMN}\s*(?:(>=|<=|=|>|<)\s*'([^']*)'|BETWEEN\s*'([^']*)'\s*AND\s*'([^']*)')",
+    re.IGNORECASE
+)
+
+
+def _mask_literals(sql):
+    """문자열/따옴표 식별자 내용을 같은 길이의 공백으로 가린 SQL (키워드 위치 탐색용)"""
+    return _LITERAL_RE.sub(lambda m: m.group(0)[0] + ' ' * (len(m.group(0)) - 2) + m.group(0)[-1], sql)
+
+
+def _references(sql, table_names):
+    masked = _mask_literals(strip_comments(sql))
+    return any(re.search(rf"\bFROM\s+[`\"]?{re.escape(name)}[`\"]?(?![\w.])", masked, re.IGNORECASE)
+               for name in table_names)
+
+
+def recent_predicate(layout, days, today=None):
+    """최근 days일 파티션 조건 (파티션 레이아웃이 아니면 '')"""
+    if not days or not is_partitioned(layout):
+        return ''
+    today = today or date.today()
+    return date_predicate(layout, today - timedelta(days=days - 1))
+
+
+def template_sql(name, table, layout=None, days=1, limit=None):
+    """기본 템플릿 SQL (날짜 파티션 조건과 LIMIT 포함)"""
+    template, default_limit = TEMPLATES[name]
+    conditions = [condition for condition in [recent_predicate(layout, days),
+                                              _TEMPLATE_CONDITIONS.get(name)] if condition]
+    where = f"\nWHERE {' AND '.join(conditions)}" if conditions else ''
+    limit = limit or default_limit
+    return template.format(table=table, where=where, limit=f"\nLIMIT {limit}" if limit else '')
+
+
+def bound_query(sql, table_names, layout=None, days=None, limit=None):
+    """임의 SELECT에 날짜 파티션 조건과 LIMIT 주입: (SQL, 변경 내용 목록)
+
+    JOIN/UNION/하위 쿼리가 없는 단일 SELECT가 대상 테이블을 읽을 때만 조건을 넣고,
+    이미 파티션 조건이 있으면 그대로 둡니다. 기존 WHERE 조건은 괄호로 감싸 우선순위를 유지합니다.
+    바꿀 내용이 없으면 원래 SQL을 그대로 반환합니다.
+    """
+    # 주석은 문자열 밖에서만 제거 (끝에 붙인 LIMIT이 줄 주석에 가려지지 않도록)
+    statement = strip_comments(sql).strip().rstrip(';').strip()
+    masked = _mask_literals(statement)
+    changes = []
+    if not re.match(r"(?:WITH|SELECT)\b", masked, re.IGNORECASE):
+        return sql, changes
+    simple = not _COMPLEX_RE.search(masked)
+
+    predicate = recent_predicate(layout, days)
+    if predicate and simple and _references(statement, table_names) and \
+            not re.search(rf"\b{PARTITION_COLUMN}\b", masked, re.IGNORECASE):
+        where = re.search(r"\bWHERE\b", masked, re.IGNORECASE)
+        if where:
+            end = _CLAUSE_END_RE.search(masked, where.end())
+            end = end.start() if end else len(statement)
+            condition = statement[where.end():end].strip()
+            statement = f"{statement[:where.end()]} {predicate} AND ({condition}) {statement[end:]}".rstrip()
+        else:
+            end = _CLAUSE_END_RE.search(masked)
+            end = end.start() if end else len(statement)
+            statement = f"{statement[:end].rstrip()}\nWHERE {predicate} {statement[end:]}".rstrip()
+        changes.append(f"added {predicate}")
+        masked = _mask_literals(statement)
+
+    if limit and simple and not re.search(r"\bLIMIT\s+\d+\s*$", masked, re.IGNORECASE):
+        statement = f"{statement}\nLIMIT {limit}"
+        changes.append(f"added LIMIT {limit}")
+    return (statement if changes else sql), changes
+
+
+def partition_range(sql):
+    """SQL의 파티션 컬럼 범위 조건 -> (시작일, 종료일) 'YYYY-MM-DD' (없으면 None)"""
+    first = last = None
+    sql = strip_comments(sql)
+    masked = _mask_literals(sql)
+    for match in _PARTITION_RANGE_RE.finditer(sql):
+        # 문자열 안에 적힌 조건은 무시
+        if masked[match.start()] != sql[match.start()]:
+            continue
+        operator, value, between_first, between_last = match.groups()
+        if between_first:
+            low, high = between_first, between_last
+        else:
+            low = value if operator in ('>=', '>', '=') else None
+            high = value if operator in ('<=', '<', '=') else None
+        if low:
+            first = max(first or '', low.replace('/', '-'))
+        if high:
+            last = min(last or '9999-12-31', high.replace('/', '-'))
+    return first, last
+
+
+def estimate_scan_bytes(sql, inventory, layout=None):
+    """인벤토리 일별 용량으로 추정한 스캔 바이트 (상한값)
+
+    파티션 레이아웃에서는 파티션 조건 범위의 날짜만, 아니면 전체 용량을 스캔한다고 봅니다.
+    LIMIT만 있는 쿼리도 Athena는 파일 단위로 읽으므로 줄어들지 않는다고 가정합니다.
+    """
+    if not is_partitioned(layout):
+        return inventory.bytes
+    first, last = partition_range(sql)
+    if first is None and last is None:
+        return inventory.bytes
+    return sum(size for day, _, size in inventory.day_histogram()
+               if (first is None or day >= first) and (last is None or day <= last))
+
+
+class QueryGuard:
+    """쿼리 실행 전 스캔량을 추정해 예산 초과 여부를 판단하고, 작업 그룹 스캔 한도를 관리
+
+    예산 확인은 클라이언트 쪽 안내이고, 실제 차단은 작업 그룹의 BytesScannedCutoffPerQuery가
+    담당합니다 (추정이 틀리거나 다른 경로로 실행한 쿼리도 한도를 넘으면 Athena가 취소).
+    """
+
+    def __init__(self, athena_client, budget_bytes=DEFAULT_SCAN_BUDGET_BYTES, workgroup=None):
+        self.athena_client = athena_client
+        self.budget_bytes = budget_bytes
+        self.workgroup = workgroup
+
+    def plan(self, sql, table_names, inventory=None, layout=None, days=None, limit=None):
+        """조건/LIMIT 주입 후 스캔량/비용 추정: {'sql', 'changes', 'estimated_bytes', 'estimated_cost', 'over_budget'}
+
+        대상 테이블을 읽지 않거나 인벤토리가 없으면 추정하지 않습니다 (estimated_bytes None).
+        """
+        bounded, changes = bound_query(sql, table_names, layout, days, limit)
+        estimated = None
+        if inventory is not None and _references(bounded, table_names):
+            estimated = estimate_scan_bytes(bounded, inventory, layout)
+        return {
+            'sql': bounded,
+            'changes': changes,
+            'estimated_bytes': estimated,
+            'estimated_cost': query_cost(estimated) if estimated is not None else None,
+            'over_budget': estimated is not None and estimated > self.budget_bytes,
+        }
+
+    def ensure_workgroup(self, output_location, name=None, cutoff_bytes=None):
+        """스캔 한도가 설정된 작업 그룹 생성/갱신: (작업 그룹 이름, 'created'|'updated'|'unchanged')"""
+        name = name or self.workgroup or DEFAULT_WORKGROUP
+        # Athena 최소 한도는 10MB
+        cutoff_bytes = max(int(cutoff_bytes or self.budget_bytes), ATHENA_MIN_BYTES)
+        try:
+            configuration = self.athena_client.get_work_group(WorkGroup=name)['WorkGroup']['Configuration']
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') != 'InvalidRequestException':
+                raise
+            self.athena_client.create_work_group(
+                Name=name,
+                Description='S3 LogLift guarded queries (per-query bytes scanned cutoff)',
+                Configuration={
+                    'ResultConfiguration': {'OutputLocation': output_location},
+                    'EnforceWorkGroupConfiguration': True,
+                    'PublishCloudWatchMetricsEnabled': True,
+                    'BytesScannedCutoffPerQuery': cutoff_bytes,
+                },
+            )
+            self.workgroup = name
+            return name, 'created'
+
+        self.workgroup = name
+        if configuration.get('BytesScannedCutoffPerQuery') == cutoff_bytes and \
+                configuration.get('EnforceWorkGroupConfiguration'):
+            return name, 'unchanged'
+        self.athena_client.update_work_group(
+            WorkGroup=name,
+            ConfigurationUpdates={
+                'EnforceWorkGroupConfiguration': True,
+                'BytesScannedCutoffPerQuery': cutoff_bytes,
+            },
+        )
+        return name, 'updated'
@@ -0,0 +1,243 @@
+# query_manager.py - Athena 쿼리 실행 관리 (적응형 백오프, 일괄 상태 조회, 동시 실행)
+import asyncio
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+TERMINAL_STATES = ('SUCCEEDED', 'FAILED', 'CANCELLED')
+
+# BatchGetQueryExecution 한 번에 조회 가능한 최대 ID 수
+BATCH_GET_LIMIT = 50
+
+_THROTTLE_CODES = ('ThrottlingException', 'TooManyRequestsException')
+
+
+def _is_throttled(error):
+    return error.response.get('Error', {}).get('Code') in _THROTTLE_CODES
+
+
+class Backoff:
+    """지수 백오프 + 지터 대기 시간 생성기"""
+
+    def __init__(self, initial_delay=0.2, max_delay=5.0, multiplier=1.6, jitter=0.5):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.multiplier = multiplier
+        self.jitter = jitter
+        self.delay = initial_delay
+
+    def next_delay(self):
+        delay = self.delay * random.uniform(1 - self.jitter, 1)
+        self.delay = min(self.delay * self.multiplier, self.max_delay)
+        return delay
+
+    def throttled(self):
+        """API 제한에 걸리면 바로 최대 간격으로 늘림"""
+        self.delay = self.max_delay
+
+
+class QueryExecutionManager:
+    """Athena 쿼리 시작/대기 관리
+
+    고정 1초 폴링 대신 지수 백오프 + 지터로 상태를 확인하고, 실행 중인 여러 쿼리는
+    BatchGetQueryExecution 한 번으로 함께 조회합니다. 시간 초과 시 상태는 'TIMEOUT'입니다.
+    쿼리 시작이 제한(동시 실행 한도 등)에 걸리면 start_retries번까지 백오프 후 다시 시도합니다.
+    metrics(MetricsRecorder)가 있으면 끝난 쿼리마다 실행 통계와 폴링 비용을 기록합니다.
+    """
+
+    def __init__(self, athena_client, timeout=300, initial_delay=0.2, max_delay=5.0,
+                 multiplier=1.6, jitter=0.5, max_workers=8, cancel_on_timeout=False, metrics=None,
+                 start_retries=5):
+        self.athena_client = athena_client
+        self.metrics = metrics
+        # 쿼리 시작 시각 (대기 시간 측정용)
+        self._started = {}
+        self.timeout = timeout
+        self.backoff_options = {
+            'initial_delay': initial_delay,
+            'max_delay': max_delay,
+            'multiplier': multiplier,
+            'jitter': jitter,
+        }
+        self.max_workers = max_workers
+        self.cancel_on_timeout = cancel_on_timeout
+        # StartQueryExecution이 제한에 걸렸을 때 재시도 횟수
+        self.start_retries = start_retries
+        self._executor = None
+
+    def _backoff(self):
+        return Backoff(**self.backoff_options)
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                thread_name_prefix='athena-query')
+        return self._executor
+
+    def start(self, query, database=None, output_location=None, **kwargs):
+        """쿼리 시작 후 QueryExecutionId 반환"""
+        params = {'QueryString': query}
+        if database:
+            params['QueryExecutionContext'] = {'Database': database}
+        if output_location:
+            params['ResultConfiguration'] = {'OutputLocation': output_location}
+        params.update(kwargs)
+        backoff = self._backoff()
+        for attempt in range(self.start_retries + 1):
+            try:
+                query_execution_id = self.athena_client.start_query_execution(**params)['QueryExecutionId']
+                break
+            except ClientError as e:
+                # 동시 실행 쿼리 한도(TooManyRequestsException)나 API 제한이면 백오프 후 재시도
+                if not _is_throttled(e) or attempt == self.start_retries:
+                    raise
+                time.sleep(backoff.next_delay())
+        if self.metrics is not None:
+            self._started[query_execution_id] = time.monotonic()
+        return query_execution_id
+
+    def _record(self, query_execution_id, status, response, waited_since, polls, poll_seconds):
+        if self.metrics is None:
+            return
+        started = self._started.pop(query_execution_id, waited_since)
+        self.metrics.record_query(query_execution_id, status, response, time.monotonic() - started,
+                                  polls, poll_seconds)
+
+    def _timed_out(self, query_execution_ids):
+        if self.cancel_on_timeout:
+            for query_execution_id in query_execution_ids:
+                try:
+                    self.athena_client.stop_query_execution(QueryExecutionId=query_execution_id)
+                except ClientError:
+                    pass
+
+    def wait(self, query_execution_id, timeout=None):
+        """쿼리 하나가 끝날 때까지 대기: (상태, get_query_execution 응답)"""
+        waited_since = time.monotonic()
+        deadline = waited_since + (self.timeout if timeout is None else timeout)
+        backoff = self._backoff()
+        response = None
+        polls, poll_seconds = 0, 0.0
+
+        while True:
+            try:
+                polled = time.monotonic()
+                polls += 1
+                response = self.athena_client.get_query_execution(
+                    QueryExecutionId=query_execution_id
+                )
+                poll_seconds += time.monotonic() - polled
+                status = response['QueryExecution']['Status']['State']
+                if status in TERMINAL_STATES:
+                    self._record(query_execution_id, status, response, waited_since, polls, poll_seconds)
+                    return status, response
+            except ClientError as e:
+                if not _is_throttled(e):
+                    raise
+                backoff.throttled()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._timed_out([query_execution_id])
+                self._record(query_execution_id, 'TIMEOUT', response, waited_since, polls, poll_seconds)
+                return 'TIMEOUT', response
+            time.sleep(min(backoff.next_delay(), remaining))
+
+    def wait_many(self, query_execution_ids, timeout=None):
+        """여러 쿼리 대기: {QueryExecutionId: (상태, 응답)}
+
+        실행 중인 ID를 BATCH_GET_LIMIT개씩 묶어 BatchGetQueryExecution으로 조회합니다.
+        """
+        waited_since = time.monotonic()
+        deadline = waited_since + (self.timeout if timeout is None else timeout)
+        backoff = self._backoff()
+        results = {}
+        last_seen = {}
+        pending = list(dict.fromkeys(query_execution_ids))
+        # 일괄 조회 한 번은 함께 조회한 모든 쿼리의 폴링 1회로 계산
+        polls, poll_seconds = 0, 0.0
+
+        while pending:
+            try:
+                polls += 1
+                for index in range(0, len(pending), BATCH_GET_LIMIT):
+                    polled = time.monotonic()
+                    response = self.athena_client.batch_get_query_execution(
+                        QueryExecutionIds=pending[index:index + BATCH_GET_LIMIT]
+                    )
+                    poll_seconds += time.monotonic() - polled
+                    for execution in response.get('QueryExecutions', []):
+                        query_execution_id = execution['QueryExecutionId']
+                        last_seen[query_execution_id] = {'QueryExecution': execution}
+                        status = execution['Status']['State']
+                        if status in TERMINAL_STATES:
+                            results[query_execution_id] = (status, last_seen[query_execution_id])
+                            self._record(query_execution_id, status, last_seen[query_execution_id],
+                                         waited_since, polls, poll_seconds)
+                    for unprocessed in response.get('UnprocessedQueryExecutionIds', []):
+                        results[unprocessed['QueryExecutionId']] = (
+                            'FAILED', {'Error': {'Code': unprocessed.get('ErrorCode'),
+                                                 'Message': unprocessed.get('ErrorMessage')}}
+                        )
+            except ClientError as e:
+                if not _is_throttled(e):
+                    raise
+                backoff.throttled()
+
+            pending = [qid for qid in pending if qid not in results]
+            if not pending:
+                break
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self._timed_out(pending)
+                for query_execution_id in pending:
+                    results[query_execution_id] = ('TIMEOUT', last_seen.get(query_execution_id))
+                    self._record(query_execution_id, 'TIMEOUT', last_seen.get(query_execution_id),
+                                 waited_since, polls, poll_seconds)
+                break
+            time.sleep(min(backoff.next_delay(), remaining))
+
+        return results
+
+    def run(self, query, database=None, output_location=None, timeout=None, **kwargs):
+        """쿼리 시작 후 완료까지 대기: (QueryExecutionId, 상태, 응답)"""
+        query_execution_id = self.start(query, database, output_location, **kwargs)
+        status, response = self.wait(query_execution_id, timeout)
+        return query_execution_id, status, response
+
+    def run_many(self, queries, database=None, output_location=None, timeout=None, **kwargs):
+        """서로 독립적인 쿼리를 모두 시작한 뒤 함께 대기
+
+        결과는 입력 순서대로 [(QueryExecutionId, 상태, 응답), ...]입니다.
+        """
+        query_execution_ids = [self.start(query, database, output_location, **kwargs)
+                               for query in queries]
+        results = self.wait_many(query_execution_ids, timeout)
+        return [(qid,) + results[qid] for qid in query_execution_ids]
+
+    def submit(self, fn, *args, **kwargs):
+        """의존 관계가 있는 작업 묶음(예: DB 생성 -> 테이블 생성)을 스레드 풀에서 실행"""
+        return self.executor.submit(fn, *args, **kwargs)
+
+    def map(self, fn, *iterables):
+        """여러 입력에 대해 fn을 스레드 풀에서 동시에 실행 (입력 순서대로 결과 반환)"""
+        return list(self.executor.map(fn, *iterables))
+
+    async def run_async(self, query, database=None, output_location=None, timeout=None, **kwargs):
+        """asyncio용 run: 시작/대기(run)를 스레드에서 실행하므로 이벤트 루프를 막지 않음"""
+        return await asyncio.to_thread(self.run, query, database, output_location, timeout, **kwargs)
+
+    async def gather(self, queries, database=None, output_location=None, timeout=None, **kwargs):
+        """여러 쿼리를 asyncio로 동시에 실행"""
+        return await asyncio.gather(*(
+            self.run_async(query, database, output_location, timeout, **kwargs) for query in queries
+        ))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
@@ -0,0 +1,169 @@
+# query_results.py - Athena 쿼리 결과 스트리밍 (페이지네이션 / CSV 직접 읽기) 및 타입 변환
+import codecs
+import csv
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+
+from s3_utils import split_s3_uri
+
+# get_query_results 한 페이지 최대 행 수
+MAX_PAGE_SIZE = 1000
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+
+def _parse_bool(value):
+    return value.lower() == 'true'
+
+
+def _parse_date(value):
+    return date.fromisoformat(value)
+
+
+def _parse_timestamp(value):
+    return datetime.fromisoformat(value[:26])
+
+
+_DECODERS = {
+    'tinyint': int,
+    'smallint': int,
+    'integer': int,
+    'int': int,
+    'bigint': int,
+    'float': float,
+    'real': float,
+    'double': float,
+    'decimal': Decimal,
+    'boolean': _parse_bool,
+    'date': _parse_date,
+    'timestamp': _parse_timestamp,
+}
+
+
+def column_decoder(type_name):
+    """Athena 컬럼 타입 이름에 맞는 변환 함수 (문자열 타입은 None)"""
+    return _DECODERS.get(type_name.lower().split('(')[0])
+
+
+def decode_column(values, type_name):
+    """문자열 값 리스트를 컬럼 타입에 맞게 변환 (NULL/빈 값은 None)"""
+    decoder = column_decoder(type_name)
+    if decoder is None:
+        return values
+    return [None if value is None or value == '' else decoder(value) for value in values]
+
+
+class ResultBatch:
+    """컬럼 단위 쿼리 결과 배치"""
+
+    def __init__(self, column_names, column_types, columns):
+        self.column_names = column_names
+        self.column_types = column_types
+        self.columns = columns
+        self.num_rows = len(columns[column_names[0]]) if column_names else 0
+
+    def column(self, name):
+        return self.columns[name]
+
+    def rows(self):
+        return zip(*(self.columns[name] for name in self.column_names))
+
+
+def _make_batch(column_names, column_types, rows):
+    transposed = list(zip(*rows)) if rows else [()] * len(column_names)
+    columns = {
+        name: decode_column(list(values), type_name)
+        for name, type_name, values in zip(column_names, column_types, transposed)
+    }
+    return ResultBatch(column_names, column_types, columns)
+
+
+def result_metadata(athena_client, query_execution_id):
+    """결과 컬럼 이름/타입 목록"""
+    response = athena_client.get_query_results(QueryExecutionId=query_execution_id, MaxResults=1)
+    column_info = response['ResultSet']['ResultSetMetadata']['ColumnInfo']
+    return [column['Name'] for column in column_info], [column['Type'] for column in column_info]
+
+
+def iter_result_pages(athena_client, query_execution_id, page_size=MAX_PAGE_SIZE):
+    """get_query_results를 NextToken으로 넘기며 페이지마다 ResultBatch 생성"""
+    paginator = athena_client.get_paginator('get_query_results')
+    column_names = column_types = None
+    pages = paginator.paginate(
+        QueryExecutionId=query_execution_id,
+        PaginationConfig={'PageSize': page_size}
+    )
+    for page_number, page in enumerate(pages):
+        if column_names is None:
+            column_info = page['ResultSet']['ResultSetMetadata']['ColumnInfo']
+            column_names = [column['Name'] for column in column_info]
+            column_types = [column['Type'] for column in column_info]
+
+        rows = [
+            tuple(datum.get('VarCharValue') for datum in row['Data'])
+            for row in page['ResultSet']['Rows']
+        ]
+        # 첫 페이지 첫 행은 헤더
+        if page_number == 0 and rows and list(rows[0]) == column_names:
+            rows = rows[1:]
+        yield _make_batch(column_names, column_types, rows)
+
+
+def _ranges(size, part_size):
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+def iter_object_parts(s3_client, bucket_name, key, part_size=DEFAULT_PART_SIZE, max_workers=8):
+    """큰 객체를 범위 GET으로 병렬 다운로드하되 순서대로 조각을 생성 (동시 요청 수 제한)"""
+    size = s3_client.head_object(Bucket=bucket_name, Key=key)['ContentLength']
+    if size == 0:
+        return
+
+    def fetch(byte_range):
+        response = s3_client.get_object(Bucket=bucket_name, Key=key,
+                                        Range=f"bytes={byte_range[0]}-{byte_range[1]}")
+        return response['Body'].read()
+
+    ranges = deque(_ranges(size, part_size))
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        while ranges or in_flight:
+            while ranges and len(in_flight) < max_workers:
+                in_flight.append(executor.submit(fetch, ranges.popleft()))
+            yield in_flight.popleft().result()
+
+
+def _iter_lines(parts):
+    """바이트 조각을 UTF-8 줄 단위(줄바꿈 포함)로 변환 (조각 경계의 멀티바이트 문자 처리)
+
+    splitlines()는 U+2028, 0x1C 같은 문자에서도 나누어 한 행이 둘로 읽히므로 줄바꿈(LF)에서만 나눕니다.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    remainder = ''
+    for part in parts:
+        lines = (remainder + decoder.decode(part)).split('\n')
+        remainder = lines.pop()
+        for line in lines:
+            yield line + '\n'
+    remainder += decoder.decode(b'', final=True)
+    if remainder:
+        yield remainder
+
+
+def iter_csv_result_batches(s3_client, output_location, column_names, column_types,
+                            batch_size=100000, part_size=DEFAULT_PART_SIZE, max_workers=8):
+    """OutputLocation의 결과 CSV를 직접 읽어 ResultBatch 생성"""
+    bucket_name, key = split_s3_uri(output_location)
+    reader = csv.reader(_iter_lines(iter_object_parts(s3_client, bucket_name, key,
+                                                      part_size, max_workers)))
+    next(reader, None)  # 헤더
+
+    rows = []
+    for row in reader:
+        rows.append(row)
+        if len(rows) >= batch_size:
+            yield _make_batch(column_names, column_types, rows)
+            rows = []
+    if rows:
+        yield _make_batch(column_names, column_types, rows)
@@ -0,0 +1,226 @@
+# rollups.py - 시간별 사전 집계(rollup) 테이블 증분 갱신 및 기본 분석 쿼리 라우팅
+from datetime import datetime, timedelta
+
+from compaction import (REQUEST_TIME_SQL, HourlyPartitionTracker, compacted_table_ddl,
+                        hour_range_condition, hour_runs)
+from s3_utils import join_s3_uri, split_s3_uri
+
+_HOUR_FORMAT = '%Y-%m-%d-%H'
+
+# 집계 값: 이름 -> (타입, 원본 테이블 집계식)
+MEASURES = {
+    'requests': ('BIGINT', 'COUNT(*)'),
+    'bytes_sent': ('BIGINT', 'SUM(COALESCE(bytessent, 0))'),
+}
+
+# 롤업 테이블: 이름 -> 차원 [(컬럼, 타입, 원본 테이블 식)], 집계 값 목록
+ROLLUPS = {
+    'status': {
+        'dimensions': [
+            ('httpstatus', 'INT', 'TRY_CAST(httpstatus AS INTEGER)'),
+            ('operation', 'STRING', '"operation"'),
+            ('errorcode', 'STRING', '"errorcode"'),
+        ],
+        'measures': ['requests', 'bytes_sent'],
+    },
+    'keys': {
+        'dimensions': [
+            ('key', 'STRING', '"key"'),
+            ('httpstatus', 'INT', 'TRY_CAST(httpstatus AS INTEGER)'),
+        ],
+        'measures': ['requests'],
+    },
+    'ips': {
+        'dimensions': [
+            ('remoteip', 'STRING', '"remoteip"'),
+        ],
+        'measures': ['requests', 'bytes_sent'],
+    },
+}
+
+# 기본 분석 (앱의 샘플 쿼리): 롤업, 그룹 컬럼, 조건, 정렬, 행 제한
+ANALYSES = {
+    'Count by HTTP status': {
+        'rollup': 'status', 'group_by': ['httpstatus'],
+        'where': 'httpstatus IS NOT NULL', 'order_by': 'requests DESC', 'limit': None,
+    },
+    'Errors by operation': {
+        'rollup': 'status', 'group_by': ['operation', 'errorcode'],
+        'where': "errorcode <> '-'", 'order_by': 'requests DESC', 'limit': 100,
+    },
+    'Find 404 errors': {
+        'rollup': 'keys', 'group_by': ['key'],
+        'where': 'httpstatus = 404', 'order_by': 'requests DESC', 'limit': 100,
+    },
+    'Top requested files': {
+        'rollup': 'keys', 'group_by': ['key'],
+        'where': 'key IS NOT NULL', 'order_by': 'requests DESC', 'limit': 20,
+    },
+    'Top client IPs': {
+        'rollup': 'ips', 'group_by': ['remoteip'],
+        'where': None, 'order_by': 'requests DESC', 'limit': 20,
+    },
+}
+
+
+def rollup_table_name(base_table, name):
+    """'access_logs', 'status' -> 'access_logs_hourly_status'"""
+    return f"{base_table}_hourly_{name}"
+
+
+def rollup_columns(name):
+    """롤업 테이블 컬럼 [(이름, 타입), ...] (파티션 컬럼 제외)"""
+    definition = ROLLUPS[name]
+    columns = [(column, type_name) for column, type_name, _ in definition['dimensions']]
+    columns.extend((measure, MEASURES[measure][0]) for measure in definition['measures'])
+    return columns
+
+
+def rollup_insert_sql(database_name, rollup_table, raw_table, name, first_hour, last_hour,
+                      settle_hours, layout=None):
+    """[first_hour, last_hour] 구간 원본 레코드를 시간별로 집계해 롤업 테이블에 INSERT INTO"""
+    definition = ROLLUPS[name]
+    select_columns = [f'{expression} AS "{column}"' for column, _, expression in definition['dimensions']]
+    select_columns.extend(f'{MEASURES[measure][1]} AS "{measure}"' for measure in definition['measures'])
+    num_dimensions = len(definition['dimensions'])
+    partition_positions = [len(select_columns) + 1, len(select_columns) + 2]
+    group_by = ', '.join(str(position) for position in
+                         list(range(1, num_dimensions + 1)) + partition_positions)
+    select_list = ',\n          '.join(select_columns)
+    where_clause = hour_range_condition(first_hour, last_hour, settle_hours, layout)
+
+    return f"""
+        INSERT INTO {database_name}.{rollup_table}
+        SELECT
+          {select_list},
+          date_format({REQUEST_TIME_SQL}, '%Y-%m-%d') AS dt,
+          date_format({REQUEST_TIME_SQL}, '%H') AS "hour"
+        FROM {database_name}.{raw_table}
+        WHERE {where_clause}
+        GROUP BY {group_by}
+        """
+
+
+def _hour_bound(hour, operator):
+    """dt/hour 파티션 컬럼 비교 조건 (파티션 프로젝션이 프루닝할 수 있는 형태)"""
+    day, hour_of_day = hour[:10], hour[11:13]
+    strict = operator.rstrip('=')
+    return f"""(dt {strict} '{day}' OR (dt = '{day}' AND "hour" {operator} '{hour_of_day}'))"""
+
+
+class RollupManager:
+    """롤업 테이블별 처리 현황(_COMPACTED 표시 파일) 관리 및 분석 쿼리 생성
+
+    롤업 테이블은 rollup_location 아래 롤업 이름별 경로에 저장됩니다.
+    아직 집계되지 않은 시간(열려 있거나 지연 도착 대기 중인 시간)만 원본 테이블에서 읽습니다.
+    """
+
+    def __init__(self, s3_client, source_location, rollup_location, settle_hours=1):
+        bucket_name, prefix = split_s3_uri(rollup_location)
+        self.settle_hours = settle_hours
+        self.locations = {name: join_s3_uri(bucket_name, prefix, name) for name in ROLLUPS}
+        self.trackers = {
+            name: HourlyPartitionTracker(s3_client, source_location, location, settle_hours)
+            for name, location in self.locations.items()
+        }
+
+    def raw_objects_by_hour(self):
+        """가장 뒤처진 롤업의 마지막 완료 시간부터 원본 로그 목록 조회"""
+        behind = min(self.trackers.values(), key=lambda tracker: tracker.last_completed_hour() or '')
+        return behind.raw_objects_by_hour()
+
+    def record_hours(self, raw_objects):
+        return next(iter(self.trackers.values())).record_hours(raw_objects)
+
+    def table_ddls(self, database_name, base_table, start_date):
+        """[(롤업 이름, CREATE TABLE DDL), ...]"""
+        return [
+            (name, compacted_table_ddl(database_name, rollup_table_name(base_table, name),
+                                       self.locations[name], start_date, rollup_columns(name)))
+            for name in ROLLUPS
+        ]
+
+    def refresh_queries(self, database_name, base_table, raw_table, layout=None, raw_objects=None,
+                        now=None):
+        """롤업별 증분 INSERT 쿼리: [(롤업 이름, 쿼리, 해당 시간 목록), ...] (롤업별 시간순)"""
+        raw_objects = self.raw_objects_by_hour() if raw_objects is None else raw_objects
+        queries = []
+        for name, tracker in self.trackers.items():
+            pending = tracker.pending_hours(raw_objects, now)
+            for first_hour, last_hour in hour_runs(pending):
+                hours = [hour for hour in pending if first_hour <= hour <= last_hour]
+                sql = rollup_insert_sql(database_name, rollup_table_name(base_table, name), raw_table,
+                                        name, first_hour, last_hour, tracker.lag_hours, layout)
+                queries.append((name, sql, hours))
+        return queries
+
+    def mark_completed(self, name, hours):
+        self.trackers[name].mark_completed(hours)
+
+    def open_from(self, names=None, raw_objects=None):
+        """원본 테이블에서 읽어야 하는 첫 시간 (모든 시간이 미집계면 None)
+
+        롤업은 시간순으로 갱신되므로, 모든 롤업에서 완료된 마지막 시간 다음부터가 열린 구간입니다.
+        raw_objects가 있으면 그보다 앞선 미집계 시간도 열린 구간에 포함합니다.
+        """
+        completed = None
+        for name in names or list(self.trackers):
+            hours = self.trackers[name].completed_hours()
+            completed = hours if completed is None else completed & hours
+        if not completed:
+            return None
+        latest = datetime.strptime(max(completed), _HOUR_FORMAT)
+        open_hour = (latest + timedelta(hours=1)).strftime(_HOUR_FORMAT)
+        if raw_objects:
+            missing = [hour for hour in self.record_hours(raw_objects) if hour not in completed]
+            if missing:
+                open_hour = min(open_hour, min(missing))
+        return open_hour
+
+    def analysis_sql(self, analysis, database_name, base_table, raw_table, open_from, layout=None,
+                     since_hour=None):
+        """기본 분석 쿼리: 닫힌 시간은 롤업 테이블, open_from 이후는 원본 테이블 사전 집계
+
+        since_hour가 있으면 해당 시간 이후만 집계합니다.
+        """
+        spec = ANALYSES[analysis]
+        definition = ROLLUPS[spec['rollup']]
+        dimensions = [column for column, _, _ in definition['dimensions']]
+        measures = definition['measures']
+        column_list = ', '.join(f'"{column}"' for column in dimensions + measures)
+
+        parts = []
+        if open_from is not None:
+            conditions = [_hour_bound(open_from, '<')]
+            if since_hour:
+                conditions.append(_hour_bound(since_hour, '>='))
+            parts.append(
+                f"SELECT {column_list} "
+                f"FROM {database_name}.{rollup_table_name(base_table, spec['rollup'])} "
+                f"WHERE {' AND '.join(conditions)}"
+            )
+
+        raw_from = max(filter(None, [open_from, since_hour]), default=None)
+        raw_columns = [f'{expression} AS "{column}"' for column, _, expression in definition['dimensions']]
+        raw_columns.extend(f'{MEASURES[measure][1]} AS "{measure}"' for measure in measures)
+        raw_where = f" WHERE {hour_range_condition(raw_from, layout=layout)}" if raw_from else ''
+        group_by = ', '.join(str(position) for position in range(1, len(dimensions) + 1))
+        parts.append(
+            f"SELECT {', '.join(raw_columns)} "
+            f"FROM {database_name}.{raw_table}{raw_where} "
+            f"GROUP BY {group_by}"
+        )
+
+        union = '\n          UNION ALL\n          '.join(parts)
+        group_columns = ', '.join(f'"{column}"' for column in spec['group_by'])
+        totals = ', '.join(f'SUM("{measure}") AS "{measure}"' for measure in measures)
+        where_clause = f"\n        WHERE {spec['where']}" if spec['where'] else ''
+        limit_clause = f"\n        LIMIT {spec['limit']}" if spec['limit'] else ''
+        return f"""
+        SELECT {group_columns}, {totals}
+        FROM (
+          {union}
+        ) AS combined{where_clause}
+        GROUP BY {group_columns}
+        ORDER BY {spec['order_by']}{limit_clause}
+        """
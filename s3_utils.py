@@ -0,0 +1,25 @@
+# s3_utils.py - S3 경로/목록 공통 유틸리티
+
+
+def split_s3_uri(uri):
+    """'s3://bucket/prefix/' -> ('bucket', 'prefix/')"""
+    if not uri.startswith('s3://'):
+        raise ValueError(f"Not an S3 URI: {uri}")
+    bucket, _, prefix = uri[len('s3://'):].partition('/')
+    return bucket, prefix
+
+
+def join_s3_uri(bucket_name, *parts):
+    """버킷과 경로 조각으로 's3://bucket/a/b/' 형식 URI 생성"""
+    path = '/'.join(part.strip('/') for part in parts if part and part.strip('/'))
+    return f"s3://{bucket_name}/{path}/" if path else f"s3://{bucket_name}/"
+
+
+def iter_objects(s3_client, bucket_name, prefix='', start_after=None):
+    """list_objects_v2 페이지네이션으로 객체 메타데이터를 순서대로 생성"""
+    paginator = s3_client.get_paginator('list_objects_v2')
+    params = {'Bucket': bucket_name, 'Prefix': prefix}
+    if start_after:
+        params['StartAfter'] = start_after
+    for page in paginator.paginate(**params):
+        yield from page.get('Contents', [])
@@ -0,0 +1,546 @@
+# search_index.py - 로그 객체별 사이드카 인덱스 (Bloom 필터, 레코드 시간 최소/최대)와 인덱스 기반 로컬 검색
+#
+# 객체마다 key/remoteip/requester/requestid Bloom 필터와 requestdatetime 범위를 담은 작은 파일을
+# 인덱스 위치에 저장하고, 검색할 때는 로컬 SQLite 캐시의 필터로 일치할 수 없는 객체를 건너뛴 뒤
+# 남은 후보 객체만 읽습니다. Bloom 필터는 거짓 음성이 없으므로 결과는 전체 스캔과 같습니다.
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from log_index import lookback_key
+from log_parser import COLUMN_NAMES, MONTHS, LogBatch, sortable_datetime
+from object_reader import PrefetchingObjectReader
+from s3_utils import iter_objects, split_s3_uri
+from sketches import hash64
+
+# Bloom 필터를 만드는 컬럼 (정확히 일치하는 값 검색용)
+INDEXED_COLUMNS = ['key', 'remoteip', 'requester', 'requestid']
+# 사이드카 파일 이름 = 원본 객체의 상대 경로 + 접미사
+INDEX_SUFFIX = '.bloom'
+INDEX_FORMAT_VERSION = 1
+# 목표 거짓 양성 비율 (비트 수를 2의 거듭제곱으로 올리므로 실제로는 이보다 낮음)
+DEFAULT_FALSE_POSITIVE_RATE = 0.01
+MIN_FILTER_BITS = 512
+MAX_HASHES = 12
+
+_MONTH_NAMES = list(MONTHS)
+
+
+def bloom_positions(value_hash, num_bits, num_hashes):
+    """64비트 해시 -> 비트 위치 목록 (이중 해싱, num_bits는 2의 거듭제곱)"""
+    h1 = value_hash & 0xFFFFFFFF
+    # 홀수 증분은 2의 거듭제곱 크기와 서로소라 위치가 겹치지 않고 순환
+    h2 = (value_hash >> 32) | 1
+    mask = num_bits - 1
+    return [(h1 + i * h2) & mask for i in range(num_hashes)]
+
+
+def _contains(bits, positions):
+    for position in positions:
+        if not bits[position >> 3] & (1 << (position & 7)):
+            return False
+    return True
+
+
+class BloomFilter:
+    """고정 크기 Bloom 필터 (값이 없다는 답은 확실, 있다는 답은 거짓 양성 가능)
+
+    비트 수를 2의 거듭제곱으로 맞추므로, 검색할 때 같은 크기의 필터끼리는 값의 비트 위치를
+    한 번만 계산하면 됩니다.
+    """
+
+    def __init__(self, num_bits, num_hashes, bits=None):
+        self.num_bits = num_bits
+        self.num_hashes = num_hashes
+        self.bits = bytearray(num_bits // 8) if bits is None else bits
+
+    @classmethod
+    def for_capacity(cls, count, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+        """고유 값 count개를 false_positive_rate 이하로 담는 필터"""
+        count = max(count, 1)
+        optimal_bits = -count * math.log(false_positive_rate) / math.log(2) ** 2
+        num_bits = MIN_FILTER_BITS
+        while num_bits < optimal_bits:
+            num_bits *= 2
+        num_hashes = max(1, min(MAX_HASHES, round(num_bits / count * math.log(2))))
+        return cls(num_bits, num_hashes)
+
+    def add_hash(self, value_hash):
+        for position in bloom_positions(value_hash, self.num_bits, self.num_hashes):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def add(self, value):
+        self.add_hash(hash64(value))
+
+    def __contains__(self, value):
+        return _contains(self.bits, bloom_positions(hash64(value), self.num_bits, self.num_hashes))
+
+    def false_positive_rate(self, count):
+        """고유 값 count개를 넣었을 때 예상 거짓 양성 비율"""
+        return (1 - math.exp(-self.num_hashes * count / self.num_bits)) ** self.num_hashes
+
+
+class ObjectIndex:
+    """로그 객체 하나의 사이드카 인덱스 (컬럼별 Bloom 필터, requestdatetime 최소/최대, 행 수)"""
+
+    def __init__(self, bucket_name, key, size=None, etag=None):
+        self.bucket_name = bucket_name
+        self.key = key
+        self.size = size
+        self.etag = etag
+        self.rows = 0
+        self.first_time = None
+        self.last_time = None
+        self.filters = {}
+        # 필터 크기는 고유 값 개수로 정하므로 객체를 다 읽을 때까지 해시만 모아 둠
+        self._hashes = {name: set() for name in INDEXED_COLUMNS}
+
+    def update(self, batch):
+        if not batch.num_rows:
+            return self
+        self.rows += batch.num_rows
+        for name, hashes in self._hashes.items():
+            hashes.update(hash64(value) for value in set(batch.columns[name]) if value and value != '-')
+        # 같은 초의 요청이 많으므로 고유 값만 변환
+        times = [sortable_datetime(value) for value in set(batch.columns['requestdatetime']) if value]
+        if times:
+            first, last = min(times), max(times)
+            self.first_time = min(self.first_time or first, first)
+            self.last_time = max(self.last_time or last, last)
+        return self
+
+    def finish(self, false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE):
+        for name, hashes in self._hashes.items():
+            bloom = BloomFilter.for_capacity(len(hashes), false_positive_rate)
+            for value_hash in hashes:
+                bloom.add_hash(value_hash)
+            self.filters[name] = bloom
+        self._hashes = {name: set() for name in INDEXED_COLUMNS}
+        return self
+
+    def might_match(self, criteria, start=None, end=None):
+        """criteria {컬럼: 값}과 [start, end] 범위('YYYY-MM-DD HH:MM:SS')에 일치하는 행이 있을 수 있는지"""
+        if not self.rows:
+            return False
+        if (start and self.last_time < start) or (end and self.first_time > end):
+            return False
+        return all(value in self.filters[name] for name, value in criteria.items())
+
+    def to_bytes(self):
+        header = {
+            'version': INDEX_FORMAT_VERSION,
+            'bucket': self.bucket_name,
+            'key': self.key,
+            'size': self.size,
+            'etag': self.etag,
+            'rows': self.rows,
+            'first_time': self.first_time,
+            'last_time': self.last_time,
+            'filters': [[name, bloom.num_bits, bloom.num_hashes] for name, bloom in self.filters.items()],
+        }
+        body = b''.join(bytes(bloom.bits) for bloom in self.filters.values())
+        return zlib.compress(json.dumps(header, separators=(',', ':')).encode() + b'\n' + body, 6)
+
+    @classmethod
+    def from_bytes(cls, payload):
+        data = zlib.decompress(payload)
+        end = data.index(b'\n')
+        header = json.loads(data[:end])
+        if header['version'] != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported search index version: {header['version']}")
+        index = cls(header['bucket'], header['key'], header['size'], header['etag'])
+        index.rows = header['rows']
+        index.first_time = header['first_time']
+        index.last_time = header['last_time']
+        offset = end + 1
+        for name, num_bits, num_hashes in header['filters']:
+            index.filters[name] = BloomFilter(num_bits, num_hashes, data[offset:offset + num_bits // 8])
+            offset += num_bits // 8
+        return index
+
+
+def time_bound(value, end=False):
+    """'2024-01-15', '2024-01-15 07', '2024-01-15T07:30' 등 -> 'YYYY-MM-DD HH:MM:SS' (빈 부분은 구간 시작/끝)"""
+    if not value:
+        return None
+    value = value.replace('T', ' ')
+    template = '9999-12-31 23:59:59' if end else '0000-01-01 00:00:00'
+    return value + template[len(value):]
+
+
+def _format_requestdatetime(value):
+    """datetime -> '06/Feb/2019:00:00:38 +0000' (Parquet timestamp를 원본 형식으로)"""
+    if value is None:
+        return None
+    return f"{value.day:02d}/{_MONTH_NAMES[value.month - 1]}/{value.year}:{value:%H:%M:%S} +0000"
+
+
+def read_parquet_batch(data):
+    """압축된(compaction) Parquet 파일 내용을 원본과 같은 형식의 LogBatch로 변환 (pyarrow 필요)"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow is required to index Parquet files (pip install pyarrow)")
+
+    table = pq.read_table(pa.BufferReader(data))
+    columns = table.to_pydict()
+    if 'requestdatetime' in columns:
+        columns['requestdatetime'] = [_format_requestdatetime(value) for value in columns['requestdatetime']]
+    for name in COLUMN_NAMES:
+        columns.setdefault(name, [None] * table.num_rows)
+    return LogBatch(columns, table.num_rows, num_bytes=len(data))
+
+
+def iter_log_objects(s3_client, bucket_name, objects, parquet=False, max_workers=16):
+    """[(키, 크기), ...] 객체를 순서대로 읽어 (키, LogBatch) 생성 (Parquet는 파일마다 배치 하나)"""
+    if not parquet:
+        reader = PrefetchingObjectReader(s3_client)
+        try:
+            yield from reader.iter_object_batches(bucket_name, objects)
+        finally:
+            reader.close()
+        return
+
+    def fetch(key):
+        return read_parquet_batch(s3_client.get_object(Bucket=bucket_name, Key=key)['Body'].read())
+
+    keys = [key for key, _ in objects]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # 큰 파일을 한꺼번에 메모리에 올리지 않도록 max_workers개씩 요청
+        for start in range(0, len(keys), max_workers):
+            window = keys[start:start + max_workers]
+            yield from zip(window, executor.map(fetch, window))
+
+
+def matching_rows(batch, criteria, start=None, end=None):
+    """criteria {컬럼: 값}과 모두 일치하고 [start, end] 범위 안인 행 번호 목록"""
+    rows = range(batch.num_rows)
+    for name, value in criteria.items():
+        column = batch.columns[name]
+        rows = [row for row in rows if column[row] == value]
+    if start or end:
+        times = batch.columns['requestdatetime']
+        rows = [row for row in rows if times[row] and
+                (start or '') <= sortable_datetime(times[row]) <= (end or '9999')]
+    return list(rows)
+
+
+def _is_hidden(key):
+    # Athena/Hive와 같이 '_' 또는 '.'로 시작하는 파일(_COMPACTED 표시 등)은 데이터가 아님
+    return key.rsplit('/', 1)[-1][:1] in ('_', '.')
+
+
+class SearchIndexBuilder:
+    """원본 로그(또는 압축 Parquet) 객체마다 사이드카 인덱스를 만들어 인덱스 위치에 업로드
+
+    이미 사이드카가 있는 객체는 건너뛰므로 반복 실행하면 새 객체만 처리합니다.
+    cache(SearchIndexCache)가 있으면 처리한 마지막 원본 키를 워터마크로 저장하여, 다음 실행은
+    원본과 인덱스 위치 모두 워터마크 이후만 목록 조회합니다.
+    """
+
+    def __init__(self, s3_client, source_location, index_location, parquet=False,
+                 false_positive_rate=DEFAULT_FALSE_POSITIVE_RATE, max_workers=16, cache=None):
+        self.s3_client = s3_client
+        self.source_location = source_location
+        self.source_bucket, self.source_prefix = split_s3_uri(source_location)
+        self.index_bucket, self.index_prefix = split_s3_uri(index_location)
+        self.parquet = parquet
+        self.false_positive_rate = false_positive_rate
+        self.max_workers = max_workers
+        self.cache = cache
+        # 마지막 pending_objects()가 목록 조회한 마지막 원본 키
+        self.listed_until = None
+
+    def index_key(self, key):
+        """원본 객체 키 -> 사이드카 키"""
+        return f"{self.index_prefix}{key[len(self.source_prefix):]}{INDEX_SUFFIX}"
+
+    def _in_index_location(self, key):
+        return self.source_bucket == self.index_bucket and key.startswith(self.index_prefix)
+
+    def pending_objects(self):
+        """사이드카가 없는 원본 객체 [(키, 크기, ETag), ...] (워터마크가 있으면 그 이후만)"""
+        watermark = self.cache.watermark(self.source_location) if self.cache is not None else None
+        start_after = lookback_key(watermark, self.cache.lookback_minutes) if watermark else None
+        # 사이드카 키는 원본 키 뒤에 접미사만 붙으므로 접미사 없는 키 이후가 start_after 이후 객체의 사이드카
+        index_start = self.index_key(start_after)[:-len(INDEX_SUFFIX)] if start_after else None
+        indexed = {obj['Key'] for obj in iter_objects(self.s3_client, self.index_bucket, self.index_prefix,
+                                                      index_start)}
+        pending = []
+        self.listed_until = watermark
+        for obj in iter_objects(self.s3_client, self.source_bucket, self.source_prefix, start_after):
+            key = obj['Key']
+            self.listed_until = max(self.listed_until or key, key)
+            if _is_hidden(key) or self._in_index_location(key) or self.index_key(key) in indexed:
+                continue
+            pending.append((key, obj['Size'], obj.get('ETag', '').strip('"')))
+        return pending
+
+    def build(self, max_objects=None):
+        """사이드카가 없는 객체의 인덱스를 만들어 업로드, 처리한 원본 키 목록 반환"""
+        pending = self.pending_objects()
+        watermark = self.listed_until
+        if max_objects is not None and len(pending) > max_objects:
+            # 일부만 처리하면 워터마크는 처리할 마지막 키까지만 (목록은 키 순서)
+            watermark = pending[max_objects - 1][0] if max_objects else None
+            pending = pending[:max_objects]
+        info = {key: (size, etag) for key, size, etag in pending}
+        built = []
+
+        def upload(index):
+            self.s3_client.put_object(Bucket=self.index_bucket, Key=self.index_key(index.key),
+                                      Body=index.to_bytes())
+            return index.key
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = []
+            index = None
+            objects = [(key, size) for key, size, _ in pending]
+            for key, batch in iter_log_objects(self.s3_client, self.source_bucket, objects, self.parquet):
+                if index is None or key != index.key:
+                    if index is not None:
+                        futures.append(executor.submit(upload, index.finish(self.false_positive_rate)))
+                    index = ObjectIndex(self.source_bucket, key, *info[key])
+                index.update(batch)
+            if index is not None:
+                futures.append(executor.submit(upload, index.finish(self.false_positive_rate)))
+            for future in futures:
+                built.append(future.result())
+        if self.cache is not None and watermark:
+            self.cache.set_watermark(self.source_location, watermark)
+        return built
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS indexed_objects (
+    bucket TEXT NOT NULL,
+    key TEXT NOT NULL,
+    index_key TEXT,
+    size INTEGER,
+    etag TEXT,
+    rows INTEGER,
+    first_time TEXT,
+    last_time TEXT,
+    {filter_columns},
+    PRIMARY KEY (bucket, key)
+);
+CREATE INDEX IF NOT EXISTS indexed_objects_index_key ON indexed_objects (index_key);
+CREATE TABLE IF NOT EXISTS index_watermarks (
+    location TEXT PRIMARY KEY,
+    start_after TEXT,
+    updated_at REAL
+);
+""".format(filter_columns=',\n    '.join(f"bloom_{name}_hashes INTEGER,\n    bloom_{name} BLOB"
+                                         for name in INDEXED_COLUMNS))
+
+
+class SearchIndexCache:
+    """사이드카 인덱스의 로컬 SQLite 캐시 (검색마다 S3에서 인덱스를 다시 받지 않도록)
+
+    사이드카 키는 원본 로그 키와 같은 순서이므로, 동기화는 워터마크 이후만 목록 조회합니다.
+    """
+
+    def __init__(self, path, lookback_minutes=15):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.lookback_minutes = lookback_minutes
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def close(self):
+        self._db.close()
+
+    def add(self, index, index_key=None):
+        values = [index.bucket_name, index.key, index_key, index.size, index.etag, index.rows,
+                  index.first_time, index.last_time]
+        for name in INDEXED_COLUMNS:
+            bloom = index.filters[name]
+            values.extend([bloom.num_hashes, bytes(bloom.bits)])
+        with self._lock:
+            self._db.execute(f"INSERT OR REPLACE INTO indexed_objects VALUES ({', '.join('?' * len(values))})",
+                             values)
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+
+    def watermark(self, location):
+        """location(인덱스 위치 또는 SearchIndexBuilder의 원본 위치)의 마지막 목록 조회 키"""
+        row = self._db.execute("SELECT start_after FROM index_watermarks WHERE location = ?",
+                               (location,)).fetchone()
+        return row[0] if row else None
+
+    def set_watermark(self, location, key):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO index_watermarks (location, start_after, updated_at) VALUES (?, ?, ?)",
+                (location, key, time.time())
+            )
+            self._db.commit()
+
+    def sync(self, s3_client, index_location, full=False, max_workers=16):
+        """인덱스 위치의 새 사이드카를 내려받아 캐시에 추가, 추가한 객체 수 반환"""
+        bucket_name, prefix = split_s3_uri(index_location)
+        watermark = self.watermark(index_location) if not full else None
+        start_after = lookback_key(watermark, self.lookback_minutes) if watermark else None
+
+        known = {key for (key,) in self._db.execute(
+            "SELECT index_key FROM indexed_objects WHERE index_key > ?", (start_after or '',))}
+        new_keys = []
+        latest = watermark or ''
+        for obj in iter_objects(s3_client, bucket_name, prefix, start_after):
+            key = obj['Key']
+            if key.endswith(INDEX_SUFFIX) and key not in known:
+                new_keys.append(key)
+            latest = max(latest, key)
+
+        def fetch(key):
+            return ObjectIndex.from_bytes(s3_client.get_object(Bucket=bucket_name, Key=key)['Body'].read())
+
+        if new_keys:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(new_keys))) as executor:
+                for key, index in zip(new_keys, executor.map(fetch, new_keys)):
+                    self.add(index, key)
+        if latest:
+            self.set_watermark(index_location, latest)
+        else:
+            self.commit()
+        return len(new_keys)
+
+    def candidates(self, bucket_name, prefix='', criteria=None, start=None, end=None):
+        """일치하는 행이 있을 수 있는 객체 [(키, 크기), ...]와 단계별 객체 수
+
+        시간 범위는 SQLite에서, Bloom 필터는 같은 크기 필터끼리 비트 위치를 한 번만 계산해 확인합니다.
+        """
+        criteria = criteria or {}
+        unknown = set(criteria) - set(INDEXED_COLUMNS)
+        if unknown:
+            raise ValueError(f"Not an indexed column: {', '.join(sorted(unknown))} "
+                             f"(indexed: {', '.join(INDEXED_COLUMNS)})")
+        names = list(criteria)
+        hashes = [hash64(criteria[name]) for name in names]
+        selected = ''.join(f", bloom_{name}_hashes, bloom_{name}" for name in names)
+        stats = {
+            'objects': self._db.execute(
+                "SELECT COUNT(*) FROM indexed_objects WHERE bucket = ? AND substr(key, 1, length(?)) = ?",
+                (bucket_name, prefix, prefix)
+            ).fetchone()[0],
+            'in_time_range': 0,
+        }
+        cursor = self._db.execute(
+            f"SELECT key, size{selected} FROM indexed_objects "
+            "WHERE bucket = ? AND substr(key, 1, length(?)) = ? AND rows > 0 "
+            "AND last_time >= ? AND first_time <= ? ORDER BY key",
+            (bucket_name, prefix, prefix, start or '', end or '9999')
+        )
+        positions = {}
+        objects = []
+        for row in cursor:
+            stats['in_time_range'] += 1
+            for column, value_hash in enumerate(hashes):
+                num_hashes, bits = row[2 + column * 2], row[3 + column * 2]
+                shape = (column, len(bits) * 8, num_hashes)
+                if shape not in positions:
+                    positions[shape] = bloom_positions(value_hash, shape[1], num_hashes)
+                if not _contains(bits, positions[shape]):
+                    break
+            else:
+                objects.append((row[0], row[1]))
+        stats['candidates'] = len(objects)
+        return objects, stats
+
+
+class LogSearcher:
+    """사이드카 인덱스로 후보 객체를 고른 뒤 후보만 읽어 일치하는 행을 찾는 검색"""
+
+    def __init__(self, s3_client, cache, source_location, index_location, parquet=False):
+        self.s3_client = s3_client
+        self.cache = cache
+        self.bucket_name, self.prefix = split_s3_uri(source_location)
+        self.index_location = index_location
+        self.parquet = parquet
+        self.stats = {}
+
+    def search(self, criteria, start=None, end=None, limit=None, sync=True):
+        """(객체 키, 행 dict)를 객체 순서대로 생성 (검색 단계별 수치는 self.stats)"""
+        started = time.perf_counter()
+        start, end = time_bound(start), time_bound(end, end=True)
+        self.stats = {'synced': self.cache.sync(self.s3_client, self.index_location) if sync else 0}
+        objects, stats = self.cache.candidates(self.bucket_name, self.prefix, criteria, start, end)
+        self.stats.update(stats, index_seconds=time.perf_counter() - started, bytes_read=0, matches=0)
+
+        for key, batch in iter_log_objects(self.s3_client, self.bucket_name, objects, self.parquet):
+            self.stats['bytes_read'] += batch.num_bytes
+            for row in matching_rows(batch, criteria, start, end):
+                self.stats['matches'] += 1
+                yield key, {name: batch.columns[name][row] for name in COLUMN_NAMES}
+                if limit and self.stats['matches'] >= limit:
+                    self.stats['seconds'] = time.perf_counter() - started
+                    return
+        self.stats['seconds'] = time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build per-object search indexes and search S3 access logs")
+    parser.add_argument('command', choices=['build', 'search'])
+    parser.add_argument('source', help="log location, e.g. s3://log-bucket/logs/")
+    parser.add_argument('index', help="index location, e.g. s3://log-bucket/search-index/")
+    parser.add_argument('--region', default=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    parser.add_argument('--parquet', action='store_true', help="source files are compacted Parquet")
+    parser.add_argument('--false-positive-rate', type=float, default=DEFAULT_FALSE_POSITIVE_RATE)
+    parser.add_argument('--cache', default=os.path.expanduser('~/.s3_search_index.sqlite'))
+    parser.add_argument('--full-sync', action='store_true', help="re-list every index file")
+    parser.add_argument('--no-sync', action='store_true', help="search the local cache only")
+    for name in INDEXED_COLUMNS:
+        parser.add_argument(f"--{name}", help=f"exact {name} to find")
+    parser.add_argument('--start', help="first record time (YYYY-MM-DD[ HH:MM:SS])")
+    parser.add_argument('--end', help="last record time (YYYY-MM-DD[ HH:MM:SS])")
+    parser.add_argument('--limit', type=int, help="stop after N matching rows")
+    args = parser.parse_args()
+
+    import boto3
+    s3_client = boto3.client('s3', region_name=args.region)
+    if args.command == 'build':
+        cache = SearchIndexCache(args.cache)
+        try:
+            builder = SearchIndexBuilder(s3_client, args.source, args.index, args.parquet,
+                                         args.false_positive_rate, cache=cache)
+            built = builder.build()
+        finally:
+            cache.close()
+        print(f"✓ Indexed {len(built)} objects")
+        return
+
+    criteria = {name: getattr(args, name) for name in INDEXED_COLUMNS if getattr(args, name)}
+    if not criteria and not (args.start or args.end):
+        parser.error("give at least one of " + ', '.join(f"--{name}" for name in INDEXED_COLUMNS) +
+                     ", --start or --end")
+    cache = SearchIndexCache(args.cache)
+    if args.full_sync:
+        cache.sync(s3_client, args.index, full=True)
+    searcher = LogSearcher(s3_client, cache, args.source, args.index, args.parquet)
+    try:
+        for key, row in searcher.search(criteria, args.start, args.end, args.limit, sync=not args.no_sync):
+            print(json.dumps({'object': key, **row}, default=str))
+    finally:
+        cache.close()
+
+    stats = searcher.stats
+    print(f"{stats['matches']} rows from {stats['candidates']} of {stats['objects']} objects "
+          f"({stats['objects'] - stats['in_time_range']} skipped by time range, "
+          f"{stats['in_time_range'] - stats['candidates']} by Bloom filter), "
+          f"{stats['bytes_read'] / 1024 ** 2:.1f} MB read, index {stats['index_seconds']:.2f}s, "
+          f"total {stats['seconds']:.2f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
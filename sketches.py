@@ -0,0 +1,472 @@
+# sketches.py - 병합 가능한 근사 집계 스케치 (고유 IP, 인기 키, 지연 시간 분위수) 및 시간별 저장
+#
+# 오차 한계 (benchmark.py sketches로 정확한 값과 비교할 수 있음):
+# - HyperLogLog: 상대 표준 오차 1.04 / sqrt(2^precision)
+#   (precision=14 -> 약 0.81%, 약 98%의 추정이 ±2.4% 이내). 병합해도 오차는 같음
+# - Count-Min: 추정 횟수는 실제 이상이며, 1 - e^-depth 확률로 초과분 <= e / width * 전체 건수
+#   (width=2048, depth=5 -> 99.3% 확률로 초과분 <= 전체의 0.133%)
+#   상위 키 후보는 capacity개까지 유지하므로 capacity보다 적은 상위 N개를 조회해야 함
+# - t-digest: 분위수 순위(rank) 오차는 대략 q(1-q) / compression 비례이며 양 끝(p99, p999)일수록 작음
+#   (compression=100 -> 중앙값 부근 순위 오차 최대 약 1%, p99 이상은 0.1% 미만)
+#   꼬리가 긴 분포에서는 작은 순위 오차도 값 차이로는 커질 수 있음 (p99.9 값 오차 수 %)
+import argparse
+import base64
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import sys
+import zlib
+from array import array
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from compaction import HourlyPartitionTracker, partition_path, record_hour
+from log_parser import iter_object_batches
+from s3_utils import iter_objects
+
+# 시간 파티션별 스케치 파일 이름
+SKETCH_NAME = 'sketch.json.zlib'
+
+_SKETCH_RE = re.compile(r'dt=(\d{4}-\d{2}-\d{2})/hour=(\d{2})/' + re.escape(SKETCH_NAME) + '$')
+
+
+def hash64(value):
+    """프로세스와 무관하게 같은 64비트 해시 (내장 hash()는 실행마다 달라 병합에 쓸 수 없음)"""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'little')
+
+
+def _encode_array(values):
+    if sys.byteorder == 'big':
+        values = array(values.typecode, values)
+        values.byteswap()
+    return base64.b64encode(values.tobytes()).decode()
+
+
+def _decode_array(typecode, data):
+    values = array(typecode)
+    values.frombytes(base64.b64decode(data))
+    if sys.byteorder == 'big':
+        values.byteswap()
+    return values
+
+
+class HyperLogLog:
+    """고유 값 개수 추정 (레지스터별 최댓값으로 병합)"""
+
+    def __init__(self, precision=14):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value):
+        self.add_hash(hash64(value))
+
+    def add_hash(self, x):
+        """64비트 해시 추가: 상위 precision비트 = 레지스터, 나머지 비트의 선행 0 개수 + 1 = 순위"""
+        index = x >> (64 - self.precision)
+        remainder = x & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - remainder.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def add_many(self, values):
+        # 같은 값은 결과에 영향이 없으므로 중복 제거 후 해시
+        for value in set(values):
+            if value and value != '-':
+                self.add(value)
+
+    def merge(self, other):
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge HyperLogLog sketches with different precision")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def count(self):
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # 작은 값은 선형 카운팅이 더 정확
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+    def relative_error(self):
+        return 1.04 / math.sqrt(len(self.registers))
+
+    def to_dict(self):
+        return {'precision': self.precision,
+                'registers': base64.b64encode(bytes(self.registers)).decode()}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['precision'])
+        sketch.registers = bytearray(base64.b64decode(data['registers']))
+        return sketch
+
+
+class HeavyHitters:
+    """Count-Min 스케치 + 상위 후보 목록으로 많이 요청된 키 추정 (카운터 합으로 병합)"""
+
+    def __init__(self, capacity=200, width=2048, depth=5):
+        self.capacity = capacity
+        self.width = width
+        self.depth = depth
+        self.total = 0
+        self.counters = [array('Q', bytes(8 * width)) for _ in range(depth)]
+        self.candidates = {}
+        self._threshold = 0
+
+    def _indexes(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def _estimate_at(self, indexes):
+        return min(counters[index] for counters, index in zip(self.counters, indexes))
+
+    def estimate(self, value):
+        """value의 추정 횟수 (실제 이상)"""
+        return self._estimate_at(self._indexes(value))
+
+    def add(self, value, count=1):
+        indexes = self._indexes(value)
+        for counters, index in zip(self.counters, indexes):
+            counters[index] += count
+        self.total += count
+        estimate = self._estimate_at(indexes)
+        if value in self.candidates or estimate >= self._threshold:
+            self.candidates[value] = estimate
+            if len(self.candidates) > 2 * self.capacity:
+                self._prune()
+
+    def add_many(self, values):
+        for value, count in Counter(value for value in values if value and value != '-').items():
+            self.add(value, count)
+
+    def _prune(self):
+        top = heapq.nlargest(self.capacity, self.candidates.items(), key=lambda item: item[1])
+        self.candidates = dict(top)
+        self._threshold = top[-1][1] if len(top) >= self.capacity else 0
+
+    def merge(self, other):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Cannot merge Count-Min sketches with different dimensions")
+        for counters, other_counters in zip(self.counters, other.counters):
+            for index, count in enumerate(other_counters):
+                if count:
+                    counters[index] += count
+        self.total += other.total
+        # 병합된 카운터로 양쪽 후보를 다시 추정
+        keys = set(self.candidates) | set(other.candidates)
+        self.candidates = {key: self.estimate(key) for key in keys}
+        self._prune()
+        return self
+
+    def top(self, n=20):
+        """[(키, 추정 횟수), ...] 많은 순"""
+        return heapq.nlargest(n, self.candidates.items(), key=lambda item: item[1])
+
+    def error_bound(self):
+        """(추정 초과분 상한, 해당 상한이 성립할 확률)"""
+        return math.e / self.width * self.total, 1 - math.exp(-self.depth)
+
+    def to_dict(self):
+        return {
+            'capacity': self.capacity, 'width': self.width, 'depth': self.depth, 'total': self.total,
+            'counters': [_encode_array(counters) for counters in self.counters],
+            'candidates': self.candidates,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['capacity'], data['width'], data['depth'])
+        sketch.total = data['total']
+        sketch.counters = [_decode_array('Q', counters) for counters in data['counters']]
+        sketch.candidates = dict(data['candidates'])
+        if len(sketch.candidates) >= sketch.capacity:
+            sketch._prune()
+        return sketch
+
+
+class TDigest:
+    """분위수 추정용 merging t-digest (중심점 목록을 합쳐 다시 압축하는 방식으로 병합)"""
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.means = []
+        self.weights = []
+        self.count = 0
+        self.min = math.inf
+        self.max = -math.inf
+        self._buffer = []
+
+    def _k(self, q):
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _q_limit(self, q):
+        k = self._k(q) + 1
+        if k >= self.compression / 4:
+            return 1.0
+        return (math.sin(k * 2 * math.pi / self.compression) + 1) / 2
+
+    def add(self, value, weight=1):
+        self._buffer.append((value, weight))
+        if len(self._buffer) >= 20 * self.compression:
+            self._compress()
+
+    def add_many(self, values):
+        for value in values:
+            if value and value != '-':
+                self.add(float(value))
+
+    def _compress(self):
+        if not self._buffer:
+            return
+        for value, weight in self._buffer:
+            self.count += weight
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+        centroids = sorted(list(zip(self.means, self.weights)) + self._buffer)
+        self._buffer = []
+
+        total = sum(weight for _, weight in centroids)
+        means, weights = [], []
+        current_mean, current_weight = centroids[0]
+        so_far = 0
+        q_limit = self._q_limit(0)
+        for mean, weight in centroids[1:]:
+            if (so_far + current_weight + weight) / total <= q_limit:
+                current_weight += weight
+                current_mean += (mean - current_mean) * weight / current_weight
+            else:
+                means.append(current_mean)
+                weights.append(current_weight)
+                so_far += current_weight
+                q_limit = self._q_limit(so_far / total)
+                current_mean, current_weight = mean, weight
+        means.append(current_mean)
+        weights.append(current_weight)
+        self.means, self.weights = means, weights
+
+    def merge(self, other):
+        other._compress()
+        self._buffer.extend(zip(other.means, other.weights))
+        self._compress()
+        # 병합 전 값 범위 유지 (중심점 평균만으로는 min/max를 알 수 없음)
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def quantile(self, q):
+        """q 분위수 추정 (값이 없으면 None)"""
+        self._compress()
+        if not self.means:
+            return None
+        if len(self.means) == 1:
+            return self.means[0]
+        target = q * self.count
+        cumulative = 0
+        previous_mean, previous_center = self.min, 0
+        for mean, weight in zip(self.means, self.weights):
+            center = cumulative + weight / 2
+            if target < center:
+                if center == previous_center:
+                    return mean
+                return previous_mean + (mean - previous_mean) * (target - previous_center) / (center - previous_center)
+            previous_mean, previous_center = mean, center
+            cumulative += weight
+        if self.count == previous_center:
+            return self.max
+        return previous_mean + (self.max - previous_mean) * (target - previous_center) / (self.count - previous_center)
+
+    def to_dict(self):
+        self._compress()
+        return {'compression': self.compression, 'means': self.means, 'weights': self.weights,
+                'count': self.count, 'min': self.min if self.count else None,
+                'max': self.max if self.count else None}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['compression'])
+        sketch.means = list(data['means'])
+        sketch.weights = list(data['weights'])
+        sketch.count = data['count']
+        if data['count']:
+            sketch.min, sketch.max = data['min'], data['max']
+        return sketch
+
+
+class LogSketch:
+    """로그 객체/시간 단위 근사 요약 (고유 IP/요청자, 인기 키, totaltime/turnaroundtime 분위수)"""
+
+    def __init__(self, precision=14, capacity=200, width=2048, depth=5, compression=100):
+        self.rows = 0
+        self.remoteip = HyperLogLog(precision)
+        self.requester = HyperLogLog(precision)
+        self.keys = HeavyHitters(capacity, width, depth)
+        self.totaltime = TDigest(compression)
+        self.turnaroundtime = TDigest(compression)
+
+    def update(self, batch, rows=None):
+        """LogBatch 반영 (rows가 있으면 해당 행 번호만)"""
+        def column(name):
+            values = batch.columns[name]
+            return values if rows is None else [values[row] for row in rows]
+
+        self.rows += batch.num_rows if rows is None else len(rows)
+        self.remoteip.add_many(column('remoteip'))
+        self.requester.add_many(column('requester'))
+        self.keys.add_many(column('key'))
+        self.totaltime.add_many(column('totaltime'))
+        self.turnaroundtime.add_many(column('turnaroundtime'))
+        return self
+
+    def merge(self, other):
+        self.rows += other.rows
+        self.remoteip.merge(other.remoteip)
+        self.requester.merge(other.requester)
+        self.keys.merge(other.keys)
+        self.totaltime.merge(other.totaltime)
+        self.turnaroundtime.merge(other.turnaroundtime)
+        return self
+
+    def summary(self, top_n=20, quantiles=(0.5, 0.9, 0.99)):
+        return {
+            'rows': self.rows,
+            'distinct_ips': self.remoteip.count(),
+            'distinct_requesters': self.requester.count(),
+            'distinct_error': self.remoteip.relative_error(),
+            'top_keys': self.keys.top(top_n),
+            'top_keys_error_bound': self.keys.error_bound()[0],
+            'totaltime': {q: self.totaltime.quantile(q) for q in quantiles},
+            'turnaroundtime': {q: self.turnaroundtime.quantile(q) for q in quantiles},
+        }
+
+    def to_bytes(self):
+        data = {
+            'rows': self.rows,
+            'remoteip': self.remoteip.to_dict(),
+            'requester': self.requester.to_dict(),
+            'keys': self.keys.to_dict(),
+            'totaltime': self.totaltime.to_dict(),
+            'turnaroundtime': self.turnaroundtime.to_dict(),
+        }
+        return zlib.compress(json.dumps(data, separators=(',', ':')).encode(), 6)
+
+    @classmethod
+    def from_bytes(cls, payload):
+        data = json.loads(zlib.decompress(payload))
+        sketch = cls()
+        sketch.rows = data['rows']
+        sketch.remoteip = HyperLogLog.from_dict(data['remoteip'])
+        sketch.requester = HyperLogLog.from_dict(data['requester'])
+        sketch.keys = HeavyHitters.from_dict(data['keys'])
+        sketch.totaltime = TDigest.from_dict(data['totaltime'])
+        sketch.turnaroundtime = TDigest.from_dict(data['turnaroundtime'])
+        return sketch
+
+
+class SketchBuilder(HourlyPartitionTracker):
+    """원본 로그 -> dt/hour 파티션별 스케치 파일 증분 생성 및 시간 범위 병합 조회"""
+
+    def build(self, now=None, hours_per_run=24):
+        """지연 도착 대기가 끝난 미처리 시간의 스케치를 만들어 업로드, 처리한 시간 목록 반환"""
+        raw_objects = self.raw_objects_by_hour()
+        pending = self.pending_hours(raw_objects, now)
+        built = []
+
+        for index in range(0, len(pending), hours_per_run):
+            window = set(pending[index:index + hours_per_run])
+            sketches = {}
+            for key in self._source_keys(raw_objects, min(window), max(window)):
+                for batch in iter_object_batches(self.s3_client, self.source_bucket, key):
+                    # 레코드 시각 기준으로 행을 시간별 스케치에 분배
+                    rows_by_hour = {}
+                    for row, value in enumerate(batch.columns['requestdatetime']):
+                        hour = record_hour(value)
+                        if hour in window:
+                            rows_by_hour.setdefault(hour, []).append(row)
+                    for hour, rows in rows_by_hour.items():
+                        sketches.setdefault(hour, LogSketch()).update(batch, rows)
+
+            for hour in sorted(sketches):
+                self.s3_client.put_object(
+                    Bucket=self.dest_bucket,
+                    Key=f"{self.dest_prefix}{partition_path(hour)}{SKETCH_NAME}",
+                    Body=sketches[hour].to_bytes()
+                )
+            self.mark_completed(sorted(window))
+            built.extend(sorted(window))
+
+        return built
+
+    def sketch_keys(self, first_hour, last_hour):
+        """[first_hour, last_hour] 구간 스케치 파일 키 (키 이름이 시간순이므로 범위만 목록 조회)"""
+        start_after = f"{self.dest_prefix}dt={first_hour[:10]}/"
+        keys = []
+        for obj in iter_objects(self.s3_client, self.dest_bucket, self.dest_prefix, start_after):
+            match = _SKETCH_RE.search(obj['Key'])
+            if not match:
+                continue
+            hour = f"{match.group(1)}-{match.group(2)}"
+            if hour > last_hour:
+                break
+            if hour >= first_hour:
+                keys.append(obj['Key'])
+        return keys
+
+    def load(self, first_hour, last_hour, max_workers=16):
+        """구간 스케치를 병렬로 내려받아 병합한 LogSketch"""
+        def fetch(key):
+            body = self.s3_client.get_object(Bucket=self.dest_bucket, Key=key)['Body'].read()
+            return LogSketch.from_bytes(body)
+
+        merged = LogSketch()
+        keys = self.sketch_keys(first_hour, last_hour)
+        if keys:
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(keys))) as executor:
+                for sketch in executor.map(fetch, keys):
+                    merged.merge(sketch)
+        return merged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and query mergeable S3 access log sketches")
+    parser.add_argument('command', choices=['build', 'query'])
+    parser.add_argument('source', help="raw log location, e.g. s3://log-bucket/logs/")
+    parser.add_argument('dest', help="sketch location, e.g. s3://log-bucket/sketches/")
+    parser.add_argument('--region', default=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'))
+    parser.add_argument('--settle-hours', type=int, default=2, help="wait for late log delivery")
+    parser.add_argument('--start', help="first hour for query (YYYY-MM-DD-HH)")
+    parser.add_argument('--end', help="last hour for query (YYYY-MM-DD-HH, default: now)")
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    import boto3
+    builder = SketchBuilder(boto3.client('s3', region_name=args.region), args.source, args.dest,
+                            settle_hours=args.settle_hours)
+    if args.command == 'build':
+        hours = builder.build()
+        print(f"✓ Built sketches for {len(hours)} hours" + (f" ({hours[0]} ~ {hours[-1]})" if hours else ""))
+        return
+
+    end = args.end or datetime.utcnow().strftime('%Y-%m-%d-%H')
+    summary = builder.load(args.start or '0000-00-00-00', end).summary(args.top)
+    print(f"rows: {summary['rows']}")
+    print(f"distinct IPs: ~{summary['distinct_ips']} (±{summary['distinct_error']:.1%} std. error)")
+    print(f"distinct requesters: ~{summary['distinct_requesters']}")
+    print(f"top keys (overestimate ≤ {summary['top_keys_error_bound']:.0f}):")
+    for key, count in summary['top_keys']:
+        print(f"  {count:>10}  {key}")
+    for name in ['totaltime', 'turnaroundtime']:
+        quantiles = ', '.join(f"p{q * 100:g}={value:.1f}" for q, value in summary[name].items() if value is not None)
+        print(f"{name} (ms): {quantiles}")
+
+
+if __name__ == "__main__":
+    main()
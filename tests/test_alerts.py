@@ -0,0 +1,20 @@
+from alerts import SlidingWindow
+
+
+def test_stale_sample_does_not_move_first_slot():
+    window = SlidingWindow(slots=4)
+    assert window.add(10, 5)
+    # 슬롯 6은 슬롯 10과 같은 링 위치이며 더 오래되어 버려짐
+    assert not window.add(6, 100)
+    assert window.first_slot == 10
+    assert window.totals(0, 10) == (5, 0, 0, 0)
+
+
+def test_older_sample_within_ring_moves_first_slot():
+    window = SlidingWindow(slots=4)
+    window.add(10, 5)
+    assert window.add(9, 2, client_errors=1)
+    assert window.first_slot == 9
+    assert window.add(9, 1, server_errors=1, bytes_sent=100)
+    assert window.totals(9, 10) == (8, 1, 1, 100)
+    assert window.totals(9, 9) == (3, 1, 1, 100)
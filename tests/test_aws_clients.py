@@ -0,0 +1,62 @@
+import pytest
+
+pytest.importorskip('boto3')
+
+import aws_clients  # noqa: E402
+from aws_clients import ClientPool  # noqa: E402
+
+
+class FakeSts:
+    def __init__(self, calls):
+        self.calls = calls
+
+    def get_caller_identity(self):
+        self.calls.append(1)
+        return {'Account': '123456789012', 'Arn': 'arn:aws:iam::123456789012:user/test'}
+
+
+class FakeSession:
+    created = []
+
+    def __init__(self, **credentials):
+        self.credentials = credentials
+        self.calls = []
+        FakeSession.created.append(self)
+
+    def client(self, service_name, region_name=None, config=None):
+        return FakeSts(self.calls)
+
+
+@pytest.fixture(autouse=True)
+def fake_session(monkeypatch):
+    FakeSession.created = []
+    monkeypatch.setattr(aws_clients.boto3, 'Session', FakeSession)
+
+
+def _credentials(number):
+    return {'aws_access_key_id': f"AKIA{number}", 'aws_secret_access_key': 'secret'}
+
+
+def test_identity_is_revalidated_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(aws_clients.time, 'monotonic', lambda: now[0])
+    pool = ClientPool(identity_ttl=300)
+    pool.caller_identity('us-east-1', **_credentials(1))
+    pool.caller_identity('us-east-1', **_credentials(1))
+    assert len(FakeSession.created[0].calls) == 1
+    now[0] += 301
+    pool.caller_identity('us-east-1', **_credentials(1))
+    assert len(FakeSession.created[0].calls) == 2
+
+
+def test_least_recently_used_credentials_are_evicted():
+    pool = ClientPool(max_credentials=2)
+    first = pool.client('s3', 'us-east-1', **_credentials(1))
+    pool.client('s3', 'us-east-1', **_credentials(2))
+    pool.client('s3', 'us-east-1', **_credentials(1))
+    pool.client('s3', 'us-east-1', **_credentials(3))
+    assert len(pool._sessions) == 2
+    assert pool.client('s3', 'us-east-1', **_credentials(1)) is first
+    pool.client('s3', 'us-east-1', **_credentials(2))
+    assert len(FakeSession.created) == 4
+    assert all(key[0] in pool._sessions for key in pool._clients)
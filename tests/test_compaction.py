@@ -0,0 +1,130 @@
+from datetime import datetime
+
+import pytest
+
+from compaction import MARKER_NAME, HourlyPartitionTracker, hour_runs, partition_path, record_hours
+from rollups import RollupManager
+
+DATED_BASE = 'raw/123456789012/us-east-1/source-bucket/'
+
+
+class StubS3:
+    """list_objects_v2(StartAfter/Delimiter/MaxKeys)와 put_object만 흉내 내는 S3 모의 객체"""
+
+    def __init__(self, keys=()):
+        self.keys = set(keys)
+        self.listed = []
+
+    def _keys(self, Prefix, StartAfter=None):
+        return sorted(key for key in self.keys if key.startswith(Prefix) and key > (StartAfter or ''))
+
+    def list_objects_v2(self, Bucket, Prefix, MaxKeys=1000):
+        return {'Contents': [{'Key': key} for key in self._keys(Prefix)[:MaxKeys]]}
+
+    def get_paginator(self, name):
+        assert name == 'list_objects_v2'
+        return self
+
+    def paginate(self, Bucket, Prefix, StartAfter=None, Delimiter=None):
+        self.listed.append((Prefix, StartAfter, Delimiter))
+        keys = self._keys(Prefix, StartAfter)
+        if Delimiter:
+            prefixes = sorted({Prefix + key[len(Prefix):].split(Delimiter)[0] + Delimiter
+                               for key in keys if Delimiter in key[len(Prefix):]})
+            yield {'CommonPrefixes': [{'Prefix': prefix} for prefix in prefixes]}
+            return
+        yield {'Contents': [{'Key': key} for key in keys]}
+
+    def put_object(self, Bucket, Key, Body):
+        self.keys.add(Key)
+
+
+def _dated(hour, suffix='AAAA'):
+    return f"{DATED_BASE}{hour[:10].replace('-', '/')}/{hour}-05-00-{suffix}"
+
+
+def test_record_hours_cover_hours_without_delivered_objects():
+    # 09시 레코드가 10시에 전송된 객체에만 있는 경우
+    assert record_hours(['2024-01-01-10'], 1) == ['2024-01-01-09', '2024-01-01-10']
+    assert record_hours(['2024-01-02-00', '2024-01-02-03'], 2) == [
+        '2024-01-01-22', '2024-01-01-23', '2024-01-02-00',
+        '2024-01-02-01', '2024-01-02-02', '2024-01-02-03',
+    ]
+
+
+@pytest.mark.parametrize('settle_hours', [0, 1, 2])
+def test_pending_hours_include_record_hours_before_delivery(monkeypatch, settle_hours):
+    tracker = HourlyPartitionTracker(None, 's3://logs/raw/', 's3://logs/compacted/', settle_hours)
+    monkeypatch.setattr(tracker, 'completed_hours', lambda hours=None: {'2024-01-01-10'})
+    raw_objects = {'2024-01-01-10': ['raw/2024-01-01-10-05-00-AAAA']}
+    pending = tracker.pending_hours(raw_objects, now=datetime(2024, 1, 2))
+    assert '2024-01-01-09' in pending
+    assert '2024-01-01-10' not in pending
+    assert hour_runs(pending) == [(pending[0], '2024-01-01-09')]
+
+
+def test_source_keys_include_objects_delivered_after_the_hour():
+    tracker = HourlyPartitionTracker(None, 's3://logs/raw/', 's3://logs/compacted/', settle_hours=0)
+    raw_objects = {'2024-01-01-10': ['raw/2024-01-01-10-05-00-AAAA']}
+    assert tracker._source_keys(raw_objects, '2024-01-01-09', '2024-01-01-09') == raw_objects['2024-01-01-10']
+
+
+@pytest.mark.parametrize('source, key_for', [
+    (DATED_BASE, _dated),
+    ('raw/', lambda hour: f"raw/{hour}-05-00-AAAA"),
+])
+def test_incremental_listing_starts_from_last_completed_hour(source, key_for):
+    hours = ['2024-01-01-22', '2024-01-01-23', '2024-01-02-00', '2024-01-02-01']
+    s3_client = StubS3(key_for(hour) for hour in hours)
+    tracker = HourlyPartitionTracker(s3_client, f"s3://logs/{source}", 's3://logs/compacted/', settle_hours=1)
+    now = datetime(2024, 1, 2, 2, 30)
+    first = tracker.pending_hours(now=now)
+    assert first == ['2024-01-01-21', '2024-01-01-22', '2024-01-01-23', '2024-01-02-00']
+    # 처음에는 완료 표시가 없으므로 전체 목록 조회
+    assert (source, None, None) in s3_client.listed
+    tracker.mark_completed(first)
+
+    # 새 객체가 도착한 뒤 새 추적기로 다시 계산
+    s3_client.keys.update([key_for('2024-01-02-02'), key_for('2024-01-02-03')])
+    s3_client.listed.clear()
+    tracker = HourlyPartitionTracker(s3_client, f"s3://logs/{source}", 's3://logs/compacted/', settle_hours=1)
+    assert tracker.pending_hours(now=datetime(2024, 1, 2, 4, 30)) == ['2024-01-02-01', '2024-01-02-02']
+    assert tracker.last_completed_hour() == '2024-01-02-00'
+    listed = [(prefix, start_after) for prefix, start_after, delimiter in s3_client.listed if not delimiter]
+    # 원본은 마지막 완료 시간의 전송분부터, 대상은 대기 시간의 날짜 폴더 표시 파일만 조회
+    start_key = key_for('2024-01-02-00')
+    assert (source, start_key[:start_key.index('-05-00-')]) in listed
+    assert ('compacted/', 'compacted/dt=2024-01-01/') in listed
+    assert (source, None) not in listed and ('compacted/', None) not in listed
+
+
+def test_listing_without_dated_keys_is_not_narrowed():
+    keys = ['raw/111/us-east-1/a/2024/01/01/2024-01-01-10-05-00-AAAA',
+            'raw/222/us-east-1/b/2024/01/01/2024-01-01-11-05-00-BBBB']
+    s3_client = StubS3(keys + [f"compacted/{partition_path('2024-01-01-10')}{MARKER_NAME}"])
+    tracker = HourlyPartitionTracker(s3_client, 's3://logs/raw/', 's3://logs/compacted/')
+    # 여러 소스가 섞인 경로는 키 이름이 전송 시각순이 아니므로 전체 목록 조회
+    assert tracker.raw_objects_by_hour() == {'2024-01-01-10': keys[:1], '2024-01-01-11': keys[1:]}
+    assert ('raw/', None, None) in s3_client.listed
+
+
+def test_completed_hours_checks_only_requested_range():
+    markers = [f"compacted/{partition_path(hour)}{MARKER_NAME}"
+               for hour in ['2024-01-01-05', '2024-01-02-03', '2024-01-02-04', '2024-01-03-00']]
+    tracker = HourlyPartitionTracker(StubS3(markers), 's3://logs/raw/', 's3://logs/compacted/')
+    assert tracker.completed_hours(['2024-01-02-02', '2024-01-02-04']) == {'2024-01-02-04'}
+    assert tracker.completed_hours([]) == set()
+    assert tracker.completed_hours() == {'2024-01-01-05', '2024-01-02-03', '2024-01-02-04', '2024-01-03-00'}
+
+
+def test_rollups_list_from_the_most_behind_rollup():
+    s3_client = StubS3(_dated(hour) for hour in ['2024-01-01-10', '2024-01-01-11', '2024-01-01-12'])
+    manager = RollupManager(s3_client, f"s3://logs/{DATED_BASE}", 's3://logs/rollups/')
+    for name, tracker in manager.trackers.items():
+        tracker.mark_completed(['2024-01-01-11'] if name == 'status' else ['2024-01-01-10', '2024-01-01-12'])
+    assert sorted(manager.raw_objects_by_hour()) == ['2024-01-01-11', '2024-01-01-12']
+
+    # 완료 표시가 없는 롤업이 있으면 전체 목록 조회
+    manager = RollupManager(s3_client, f"s3://logs/{DATED_BASE}", 's3://logs/other/')
+    manager.trackers['status'].mark_completed(['2024-01-01-12'])
+    assert sorted(manager.raw_objects_by_hour()) == ['2024-01-01-10', '2024-01-01-11', '2024-01-01-12']
@@ -0,0 +1,115 @@
+import pytest
+
+pytest.importorskip('botocore')
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+from discovery import BucketDiscovery, normalize_location  # noqa: E402
+
+
+def _error(code, status, headers=None, operation='HeadBucket'):
+    return ClientError({'Error': {'Code': code, 'Message': code},
+                        'ResponseMetadata': {'HTTPStatusCode': status, 'HTTPHeaders': headers or {}}}, operation)
+
+
+class StubS3:
+    """버킷별 GetBucketLocation/HeadBucket 응답과 접두사 트리를 흉내 내는 S3 모의 객체"""
+
+    def __init__(self, locations=None, head_regions=None, keys=()):
+        self.locations = locations or {}
+        self.head_regions = head_regions or {}
+        self.keys = sorted(keys)
+        self.listed = []
+
+    def get_bucket_location(self, Bucket):
+        location = self.locations.get(Bucket)
+        if isinstance(location, Exception):
+            raise location
+        return {'LocationConstraint': location}
+
+    def head_bucket(self, Bucket):
+        region = self.head_regions.get(Bucket)
+        if isinstance(region, Exception):
+            raise region
+        return {'ResponseMetadata': {'HTTPHeaders': {'x-amz-bucket-region': region} if region else {}}}
+
+    def get_paginator(self, name):
+        assert name == 'list_objects_v2'
+        return self
+
+    def paginate(self, Bucket, Prefix, Delimiter):
+        self.listed.append(Prefix)
+        children = sorted({Prefix + key[len(Prefix):].split(Delimiter)[0] + Delimiter
+                           for key in self.keys if key.startswith(Prefix) and Delimiter in key[len(Prefix):]})
+        # 두 페이지로 나누어 반환
+        middle = len(children) // 2
+        yield {'CommonPrefixes': [{'Prefix': prefix} for prefix in children[:middle]]}
+        yield {'CommonPrefixes': [{'Prefix': prefix} for prefix in children[middle:]]}
+
+
+def test_normalize_location():
+    assert normalize_location(None) == 'us-east-1'
+    assert normalize_location('') == 'us-east-1'
+    assert normalize_location('EU') == 'eu-west-1'
+    assert normalize_location('ap-northeast-2') == 'ap-northeast-2'
+
+
+def test_resolve_regions_falls_back_to_head_bucket_headers():
+    denied = _error('AccessDenied', 403, operation='GetBucketLocation')
+    s3_client = StubS3(
+        locations={'classic': None, 'eu': 'EU', 'seoul': 'ap-northeast-2',
+                   'no-location-permission': denied, 'moved': denied, 'unknown': denied},
+        head_regions={
+            'no-location-permission': 'eu-central-1',
+            # 다른 리전 버킷은 301 오류 응답 헤더에 리전이 있음
+            'moved': _error('301', 301, {'x-amz-bucket-region': 'sa-east-1'}),
+            'unknown': _error('403', 403),
+        },
+    )
+    regions_asked = []
+
+    def client_factory(region):
+        regions_asked.append(region)
+        return s3_client
+
+    discovery = BucketDiscovery(client_factory, default_region='ap-northeast-2', max_workers=4)
+    assert discovery.resolve_regions(['classic', 'eu', 'seoul', 'no-location-permission', 'moved', 'unknown']) == {
+        'classic': 'us-east-1',
+        'eu': 'eu-west-1',
+        'seoul': 'ap-northeast-2',
+        'no-location-permission': 'eu-central-1',
+        'moved': 'sa-east-1',
+        'unknown': None,
+    }
+    assert set(regions_asked) == {'ap-northeast-2'}
+    assert discovery.resolve_regions([]) == {}
+
+
+def test_walk_prefixes_stops_at_max_depth():
+    keys = [f"logs/{account}/{region}/{bucket}/2024/01/02/object"
+            for account in ('111', '222') for region in ('us-east-1', 'eu-west-1') for bucket in ('a', 'b')]
+    s3_client = StubS3(keys=keys)
+    discovery = BucketDiscovery(lambda region: s3_client, max_workers=4)
+
+    found = discovery.walk_prefixes('logs-bucket', prefix='logs/', max_depth=2)
+    assert found == sorted(['logs/111/', 'logs/222/'] + [f"logs/{account}/{region}/"
+                                                          for account in ('111', '222')
+                                                          for region in ('us-east-1', 'eu-west-1')])
+    # 깊이 2까지만 목록 조회 (마지막 단계의 하위 접두사는 조회하지 않음)
+    assert sorted(s3_client.listed) == ['logs/', 'logs/111/', 'logs/222/']
+
+    s3_client.listed.clear()
+    deeper = discovery.walk_prefixes('logs-bucket', prefix='logs/', max_depth=3)
+    assert len(deeper) == 2 + 4 + 8
+    assert max(prefix.count('/') for prefix in deeper) == 4
+    assert len(s3_client.listed) == 1 + 2 + 4
+
+
+def test_walk_prefixes_stops_at_max_prefixes():
+    keys = [f"logs/{first}/{second}/object" for first in 'abcdef' for second in 'xyz']
+    s3_client = StubS3(keys=keys)
+    discovery = BucketDiscovery(lambda region: s3_client)
+    found = discovery.walk_prefixes('logs-bucket', prefix='logs/', max_depth=5, max_prefixes=4)
+    assert found == ['logs/a/', 'logs/b/', 'logs/c/', 'logs/d/']
+    # 첫 단계에서 이미 한도를 넘었으므로 더 깊이 조회하지 않음
+    assert s3_client.listed == ['logs/']
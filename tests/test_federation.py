@@ -0,0 +1,149 @@
+import math
+import random
+import re
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip('botocore')
+
+import federation  # noqa: E402
+from federation import _HLL_SQL, HLL_PRECISION, FederatedQueryRunner, ResultMerger  # noqa: E402
+from query_results import ResultBatch  # noqa: E402
+from sketches import HyperLogLog  # noqa: E402
+
+
+def _batch(column_names, rows):
+    columns = {name: [row[position] for row in rows] for position, name in enumerate(column_names)}
+    return ResultBatch(column_names, ['varchar'] * len(column_names), columns)
+
+
+def _sql_to_python(expression):
+    for sql, python in (('CAST(', '('), (' AS INTEGER)', ')'), ('<>', '!='), (' = ', ' == ')):
+        expression = expression.replace(sql, python)
+    return compile(expression, '<sql>', 'eval')
+
+
+def _hll_sql_functions():
+    """_HLL_SQL의 bucket_index/register_rank 식을 Python으로 옮긴 계산 함수 (Athena와 같이 double log2)"""
+    bucket = re.search(r'SELECT (bitwise_right_shift\(h, \d+\)) AS bucket_index', _HLL_SQL).group(1)
+    case = re.search(r'CASE(.*?)END AS register_rank', _HLL_SQL, re.S).group(1)
+    branches = [(_sql_to_python(condition), _sql_to_python(value))
+                for condition, value in re.findall(r'WHEN (.*?)\s+THEN (.*?)\s+(?=WHEN|ELSE)', case, re.S)]
+    default = _sql_to_python(re.search(r'ELSE (.*?)\s*$', case, re.S).group(1))
+    bucket = _sql_to_python(bucket)
+    names = {'bitwise_right_shift': lambda value, shift: value >> shift,
+             'bitwise_and': lambda value, mask: value & mask,
+             'log2': lambda value: math.log2(float(value)), 'floor': math.floor}
+
+    def register(h):
+        scope = dict(names, h=h)
+        for condition, value in branches:
+            if eval(condition, scope):
+                return eval(bucket, scope), eval(value, scope)
+        return eval(bucket, scope), eval(default, scope)
+    return register
+
+
+sql_register = _hll_sql_functions()
+
+
+def test_sql_rank_matches_python_sketch():
+    rng = random.Random(7)
+    hashes = [rng.getrandbits(64) for _ in range(5000)]
+    # 나머지 상위 40비트가 0인 경우, 나머지 전체가 0인 경우, 큰 값의 log2 경계
+    hashes += [5 << 50, (5 << 50) | 1, (5 << 50) | 1023, 5 << 50 | (1 << 10), (1 << 64) - 1,
+               (1 << 50) - 1, (1 << 49), (1 << 50) - (1 << 10)]
+    for h in hashes:
+        sketch = HyperLogLog(HLL_PRECISION)
+        sketch.add_hash(h)
+        index, rank = sql_register(h)
+        assert sketch.registers[index] == rank, hex(h)
+
+
+def test_sum_merge_adds_partials():
+    merger = ResultMerger('Requests by HTTP status')
+    columns = ['httpstatus', 'requests', 'bytes_sent']
+    merger.add([_batch(columns, [('200', 10, 1000), ('404', 2, None)])])
+    merger.add([_batch(columns, [('200', 5, 500)]), _batch(columns, [('503', 3, 0), ('404', 1, 10)])])
+    assert merger.partials == 2
+    assert merger.result() == [
+        {'httpstatus': '200', 'requests': 15, 'bytes_sent': 1500},
+        {'httpstatus': '404', 'requests': 3, 'bytes_sent': 10},
+        {'httpstatus': '503', 'requests': 3, 'bytes_sent': 0},
+    ]
+
+
+def test_top_merge_reranks_overlapping_candidates():
+    merger = ResultMerger('Top client IPs', limit=2)
+    columns = ['remoteip', 'requests', 'bytes_sent']
+    merger.add([_batch(columns, [('a', 10, 1), ('b', 8, 2), ('c', 2, 3)])])
+    merger.add([_batch(columns, [('b', 5, 4), ('c', 9, 5), ('d', 7, 6)])])
+    # 어느 리전에서도 1위가 아닌 b가 합계로는 1위
+    assert merger.result() == [
+        {'remoteip': 'b', 'requests': 13, 'bytes_sent': 6},
+        {'remoteip': 'c', 'requests': 11, 'bytes_sent': 8},
+    ]
+
+
+def test_hll_merge_takes_register_max():
+    rng = random.Random(3)
+    regions = [[rng.getrandbits(64) for _ in range(3000)] for _ in range(3)]
+    merger = ResultMerger('Distinct client IPs')
+    expected = HyperLogLog(HLL_PRECISION)
+    for hashes in regions:
+        registers = {}
+        for h in hashes:
+            index, rank = sql_register(h)
+            registers[index] = max(registers.get(index, 0), rank)
+            expected.add_hash(h)
+        merger.add([_batch(['bucket_index', 'register_rank'], sorted(registers.items()))])
+    assert merger.sketch.registers == expected.registers
+    assert merger.result()[0]['distinct'] == pytest.approx(9000, rel=0.05)
+
+
+class StubSts:
+    def __init__(self, now):
+        self.now = now
+        self.calls = 0
+
+    def assume_role(self, **params):
+        self.calls += 1
+        return {'Credentials': {
+            'AccessKeyId': f"AKIA{self.calls}", 'SecretAccessKey': 'secret', 'SessionToken': 'token',
+            'Expiration': datetime.fromtimestamp(self.now[0] + 3600, timezone.utc),
+        }}
+
+
+class StubPool:
+    def __init__(self, sts_client):
+        self.sts_client = sts_client
+        self.cleared = []
+
+    def client(self, service_name, region_name, **credentials):
+        assert service_name == 'sts'
+        return self.sts_client
+
+    def clear(self, **credentials):
+        self.cleared.append(credentials['aws_access_key_id'])
+
+
+def test_assumed_role_is_cached_until_near_expiration(monkeypatch):
+    now = [1000000.0]
+    monkeypatch.setattr(federation.time, 'time', lambda: now[0])
+    sts_client = StubSts(now)
+    pool = StubPool(sts_client)
+    runner = FederatedQueryRunner(pool, accounts=[{'role_arn': 'arn:aws:iam::111122223333:role/Logs'}])
+    account = runner.accounts[0]
+
+    first = runner.credentials_for(account)
+    assert first['aws_access_key_id'] == 'AKIA1'
+    now[0] += 3600 - federation.CREDENTIAL_REFRESH_MARGIN - 1
+    assert runner.credentials_for(account) is first
+    assert sts_client.calls == 1
+
+    # 만료 여유 안으로 들어오면 다시 AssumeRole 하고 이전 자격 증명의 클라이언트 제거
+    now[0] += 2
+    assert runner.credentials_for(account)['aws_access_key_id'] == 'AKIA2'
+    assert pool.cleared == ['AKIA1']
+    assert runner.credentials_for({}) == {}
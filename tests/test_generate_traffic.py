@@ -0,0 +1,142 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import generate_traffic
+from generate_traffic import FAULT_PREFIX, OTHER_ACCOUNT_ID, KeySpace, TrafficGenerator
+
+FAULT_EVENT = 'before-send.s3.PutObject'
+
+
+class FakeEvents:
+    def __init__(self):
+        self.handlers = {}
+
+    def register(self, event_name, handler):
+        self.handlers[event_name] = handler
+
+
+class FakeError(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.response = {'ResponseMetadata': {'HTTPStatusCode': status}}
+
+
+class FakeS3:
+    """요청 종류만 기록하는 S3 클라이언트
+
+    헤더 훅이 등록된 클라이언트의 5xx용 PUT은 501로 실패 (ignore_faults이면 헤더를 무시하고 성공)
+    """
+
+    def __init__(self, ignore_faults=False, delay=0):
+        self.meta = SimpleNamespace(events=FakeEvents())
+        self.calls = Counter()
+        self.deleted = []
+        self.ignore_faults = ignore_faults
+        self.delay = delay
+
+    def _call(self, name, params):
+        kind = '403' if params.get('ExpectedBucketOwner') == OTHER_ACCOUNT_ID else \
+            '404' if params['Key'].startswith('missing/') else \
+            '5xx' if params['Key'].startswith(FAULT_PREFIX) else 'ok'
+        self.calls[(name, kind)] += 1
+        time.sleep(self.delay)
+        if kind == '5xx' and FAULT_EVENT in self.meta.events.handlers and not self.ignore_faults:
+            raise FakeError(501)
+        return {'Body': SimpleNamespace(read=lambda: b'')}
+
+    def get_object(self, **params):
+        return self._call('get', params)
+
+    def head_object(self, **params):
+        return self._call('head', params)
+
+    def put_object(self, **params):
+        return self._call('put', params)
+
+    def delete_object(self, Bucket, Key):
+        self.deleted.append(Key)
+
+
+def test_error_requests_mix_404_403_and_5xx():
+    s3_client, fault_client = FakeS3(), FakeS3()
+    generator = TrafficGenerator(s3_client, 'bucket', KeySpace(100), error_ratio=0.5, seed=1,
+                                 fault_client=fault_client)
+    results = generator.run(rate=1e9, requests=4000, concurrency=4)
+    kinds = Counter()
+    for (name, kind), count in (s3_client.calls + fault_client.calls).items():
+        kinds[kind] += count
+    assert sum(kinds.values()) == 4000
+    assert kinds['404'] > kinds['403'] > kinds['5xx'] > 0
+    # 5xx 요청은 전용 클라이언트의 PUT으로만 보냄
+    assert not any(name == 'put' for name, _ in s3_client.calls)
+    assert fault_client.calls == Counter({('put', '5xx'): kinds['5xx']})
+    assert results['PUT 501'] == kinds['5xx']
+
+
+def test_fault_header_hook_only_on_fault_client():
+    s3_client, fault_client = FakeS3(), FakeS3()
+    TrafficGenerator(s3_client, 'bucket', KeySpace(10), fault_client=fault_client)
+    assert FAULT_EVENT not in s3_client.meta.events.handlers
+    handler = fault_client.meta.events.handlers[FAULT_EVENT]
+    fault = SimpleNamespace(url=f"https://bucket.s3.amazonaws.com/{FAULT_PREFIX}a.txt", headers={})
+    normal = SimpleNamespace(url="https://bucket.s3.amazonaws.com/folder0/file1.txt", headers={})
+    handler(request=fault)
+    handler(request=normal)
+    assert 'Transfer-Encoding' in fault.headers
+    assert normal.headers == {}
+
+
+def test_fault_requests_skipped_when_endpoint_answers_2xx():
+    fault_client = FakeS3(ignore_faults=True)
+    generator = TrafficGenerator(FakeS3(), 'bucket', KeySpace(10), error_ratio=1.0, seed=2,
+                                 fault_client=fault_client)
+    results = generator.run(rate=1e9, requests=500, concurrency=1)
+    # 첫 5xx 요청이 저장되면 객체를 지우고 이후 5xx 요청은 보내지 않음
+    assert generator.fault_ignored
+    assert results['PUT 200 (fault ignored)'] == 1
+    assert results['PUT 5xx skipped'] > 0
+    assert len(fault_client.deleted) == 1 and fault_client.deleted[0].startswith(FAULT_PREFIX)
+    assert sum(fault_client.calls.values()) == 1
+
+    # 전용 클라이언트가 없으면 5xx 요청은 모두 건너뜀
+    generator = TrafficGenerator(FakeS3(), 'bucket', KeySpace(10), error_ratio=1.0, seed=2)
+    results = generator.run(rate=1e9, requests=500, concurrency=2)
+    assert results['PUT 5xx skipped'] > 0
+    assert not any(outcome.startswith('PUT') and 'skipped' not in outcome for outcome in results)
+
+
+def test_backlog_is_bounded_and_late_requests_counted(monkeypatch):
+    peak = [0]
+    outstanding = [0]
+    lock = threading.Lock()
+
+    class CountingExecutor(ThreadPoolExecutor):
+        """제출 후 끝나지 않은 작업 수의 최대값 기록"""
+
+        def submit(self, *args, **kwargs):
+            with lock:
+                outstanding[0] += 1
+                peak[0] = max(peak[0], outstanding[0])
+            future = super().submit(*args, **kwargs)
+            future.add_done_callback(lambda _: self._done())
+            return future
+
+        def _done(self):
+            with lock:
+                outstanding[0] -= 1
+
+    monkeypatch.setattr(generate_traffic, 'ThreadPoolExecutor', CountingExecutor)
+    generator = TrafficGenerator(FakeS3(delay=0.002), 'bucket', KeySpace(10), error_ratio=0, seed=3)
+    # 엔드포인트가 처리할 수 있는 것보다 훨씬 높은 요청률
+    results = generator.run(rate=100000, requests=400, concurrency=2)
+    assert sum(results.values()) == 400
+    assert peak[0] <= 2 * 2
+    assert generator.late > 0
+    assert generator.max_lag > generate_traffic.LATE_SECONDS
+
+    generator = TrafficGenerator(FakeS3(), 'bucket', KeySpace(10), error_ratio=0, seed=3)
+    generator.run(rate=200, requests=20, concurrency=4)
+    assert generator.late == 0
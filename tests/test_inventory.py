@@ -0,0 +1,146 @@
+import gzip
+import io
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from inventory import ATHENA_MIN_BYTES, InventoryScanner, LogInventory, estimate_query_costs
+
+DATED_BASE = 'logs/123456789012/us-east-1/source-bucket/'
+
+
+class StubS3:
+    """list_objects_v2(MaxKeys/Delimiter/StartAfter 페이지네이션)와 get_object만 흉내 내는 S3 모의 객체"""
+
+    def __init__(self, objects, page_size=7):
+        self.objects = objects
+        self.page_size = page_size
+
+    def _keys(self, Bucket, Prefix, StartAfter=None):
+        return sorted(key for (bucket, key) in self.objects
+                      if bucket == Bucket and key.startswith(Prefix) and key > (StartAfter or ''))
+
+    def list_objects_v2(self, Bucket, Prefix, MaxKeys=1000, Delimiter=None):
+        keys = self._keys(Bucket, Prefix)
+        if Delimiter:
+            prefixes = sorted({Prefix + key[len(Prefix):].split(Delimiter)[0] + Delimiter
+                               for key in keys if Delimiter in key[len(Prefix):]})
+            return {'CommonPrefixes': [{'Prefix': prefix} for prefix in prefixes]}
+        return {'Contents': [self._object(Bucket, key) for key in keys[:MaxKeys]]}
+
+    def _object(self, bucket_name, key):
+        return {'Key': key, 'Size': len(self.objects[bucket_name, key]),
+                'LastModified': datetime(2024, 1, 1, tzinfo=timezone.utc)}
+
+    def get_paginator(self, name):
+        assert name == 'list_objects_v2'
+        return self
+
+    def paginate(self, Bucket, Prefix, StartAfter=None):
+        keys = self._keys(Bucket, Prefix, StartAfter)
+        for start in range(0, len(keys), self.page_size):
+            yield {'Contents': [self._object(Bucket, key) for key in keys[start:start + self.page_size]]}
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(self.objects[Bucket, Key])}
+
+
+def _recent_days(count):
+    today = date.today()
+    return [today - timedelta(days=offset) for offset in range(count - 1, -1, -1)]
+
+
+def _layouts():
+    days = _recent_days(90)
+    return {
+        'date_partitioned': [f"{DATED_BASE}{day:%Y/%m/%d}/{day:%Y-%m-%d}-{hour:02d}-00-00-ABCD"
+                             for day in days for hour in (0, 12, 23)],
+        'simple_date': [f"logs/{day:%Y-%m-%d}-{hour:02d}-00-00-ABCD" for day in days for hour in (0, 23)],
+        'flat': [f"logs/{folder}/{name}" for folder in ('a', 'b', 'b.d', 'c', 'zz') for name in ('1', '2', '3')]
+                + ['logs/b', 'logs/b.log', 'logs/top.log'],
+    }
+
+
+@pytest.mark.parametrize('layout', ['date_partitioned', 'simple_date', 'flat'])
+def test_shard_ranges_cover_every_key_once(layout):
+    keys = _layouts()[layout]
+    objects = {('logs-bucket', key): b'x' * (index % 5 + 1) for index, key in enumerate(keys)}
+    objects['logs-bucket', 'other/2024-01-01-00-00-00-ABCD'] = b'x'
+    s3_client = StubS3(objects)
+    scanner = InventoryScanner(s3_client, max_workers=4, shards=8)
+
+    ranges = scanner._key_ranges('logs-bucket', 'logs/')
+    assert len(ranges) > 1
+    inventory = scanner.scan('logs-bucket', 'logs/')
+    assert inventory.objects == len(keys)
+    assert inventory.bytes == sum(index % 5 + 1 for index in range(len(keys)))
+    # (lower, upper] 범위들이 겹치거나 빈틈 없이 모든 키를 정확히 한 번씩 포함
+    covering = [sum(1 for lower, upper in ranges
+                    if (lower is None or key > lower) and (upper is None or key <= upper)) for key in keys]
+    assert covering == [1] * len(keys)
+
+
+def test_empty_prefix_has_no_ranges():
+    scanner = InventoryScanner(StubS3({}))
+    assert scanner._key_ranges('logs-bucket', 'logs/') == []
+    assert scanner.scan('logs-bucket', 'logs/').objects == 0
+
+
+def _gzip_csv(rows):
+    text = ''.join(','.join(f'"{value}"' for value in row) + '\n' for row in rows)
+    return gzip.compress(text.encode())
+
+
+def test_manifest_csv_parse():
+    manifest = {
+        'sourceBucket': 'source-bucket',
+        'destinationBucket': 'arn:aws:s3:::inventory-bucket',
+        'fileFormat': 'CSV',
+        'fileSchema': 'Bucket, Key, Size, LastModifiedDate',
+        'files': [{'key': 'inventory/data/1.csv.gz'}, {'key': 'inventory/data/2.csv.gz'}],
+    }
+    objects = {
+        ('inventory-bucket', 'inventory/manifest.json'): json.dumps(manifest).encode(),
+        ('inventory-bucket', 'inventory/data/1.csv.gz'): _gzip_csv([
+            ('logs-bucket', 'logs/2024-01-02-00-00-00-ABCD', '100', '2024-01-02T00:10:00.000Z'),
+            # URL 인코딩된 키
+            ('logs-bucket', 'logs/2024-01-02-01-00-00-A%20B', '50', '2024-01-02T01:10:00.000Z'),
+            ('other-bucket', 'logs/2024-01-02-00-00-00-ABCD', '999', '2024-01-02T00:10:00.000Z'),
+        ]),
+        ('inventory-bucket', 'inventory/data/2.csv.gz'): _gzip_csv([
+            ('logs-bucket', 'logs/flat.log', '', '2024-01-05T23:59:00.000Z'),
+            ('logs-bucket', 'archive/2024-01-02-00-00-00-ABCD', '7', ''),
+            ('logs-bucket', 'logs/no-date.log', '25', ''),
+        ]),
+    }
+    scanner = InventoryScanner(StubS3(objects), max_workers=2)
+    inventory = scanner.scan_manifest('s3://inventory-bucket/inventory/manifest.json', 'logs-bucket', 'logs/')
+    assert inventory.to_dict() == {
+        'source': 'inventory',
+        'objects': 4,
+        'bytes': 175,
+        'days': {
+            '2024-01-02': {'objects': 2, 'bytes': 150},
+            # 키에 날짜가 없으면 LastModifiedDate, 그것도 없으면 unknown
+            '2024-01-05': {'objects': 1, 'bytes': 0},
+            'unknown': {'objects': 1, 'bytes': 25},
+        },
+    }
+
+    manifest['fileFormat'] = 'Parquet'
+    objects['inventory-bucket', 'inventory/manifest.json'] = json.dumps(manifest).encode()
+    with pytest.raises(ValueError):
+        scanner.scan_manifest('s3://inventory-bucket/inventory/manifest.json', 'logs-bucket', 'logs/')
+
+
+def test_cost_estimate_by_table_kind():
+    inventory = LogInventory()
+    for day, size in [('2024-01-01', 3 * 1024 ** 3), ('2024-01-02', 1024 ** 3), ('2024-01-03', 1024)]:
+        inventory.add(f"logs/{day}-00-00-00-ABCD", size)
+    raw, partitioned = estimate_query_costs(inventory, days=2, price_per_tb=5.0)
+    assert (raw['table'], raw['days'], raw['bytes']) == ('raw', 3, 4 * 1024 ** 3 + 1024)
+    assert raw['cost'] == pytest.approx((4 * 1024 ** 3 + 1024) / 1024 ** 4 * 5.0)
+    assert (partitioned['table'], partitioned['days'], partitioned['bytes']) == ('partitioned', 2, 1024 ** 3 + 1024)
+    # 최소 과금 10MB
+    assert estimate_query_costs(inventory, days=1)[1]['cost'] == pytest.approx(ATHENA_MIN_BYTES / 1024 ** 4 * 5.0)
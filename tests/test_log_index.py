@@ -0,0 +1,75 @@
+from datetime import datetime, timezone
+
+import pytest
+
+pytest.importorskip('botocore')
+
+from log_index import LogObjectIndex, lookback_key  # noqa: E402
+
+DAY_PREFIX = 'logs/123456789012/us-east-1/source-bucket/'
+
+
+class StubS3:
+    """list_objects_v2(StartAfter)만 흉내 내는 S3 모의 객체"""
+
+    def __init__(self, keys=()):
+        self.objects = {key: 100 for key in keys}
+        self.start_afters = []
+
+    def get_paginator(self, name):
+        assert name == 'list_objects_v2'
+        return self
+
+    def paginate(self, Bucket, Prefix, StartAfter=None):
+        self.start_afters.append(StartAfter)
+        keys = sorted(key for key in self.objects if key.startswith(Prefix) and key > (StartAfter or ''))
+        yield {'Contents': [{'Key': key, 'Size': self.objects[key], 'ETag': '"etag"',
+                             'LastModified': datetime(2024, 1, 2, tzinfo=timezone.utc)} for key in keys]}
+
+
+def _dated(day, time, suffix):
+    return f"{DAY_PREFIX}{day.replace('-', '/')}/{day}-{time}-{suffix}"
+
+
+@pytest.mark.parametrize('key, expected', [
+    ('logs/2024-01-02-10-05-00-ABCD', 'logs/2024-01-02-09-50-00'),
+    ('logs/2024-01-02-00-05-00-ABCD', 'logs/2024-01-01-23-50-00'),
+    (_dated('2024-01-02', '10-05-00', 'ABCD'), f"{DAY_PREFIX}2024/01/02/2024-01-02-09-50-00"),
+    # 자정 직후이면 날짜 폴더도 전날로
+    (_dated('2024-01-02', '00-05-00', 'ABCD'), f"{DAY_PREFIX}2024/01/01/2024-01-01-23-50-00"),
+    (_dated('2024-03-01', '00-10-00', 'ABCD'), f"{DAY_PREFIX}2024/02/29/2024-02-29-23-55-00"),
+    ('logs/no-timestamp.log', 'logs/no-timestamp.log'),
+])
+def test_lookback_key(key, expected):
+    assert lookback_key(key, 15) == expected
+
+
+def test_sync_relists_previous_day_folder_after_midnight(tmp_path):
+    s3_client = StubS3([_dated('2024-01-01', '23-40-00', 'A'), _dated('2024-01-02', '00-05-00', 'B')])
+    index = LogObjectIndex(str(tmp_path / 'index.sqlite'))
+    assert index.sync(s3_client, 'logs', DAY_PREFIX) == sorted(s3_client.objects)
+    assert index.watermark('logs', DAY_PREFIX) == _dated('2024-01-02', '00-05-00', 'B')
+
+    # 전날 폴더에 늦게 올라온 객체와 오늘 새 객체
+    late, new = _dated('2024-01-01', '23-55-00', 'C'), _dated('2024-01-02', '00-20-00', 'D')
+    s3_client.objects.update({late: 100, new: 100})
+    assert index.sync(s3_client, 'logs', DAY_PREFIX) == [late, new]
+    assert s3_client.start_afters == [None, f"{DAY_PREFIX}2024/01/01/2024-01-01-23-50-00"]
+    assert index.watermark('logs', DAY_PREFIX) == new
+    # 변경이 없으면 새 객체도 없음
+    assert index.sync(s3_client, 'logs', DAY_PREFIX) == []
+
+
+def test_pending_objects_until_processed(tmp_path):
+    keys = ['app/2024-01-01-00-00-00-A', 'app/2024-01-01-01-00-00-B', 'other/2024-01-01-00-00-00-C']
+    s3_client = StubS3(keys)
+    index = LogObjectIndex(str(tmp_path / 'index.sqlite'))
+    index.sync(s3_client, 'logs', 'app/')
+    index.sync(s3_client, 'logs', 'other/')
+    assert index.pending_objects('logs', 'app/') == [(keys[0], 100), (keys[1], 100)]
+
+    index.mark_processed('logs', keys[0], '2024-01-01 00:00:00', '2024-01-01 00:59:59', 10)
+    assert index.pending_keys('logs', 'app/') == [keys[1]]
+    assert index.pending_keys('logs') == [keys[1], keys[2]]
+    assert index.objects_in_window('logs', '2024-01-01 00:30:00', '2024-01-01 02:00:00') == [keys[0]]
+    assert index.stats('logs', 'app/')['processed'] == 1
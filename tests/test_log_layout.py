@@ -0,0 +1,73 @@
+import pytest
+
+from log_layout import (
+    LAYOUT_DATE_PARTITIONED, LAYOUT_FLAT, LAYOUT_SIMPLE_DATE, date_predicate, day_location, detect_layout,
+    has_dated_keys, is_partitioned, projection_properties,
+)
+
+DATE_PARTITIONED_KEYS = [
+    'logs/123456789012/us-east-1/app/2024/01/02/2024-01-02-00-00-00-AAAA',
+    'logs/123456789012/us-east-1/app/2024/01/03/2024-01-03-10-00-00-BBBB',
+]
+SIMPLE_DATE_KEYS = ['logs/2024-01-02-00-00-00-AAAA', 'logs/2024-01-03-10-00-00-BBBB']
+
+
+def test_date_partitioned_layout_uses_folder_projection():
+    layout = detect_layout('bucket', DATE_PARTITIONED_KEYS)
+    assert layout['layout'] == LAYOUT_DATE_PARTITIONED
+    assert is_partitioned(layout)
+    assert layout['location'] == 's3://bucket/logs/123456789012/us-east-1/app/'
+    assert layout['start_date'] == '2024/01/02'
+    properties = projection_properties(layout)
+    assert properties['storage.location.template'] == 's3://bucket/logs/123456789012/us-east-1/app/${log_date}'
+    assert day_location(layout, '2024-01-03').endswith('/app/2024/01/03')
+    assert date_predicate(layout, '2024-01-03') == "log_date >= '2024/01/03'"
+
+
+def test_simple_date_layout_is_not_projected():
+    layout = detect_layout('bucket', SIMPLE_DATE_KEYS)
+    assert layout['layout'] == LAYOUT_SIMPLE_DATE
+    # 날짜가 파일 이름 접두사라 Athena 파티션 위치(폴더)로 쓸 수 없음
+    assert not is_partitioned(layout)
+    assert date_predicate(layout, '2024-01-03') == ''
+    # 날짜별 목록 조회 접두사로는 사용 가능
+    assert has_dated_keys(layout)
+    assert day_location(layout, '2024-01-03') == 's3://bucket/logs/2024-01-03'
+
+
+@pytest.mark.parametrize('keys', [
+    ['logs/access.log'],
+    SIMPLE_DATE_KEYS + ['other/2024-01-02-00-00-00-CCCC'],
+    [],
+])
+def test_mixed_or_unknown_keys_are_flat(keys):
+    assert detect_layout('bucket', keys) == {'layout': LAYOUT_FLAT}
+
+
+def _mock_aws():
+    moto = pytest.importorskip('moto')
+    if not hasattr(moto, 'mock_aws'):
+        pytest.skip('moto >= 5 required')
+    return moto.mock_aws()
+
+
+@pytest.mark.parametrize('keys, projected', [(DATE_PARTITIONED_KEYS, True), (SIMPLE_DATE_KEYS, False)])
+def test_layout_detection_against_mocked_s3(monkeypatch, keys, projected):
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    with _mock_aws():
+        import boto3
+        from provisioning import GlueProvisioner, access_log_table_input
+
+        s3_client = boto3.client('s3', region_name='us-east-1')
+        s3_client.create_bucket(Bucket='bucket')
+        for key in keys:
+            s3_client.put_object(Bucket='bucket', Key=key, Body=b'')
+        provisioner = GlueProvisioner(boto3.client('glue', region_name='us-east-1'), s3_client)
+        layout = provisioner.detect_layout('s3://bucket/logs/')
+        table_input = access_log_table_input('logs', 's3://bucket/logs/', layout)
+
+        assert bool(table_input['PartitionKeys']) == projected
+        assert ('projection.enabled' in table_input['Parameters']) == projected
+        if not projected:
+            assert table_input['StorageDescriptor']['Location'] == 's3://bucket/logs/'
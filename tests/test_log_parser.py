@@ -0,0 +1,32 @@
+from generate_traffic import LogLineGenerator
+from log_parser import parse_text
+
+VERSIONED_LINE = (
+    '79a59df900b949e55d96a1e698fbacedfd6e09d98eacf8f8d5218e7cd47ef2be awsexamplebucket1 '
+    '[06/Feb/2019:00:00:38 +0000] 192.0.2.3 79a59df900b949e55d96a1e698fbacedfd6e09d98eacf8f8d5218e7cd47ef2be '
+    '3E57427F3EXAMPLE REST.GET.VERSIONING - "GET /awsexamplebucket1?versioning HTTP/1.1" 200 - 113 - 7 - '
+    '"-" "S3Console/0.4" 3HL4kqtJvjVBH40Nrjfkd '
+    's9lzHYrFp76ZVxRcpX9+5cjAnEH2ROuNkd2BHfIa6UkFVdtjf5mKR3/eTPFvsiP/XV/VLi31234= SigV2 '
+    'ECDHE-RSA-AES128-GCM-SHA256 AuthHeader awsexamplebucket1.s3.us-west-1.amazonaws.com TLSV1.2 - -\n'
+)
+
+
+def test_versioned_line_is_parsed():
+    batch = parse_text(VERSIONED_LINE)
+    assert (batch.num_rows, batch.invalid_lines) == (1, 0)
+    assert batch.columns['versionid'] == ['3HL4kqtJvjVBH40Nrjfkd']
+    assert batch.columns['sigv'] == ['SigV2']
+
+
+def test_legacy_line_without_optional_fields():
+    line = VERSIONED_LINE.split(' 3HL4kqtJvjVBH40Nrjfkd ')[0] + ' -\n'
+    batch = parse_text(line)
+    assert (batch.num_rows, batch.invalid_lines) == (1, 0)
+    assert batch.columns['versionid'] == ['-']
+    assert batch.columns['hostid'] == [None]
+
+
+def test_synthetic_corpus_has_no_invalid_lines():
+    batch = parse_text(''.join(LogLineGenerator(seed=1).lines(2000)))
+    assert (batch.num_rows, batch.invalid_lines) == (2000, 0)
+    assert any(value != '-' for value in batch.columns['versionid'])
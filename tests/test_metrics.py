@@ -0,0 +1,131 @@
+import json
+
+import pytest
+
+from metrics import MetricsRecorder, query_label
+
+
+def _response(query, statistics=None, statement_type='DML', workgroup='primary'):
+    execution = {'Query': query, 'StatementType': statement_type, 'WorkGroup': workgroup}
+    if statistics is not None:
+        execution['Statistics'] = statistics
+    return {'QueryExecution': execution}
+
+
+@pytest.mark.parametrize('sql, label', [
+    ('SELECT * FROM s3_logs.access_logs LIMIT 10', 's3_logs.access_logs'),
+    ('select count(*)\nfrom   S3_Logs.Access_Logs where httpstatus = 404', 's3_logs.access_logs'),
+    ('SELECT status, SUM(requests) FROM (\n  SELECT * FROM db.access_logs_hourly_status\n) AS combined',
+     'db.access_logs_hourly_status'),
+    ('SELECT * FROM "db"."access_logs"', 'db.access_logs'),
+    ('INSERT INTO db.compacted SELECT * FROM db.raw', 'db.compacted'),
+    ('CREATE EXTERNAL TABLE IF NOT EXISTS `db.access_logs`(\n  bucketowner STRING)', 'db.access_logs'),
+    ('CREATE DATABASE IF NOT EXISTS s3_logs', 's3_logs'),
+    ('DROP TABLE IF EXISTS db.old', 'db.old'),
+    ('MSCK REPAIR TABLE db.access_logs', 'db.access_logs'),
+    ('SHOW DATABASES', 'other'),
+    ('SELECT 1', 'other'),
+    (None, 'other'),
+])
+def test_query_label(sql, label):
+    assert query_label(sql) == label
+
+
+def test_record_query_maps_statistics_and_polling_overhead(tmp_path):
+    path = tmp_path / 'metrics' / 'metrics.jsonl'
+    recorder = MetricsRecorder(jsonl_path=str(path))
+    statistics = {
+        'DataScannedInBytes': 1024 ** 4,
+        'EngineExecutionTimeInMillis': 900,
+        'QueryQueueTimeInMillis': 150,
+        'QueryPlanningTimeInMillis': 40,
+        'ServiceProcessingTimeInMillis': 30,
+        'TotalExecutionTimeInMillis': 1200,
+        'ResultReuseInformation': {'ReusedPreviousResult': True},
+    }
+    record = recorder.record_query('query-1', 'SUCCEEDED', _response('SELECT * FROM db.logs', statistics),
+                                   wall_seconds=1.5, polls=4, poll_seconds=0.08)
+    assert {name: record[name] for name in [
+        'query_execution_id', 'status', 'label', 'statement_type', 'workgroup', 'reused_result', 'wall_ms',
+        'polls', 'poll_api_ms', 'data_scanned_bytes', 'engine_execution_ms', 'queue_ms', 'planning_ms',
+        'service_processing_ms', 'total_execution_ms', 'polling_overhead_ms',
+    ]} == {
+        'query_execution_id': 'query-1', 'status': 'SUCCEEDED', 'label': 'db.logs', 'statement_type': 'DML',
+        'workgroup': 'primary', 'reused_result': True, 'wall_ms': 1500, 'polls': 4, 'poll_api_ms': 80,
+        'data_scanned_bytes': 1024 ** 4, 'engine_execution_ms': 900, 'queue_ms': 150, 'planning_ms': 40,
+        'service_processing_ms': 30, 'total_execution_ms': 1200,
+        # 클라이언트 대기 1500ms 중 Athena 총 실행 1200ms를 넘는 부분
+        'polling_overhead_ms': 300,
+    }
+    assert record['cost_usd'] == pytest.approx(5.0)
+
+    # 클라이언트가 더 짧게 기다린 것으로 측정되어도 음수가 되지 않음
+    faster = recorder.record_query('query-2', 'SUCCEEDED', _response('SELECT * FROM db.logs', statistics),
+                                   wall_seconds=1.0, polls=1, poll_seconds=0.01)
+    assert faster['polling_overhead_ms'] == 0
+    # 통계가 없으면(실패/취소) 계산하지 않음
+    failed = recorder.record_query('query-3', 'FAILED', None, wall_seconds=0.2, polls=1, poll_seconds=0.01)
+    assert (failed['label'], failed['statement_type']) == ('other', 'UNKNOWN')
+    assert (failed['total_execution_ms'], failed['polling_overhead_ms'], failed['cost_usd']) == (None, None, 0.0)
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line['query_execution_id'] for line in lines] == ['query-1', 'query-2', 'query-3']
+    summary = recorder.summary_by_label()['db.logs']
+    assert (summary['queries'], summary['avg_polling_overhead_ms'], summary['avg_queue_ms']) == (2, 150, 150)
+
+
+def test_listing_context_records_errors():
+    recorder = MetricsRecorder()
+    with recorder.listing('folders', 'logs-bucket', 'logs/') as result:
+        result['objects'] = 12
+    with pytest.raises(KeyError):
+        with recorder.listing('folders', 'logs-bucket', 'other/'):
+            raise KeyError('boom')
+    records = recorder.listing_records()
+    assert [(record['objects'], record['error']) for record in records] == [(12, None), (None, 'KeyError')]
+    assert recorder.counters['s3_listings_total', (('operation', 'folders'), ('result', 'error'))] == 1
+    assert recorder.counters['s3_listed_items_total', (('operation', 'folders'),)] == 12
+
+
+def test_prometheus_text_format():
+    recorder = MetricsRecorder()
+    statistics = {'DataScannedInBytes': 1000, 'EngineExecutionTimeInMillis': 1500,
+                  'TotalExecutionTimeInMillis': 2000}
+    recorder.record_query('query-1', 'SUCCEEDED', _response('SELECT * FROM db.logs', statistics), 2.25, 3, 0.1)
+    recorder.record_query('query-2', 'FAILED', _response('SELECT * FROM "we""ird".t', statement_type='DDL'),
+                          0.5, 1, 0.01)
+    recorder.record_listing('buckets', None, '', 0.25, objects=3)
+    text = recorder.to_prometheus()
+    lines = text.splitlines()
+    assert text.endswith('\n')
+
+    # 지표 이름마다 TYPE 한 줄이 해당 시계열 앞에 한 번
+    type_lines = [line for line in lines if line.startswith('# TYPE ')]
+    assert all(line.endswith(' counter') for line in type_lines)
+    names = [line.split()[2] for line in type_lines]
+    assert len(names) == len(set(names)) and names == sorted(names)
+    for line in lines:
+        if not line.startswith('#'):
+            name = line.split('{')[0]
+            assert lines.index(f"# TYPE {name} counter") < lines.index(line)
+
+    assert 'athena_queries_total{label="db.logs",statement_type="DML",status="SUCCEEDED"} 1' in lines
+    assert 'athena_queries_total{label="weird.t",statement_type="DDL",status="FAILED"} 1' in lines
+    assert 'athena_data_scanned_bytes_total{label="db.logs",statement_type="DML"} 1000' in lines
+    assert 'athena_engine_execution_seconds_total{label="db.logs",statement_type="DML"} 1.5' in lines
+    assert 'athena_client_wait_seconds_total{label="db.logs",statement_type="DML"} 2.25' in lines
+    assert 'athena_polling_overhead_seconds_total{label="db.logs",statement_type="DML"} 0.25' in lines
+    assert 's3_listing_seconds_total{operation="buckets"} 0.25' in lines
+    assert 's3_listings_total{operation="buckets",result="ok"} 1' in lines
+
+
+def test_prometheus_label_escaping():
+    recorder = MetricsRecorder()
+    recorder._add('custom_total', {'path': 'a"b\\c\nd'}, 2)
+    recorder._add('plain_total', {}, 0.5)
+    assert recorder.to_prometheus() == (
+        '# TYPE custom_total counter\n'
+        'custom_total{path="a\\"b\\\\c\\nd"} 2\n'
+        '# TYPE plain_total counter\n'
+        'plain_total 0.5\n'
+    )
@@ -0,0 +1,171 @@
+import gzip
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+pytest.importorskip('botocore')
+
+from generate_traffic import LogLineGenerator  # noqa: E402
+from object_reader import BufferPool, PrefetchingObjectReader, _GzipStream  # noqa: E402
+
+KB = 1024
+PART_SIZE = 64 * KB
+
+
+class StubS3:
+    """Range 헤더를 지키는 get_object 모의 객체"""
+
+    def __init__(self, objects, blocked=None):
+        self.objects = objects
+        self.requests = []
+        # blocked 키의 요청은 release가 설정될 때까지 대기
+        self.blocked = blocked or set()
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def get_object(self, Bucket, Key, Range=None):
+        with self._lock:
+            self.requests.append((Key, Range))
+        if Key in self.blocked:
+            self.release.wait(5)
+        data = self.objects[Key]
+        if Range:
+            start, end = (int(value) for value in Range[len('bytes='):].split('-'))
+            data = data[start:end + 1]
+        return {'Body': io.BytesIO(data), 'ContentLength': len(data)}
+
+    def listing(self, keys=None):
+        return [(key, len(self.objects[key])) for key in (keys or self.objects)]
+
+
+def _log_bytes(lines, seed=0):
+    return ''.join(LogLineGenerator(seed=seed).lines(lines)).encode()
+
+
+def _track_budget(pool):
+    """try_acquire 호출마다 할당량 최대값 기록"""
+    peak = [0]
+    acquire = pool.try_acquire
+
+    def try_acquire(size):
+        buffer = acquire(size)
+        peak[0] = max(peak[0], pool.allocated)
+        return buffer
+
+    pool.try_acquire = try_acquire
+    return peak
+
+
+def test_pool_reuses_buffers_within_budget():
+    pool = BufferPool(budget_bytes=4 * PART_SIZE, min_size=PART_SIZE)
+    buffers = [pool.try_acquire(PART_SIZE) for _ in range(4)]
+    assert pool.try_acquire(1) is None
+    for buffer in buffers:
+        pool.release(buffer)
+    assert pool.try_acquire(PART_SIZE - 1) is buffers[-1]
+    assert (pool.allocations, pool.reuses) == (4, 1)
+
+
+def test_pool_drops_free_buffers_of_other_classes():
+    pool = BufferPool(budget_bytes=4 * PART_SIZE, min_size=PART_SIZE)
+    for buffer in [pool.try_acquire(PART_SIZE) for _ in range(4)]:
+        pool.release(buffer)
+    large = pool.try_acquire(2 * PART_SIZE)
+    assert len(large) == 2 * PART_SIZE
+    # 64 KB 여유 버퍼 두 개를 버려 128 KB 버퍼 자리를 만듦
+    assert pool.allocated == 4 * PART_SIZE
+    assert len(pool._free[PART_SIZE]) == 2
+    # 같은 등급 여유 버퍼는 버리지 않음
+    assert not pool._drop_free(PART_SIZE)
+    assert pool.try_acquire(4 * PART_SIZE) is None
+
+
+def test_objects_come_back_in_order_within_budget():
+    objects = {f"logs/{index:03d}": bytes([index]) * size for index, size in
+               enumerate([10, 200 * KB, 0, 64 * KB, 3 * KB, 150 * KB, 64 * KB + 1, 7])}
+    s3_client = StubS3(objects)
+    reader = PrefetchingObjectReader(s3_client, prefetch=8, memory_budget=4 * PART_SIZE, part_size=PART_SIZE)
+    peak = _track_budget(reader.pool)
+    received = {}
+    order = []
+    try:
+        for key, view, last in reader.iter_parts('bucket', s3_client.listing()):
+            received[key] = received.get(key, b'') + bytes(view)
+            if last:
+                order.append(key)
+    finally:
+        reader.close()
+    assert order == list(objects)
+    assert received == objects
+    assert peak[0] <= reader.pool.budget_bytes
+    assert reader.pool.reuses > 0
+    assert reader.stats['ranged_objects'] == 3
+    assert sum(1 for _, byte_range in s3_client.requests if byte_range) == 4 + 3 + 2
+
+
+def test_gzip_stream_handles_split_members():
+    first, second = _log_bytes(300, seed=1), _log_bytes(300, seed=2)
+    compressed = gzip.compress(first) + gzip.compress(second)
+    stream = _GzipStream(chunk_size=4 * KB)
+    output = []
+    for index in range(0, len(compressed), 1000):
+        output.extend(stream.feed(compressed[index:index + 1000]))
+    output.extend(stream.flush())
+    assert all(len(chunk) <= 4 * KB for chunk in output)
+    assert b''.join(output) == first + second
+
+
+def test_ranged_multi_member_gzip_object():
+    text = _log_bytes(3000)
+    middle = len(text) // 2
+    objects = {'logs/a.gz': gzip.compress(text[:middle]) + gzip.compress(text[middle:]),
+               'logs/b': b'plain\n'}
+    assert len(objects['logs/a.gz']) > PART_SIZE
+    s3_client = StubS3(objects)
+    reader = PrefetchingObjectReader(s3_client, prefetch=4, memory_budget=4 * PART_SIZE, part_size=PART_SIZE)
+    data = {}
+    try:
+        for key, chunk, _ in reader.iter_data('bucket', s3_client.listing(), chunk_size=16 * KB):
+            data[key] = data.get(key, b'') + bytes(chunk)
+    finally:
+        reader.close()
+    assert data == {'logs/a.gz': text, 'logs/b': b'plain\n'}
+
+
+def test_object_batches_without_trailing_newline_and_empty_object():
+    lines = list(LogLineGenerator(seed=4).lines(5))
+    objects = {
+        'logs/1': ''.join(lines[:3]).rstrip('\n').encode(),
+        'logs/2': b'',
+        'logs/3': ''.join(lines[3:]).encode(),
+    }
+    s3_client = StubS3(objects)
+    reader = PrefetchingObjectReader(s3_client, part_size=PART_SIZE)
+    try:
+        batches = [(key, batch.num_rows, batch.invalid_lines)
+                   for key, batch in reader.iter_object_batches('bucket', s3_client.listing())]
+    finally:
+        reader.close()
+    assert batches == [('logs/1', 3, 0), ('logs/2', 0, 0), ('logs/3', 2, 0)]
+
+
+def test_early_stop_cancels_queued_requests_and_returns_buffers():
+    objects = {f"logs/{index}": b'x\n' * 100 for index in range(6)}
+    s3_client = StubS3(objects, blocked={'logs/1'})
+    reader = PrefetchingObjectReader(s3_client, prefetch=4, part_size=PART_SIZE)
+    # 작업 스레드 하나: logs/1이 막혀 있는 동안 나머지 요청은 대기열에 남음
+    reader._executor = ThreadPoolExecutor(max_workers=1)
+    parts = reader.iter_parts('bucket', s3_client.listing())
+    assert next(parts)[0] == 'logs/0'
+    timer = threading.Timer(0.2, s3_client.release.set)
+    timer.start()
+    try:
+        parts.close()
+    finally:
+        timer.cancel()
+        reader.close()
+    assert [key for key, _ in s3_client.requests] == ['logs/0', 'logs/1']
+    free = sum(len(buffer) for buffers in reader.pool._free.values() for buffer in buffers)
+    assert free == reader.pool.allocated
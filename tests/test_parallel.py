@@ -0,0 +1,39 @@
+import pytest
+
+pytest.importorskip('botocore')
+
+from generate_traffic import LogLineGenerator  # noqa: E402
+from log_parser import parse_text, summarize_stream  # noqa: E402
+from parallel import ParallelLogProcessor, _read_line_range, file_ranges  # noqa: E402
+
+
+@pytest.fixture
+def log_file(tmp_path):
+    lines = list(LogLineGenerator(seed=3).lines(2000))
+    path = tmp_path / 'access.log'
+    path.write_bytes(''.join(lines).encode())
+    return str(path), lines
+
+
+def _serial_rows(path):
+    with open(path, 'rb') as f:
+        return summarize_stream(f).rows
+
+
+@pytest.mark.parametrize('task_bytes', ['line', 4096, 10000, 1 << 30])
+def test_ranges_cover_each_line_once(log_file, task_bytes):
+    path, lines = log_file
+    if task_bytes == 'line':
+        task_bytes = len(lines[0].encode())
+    rows = 0
+    for _, start, end in file_ranges([path], task_bytes):
+        rows += parse_text(_read_line_range(path, start, end).decode()).num_rows
+    assert rows == _serial_rows(path) == len(lines)
+
+
+@pytest.mark.parametrize('task_bytes', [4096, 10000, 1 << 30])
+def test_parallel_matches_serial(log_file, task_bytes):
+    path, lines = log_file
+    aggregate = ParallelLogProcessor(max_workers=2, task_bytes=task_bytes).process_files([path])
+    assert aggregate.summary.rows == _serial_rows(path) == len(lines)
+    assert aggregate.summary.invalid_lines == 0
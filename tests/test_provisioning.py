@@ -0,0 +1,67 @@
+import re
+
+import pytest
+
+pytest.importorskip('botocore')
+
+from log_layout import LAYOUT_DATE_PARTITIONED, LAYOUT_FLAT  # noqa: E402
+from log_parser import COLUMN_NAMES, SERDE_INPUT_REGEX  # noqa: E402
+from provisioning import GlueProvisioner, access_log_table_ddl  # noqa: E402
+
+LAYOUT = {
+    'layout': LAYOUT_DATE_PARTITIONED,
+    'location': 's3://logs/123456789012/us-east-1/app/',
+    'template': 's3://logs/123456789012/us-east-1/app/${log_date}',
+    'date_format': 'yyyy/MM/dd',
+    'start_date': '2024/01/01',
+}
+
+
+def _unescape_sql_literal(value):
+    return re.sub(r"\\(.)", r'\1', value)
+
+
+def test_ddl_uses_shared_serde_regex():
+    ddl = access_log_table_ddl('db', 'logs', 's3://logs/app/')
+    literal = re.search(r"'input\.regex'='((?:\\.|[^'\\])*)'", ddl).group(1)
+    assert _unescape_sql_literal(literal) == SERDE_INPUT_REGEX
+    assert re.findall(r'`(\w+)` (?:STRING|BIGINT)', ddl) == COLUMN_NAMES
+    assert "LOCATION\n          's3://logs/app/'" in ddl
+    assert 'PARTITIONED BY' not in ddl
+
+
+def test_ddl_projection_for_date_partitioned_layout():
+    ddl = access_log_table_ddl('db', 'logs', 's3://logs/', LAYOUT)
+    assert 'PARTITIONED BY (`log_date` STRING)' in ddl
+    assert f"'{LAYOUT['location']}'" in ddl
+    assert "'storage.location.template'='s3://logs/123456789012/us-east-1/app/${log_date}'" in ddl
+
+
+def _mocked_glue(monkeypatch):
+    moto = pytest.importorskip('moto')
+    if not hasattr(moto, 'mock_aws'):
+        pytest.skip('moto >= 5 required')
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    return moto.mock_aws()
+
+
+def test_provision_reports_database_action_against_mocked_glue(monkeypatch):
+    with _mocked_glue(monkeypatch):
+        import boto3
+
+        glue_client = boto3.client('glue', region_name='us-east-1')
+        provisioner = GlueProvisioner(glue_client)
+        spec = {'database': 'db', 'table': 'logs', 'location': 's3://logs/app/',
+                'partitioning': 'projection', 'layout': {'layout': LAYOUT_FLAT}}
+
+        results = provisioner.provision([spec])
+        assert [(r['action'], r['status']) for r in results] == [('create_database', 'OK'), ('create_table', 'OK')]
+        table = glue_client.get_table(DatabaseName='db', Name='logs')['Table']
+        assert table['StorageDescriptor']['SerdeInfo']['Parameters']['input.regex'] == SERDE_INPUT_REGEX
+
+        # 두 번째 실행은 변경 없음 (create_database 결과가 없으면 이미 있는 데이터베이스)
+        assert provisioner.provision([spec]) == []
+
+        results = provisioner.provision([dict(spec, layout=LAYOUT)])
+        assert [(r['action'], r['status']) for r in results] == [('update_table', 'OK')]
@@ -0,0 +1,29 @@
+import time
+
+from query_cache import QueryResultCache, cache_key, normalize_sql, strip_comments
+
+
+def test_normalize_ignores_case_whitespace_and_comments():
+    assert normalize_sql("SELECT  *\n FROM t -- recent\n;") == normalize_sql("select * from t")
+    assert normalize_sql("SELECT /* all */ * FROM t") == "select * from t"
+
+
+def test_comment_markers_inside_literals_are_kept():
+    first = "SELECT * FROM t WHERE key = 'backup--2024.tar'"
+    second = "SELECT * FROM t WHERE key = 'backup--2025.tar'"
+    assert normalize_sql(first) == "select * from t where key = 'backup--2024.tar'"
+    assert cache_key(first) != cache_key(second)
+    sql = "SELECT * FROM t WHERE key LIKE '%/*%' OR key LIKE '%*/%'"
+    assert strip_comments(sql) == sql
+
+
+def test_literal_case_is_preserved():
+    assert normalize_sql("SELECT * FROM t WHERE key = 'A'") != normalize_sql("SELECT * FROM t WHERE key = 'a'")
+
+
+def test_cache_expires_after_ttl():
+    cache = QueryResultCache(ttl=0.01)
+    cache.set('k', [1])
+    assert cache.get('k') == [1]
+    time.sleep(0.02)
+    assert cache.get('k') is None
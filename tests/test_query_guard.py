@@ -0,0 +1,49 @@
+import pytest
+
+pytest.importorskip('botocore')
+
+from log_layout import LAYOUT_DATE_PARTITIONED  # noqa: E402
+from query_guard import bound_query, partition_range  # noqa: E402
+
+LAYOUT = {
+    'layout': LAYOUT_DATE_PARTITIONED,
+    'location': 's3://logs/123456789012/us-east-1/app/',
+    'template': 's3://logs/123456789012/us-east-1/app/${log_date}',
+    'date_format': 'yyyy/MM/dd',
+    'start_date': '2024/01/01',
+}
+
+
+def test_double_dash_inside_literal_is_not_a_comment():
+    sql = "SELECT * FROM logs WHERE key = 'backup--2024.tar' AND httpstatus = '200'"
+    bounded, changes = bound_query(sql, ['logs'], LAYOUT, days=1)
+    assert changes
+    assert "(key = 'backup--2024.tar' AND httpstatus = '200')" in bounded
+
+
+def test_block_comment_markers_inside_literals_are_kept():
+    sql = "SELECT key FROM logs WHERE key LIKE '%/*%' OR key LIKE '%*/%'"
+    bounded, _ = bound_query(sql, ['logs'], LAYOUT, days=1, limit=10)
+    assert "(key LIKE '%/*%' OR key LIKE '%*/%')" in bounded
+    assert bounded.endswith('LIMIT 10')
+
+
+def test_comments_outside_literals_are_removed_before_rewrite():
+    sql = "SELECT * FROM logs -- everything\n"
+    bounded, changes = bound_query(sql, ['logs'], limit=5)
+    assert changes == ['added LIMIT 5']
+    assert 'everything' not in bounded
+    assert bounded.endswith('LIMIT 5')
+
+
+def test_sql_is_returned_unchanged_without_rewrite():
+    sql = "SELECT * FROM logs WHERE log_date = '2024/01/02' -- today\nLIMIT 10;"
+    assert bound_query(sql, ['logs'], LAYOUT, days=1, limit=10) == (sql, [])
+    other = "SHOW TABLES -- 'x'"
+    assert bound_query(other, ['logs'], LAYOUT, days=1, limit=10) == (other, [])
+
+
+def test_partition_range_ignores_literals_and_comments():
+    sql = ("SELECT * FROM logs WHERE log_date BETWEEN '2024/01/02' AND '2024/01/05' "
+           "AND key <> 'log_date = ''2099/01/01''' -- log_date >= '2030/01/01'")
+    assert partition_range(sql) == ('2024-01-02', '2024-01-05')
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+pytest.importorskip('botocore')
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+import query_manager  # noqa: E402
+from query_manager import QueryExecutionManager  # noqa: E402
+
+
+def _error(code):
+    return ClientError({'Error': {'Code': code, 'Message': code}}, 'StartQueryExecution')
+
+
+class FakeAthena:
+    def __init__(self, start_errors=(), poll_errors=(), states=('RUNNING', 'SUCCEEDED')):
+        self.start_errors = list(start_errors)
+        self.poll_errors = list(poll_errors)
+        self.states = list(states)
+        self.started = 0
+
+    def start_query_execution(self, **params):
+        if self.start_errors:
+            raise self.start_errors.pop(0)
+        self.started += 1
+        return {'QueryExecutionId': f"q{self.started}"}
+
+    def get_query_execution(self, QueryExecutionId):
+        if self.poll_errors:
+            raise self.poll_errors.pop(0)
+        state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+        return {'QueryExecution': {'QueryExecutionId': QueryExecutionId, 'Status': {'State': state}}}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(query_manager.time, 'sleep', sleeps.append)
+    return sleeps
+
+
+def test_start_retries_throttled_requests(no_sleep):
+    athena = FakeAthena(start_errors=[_error('TooManyRequestsException'), _error('ThrottlingException')])
+    manager = QueryExecutionManager(athena)
+    assert manager.start('SELECT 1') == 'q1'
+    assert len(no_sleep) == 2
+
+
+def test_start_gives_up_after_retries():
+    athena = FakeAthena(start_errors=[_error('ThrottlingException')] * 3)
+    manager = QueryExecutionManager(athena, start_retries=2)
+    with pytest.raises(ClientError):
+        manager.start('SELECT 1')
+    assert athena.started == 0
+
+
+def test_start_does_not_retry_other_errors(no_sleep):
+    athena = FakeAthena(start_errors=[_error('InvalidRequestException')])
+    with pytest.raises(ClientError):
+        QueryExecutionManager(athena).start('SELECT 1')
+    assert no_sleep == []
+
+
+def test_run_async_uses_wait_loop():
+    athena = FakeAthena(poll_errors=[_error('ThrottlingException')], states=('QUEUED', 'RUNNING', 'SUCCEEDED'))
+    manager = QueryExecutionManager(athena)
+    query_execution_id, status, response = asyncio.run(manager.run_async('SELECT 1'))
+    assert (query_execution_id, status) == ('q1', 'SUCCEEDED')
+    assert response['QueryExecution']['Status']['State'] == 'SUCCEEDED'
+    assert athena.states == ['SUCCEEDED']
+
+
+def test_run_async_timeout():
+    athena = FakeAthena(states=('RUNNING',))
+    manager = QueryExecutionManager(athena, timeout=0)
+    assert asyncio.run(manager.run_async('SELECT 1'))[1] == 'TIMEOUT'
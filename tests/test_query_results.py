@@ -0,0 +1,122 @@
+import io
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from query_results import _iter_lines, decode_column, iter_csv_result_batches, iter_result_pages
+
+COLUMNS = [('name', 'varchar'), ('requests', 'bigint'), ('bytes', 'decimal(10,2)'),
+           ('first_seen', 'timestamp'), ('day', 'date'), ('ok', 'boolean')]
+
+
+class StubAthena:
+    """get_query_results 페이지네이터 모의 객체 (페이지는 VarCharValue 목록의 목록)"""
+
+    def __init__(self, pages, columns=COLUMNS):
+        self.pages = pages
+        self.columns = columns
+
+    def get_paginator(self, name):
+        assert name == 'get_query_results'
+        return self
+
+    def paginate(self, QueryExecutionId, PaginationConfig):
+        metadata = {'ColumnInfo': [{'Name': name, 'Type': type_name} for name, type_name in self.columns]}
+        for rows in self.pages:
+            # None은 VarCharValue가 없는 NULL 값
+            data = [{'Data': [{} if value is None else {'VarCharValue': value} for value in row]}
+                    for row in rows]
+            yield {'ResultSet': {'ResultSetMetadata': metadata, 'Rows': data}}
+
+
+class StubS3:
+    """head_object와 Range GET만 흉내 내는 S3 모의 객체"""
+
+    def __init__(self, data):
+        self.data = data
+        self.ranges = []
+
+    def head_object(self, Bucket, Key):
+        return {'ContentLength': len(self.data)}
+
+    def get_object(self, Bucket, Key, Range):
+        self.ranges.append(Range)
+        start, end = (int(value) for value in Range[len('bytes='):].split('-'))
+        return {'Body': io.BytesIO(self.data[start:end + 1])}
+
+
+def _csv_rows(data, part_size, batch_size=100):
+    s3_client = StubS3(data)
+    names = [name for name, _ in COLUMNS[:2]]
+    types = [type_name for _, type_name in COLUMNS[:2]]
+    batches = list(iter_csv_result_batches(s3_client, 's3://results/q.csv', names, types,
+                                           batch_size=batch_size, part_size=part_size, max_workers=3))
+    return batches, s3_client
+
+
+def test_header_row_is_skipped_on_first_page_only():
+    columns = [('key', 'varchar'), ('operation', 'varchar')]
+    header = ['key', 'operation']
+    row = ['a.txt', 'REST.GET.OBJECT']
+    athena_client = StubAthena([[header, row], [header, row]], columns)
+    batches = list(iter_result_pages(athena_client, 'query-id'))
+    # 둘째 페이지의 헤더와 같은 값 행은 데이터
+    assert [batch.num_rows for batch in batches] == [1, 2]
+    assert batches[1].column('key') == ['key', 'a.txt']
+
+
+def test_typed_decoding_with_nulls():
+    header = [name for name, _ in COLUMNS]
+    rows = [
+        ['a', '12', '1234.50', '2024-01-02 03:04:05.123', '2024-01-02', 'true'],
+        [None, None, None, None, None, None],
+        ['', '', '', '', '', ''],
+        ['b', '9007199254740993', '0.10', '2024-01-02 03:04:05.123456789', '2024-02-29', 'false'],
+    ]
+    batch = next(iter_result_pages(StubAthena([[header] + rows]), 'query-id'))
+    assert batch.column('name') == ['a', None, '', 'b']
+    assert batch.column('requests') == [12, None, None, 9007199254740993]
+    assert batch.column('bytes') == [Decimal('1234.50'), None, None, Decimal('0.10')]
+    # 나노초는 마이크로초로 자름
+    assert batch.column('first_seen') == [datetime(2024, 1, 2, 3, 4, 5, 123000), None, None,
+                                          datetime(2024, 1, 2, 3, 4, 5, 123456)]
+    assert batch.column('day') == [date(2024, 1, 2), None, None, date(2024, 2, 29)]
+    assert batch.column('ok') == [True, None, None, False]
+    assert list(batch.rows())[0] == ('a', 12, Decimal('1234.50'), datetime(2024, 1, 2, 3, 4, 5, 123000),
+                                     date(2024, 1, 2), True)
+    assert decode_column(['1.5'], 'DECIMAL(38,3)') == [Decimal('1.5')]
+
+
+def test_empty_result_page():
+    batch = next(iter_result_pages(StubAthena([[[name for name, _ in COLUMNS]]]), 'query-id'))
+    assert batch.num_rows == 0
+    assert batch.column('requests') == []
+
+
+@pytest.mark.parametrize('part_size', [1, 2, 3, 5, 7, 64])
+def test_csv_parts_split_inside_multibyte_characters(part_size):
+    names = ['로그/파일-한글.txt', 'emoji-🚀.log', 'naïve']
+    data = ('"name","requests"\n' + ''.join(f'"{name}","{index}"\n' for index, name in enumerate(names))).encode()
+    batches, s3_client = _csv_rows(data, part_size, batch_size=2)
+    assert [batch.num_rows for batch in batches] == [2, 1]
+    assert [name for batch in batches for name in batch.column('name')] == names
+    assert [value for batch in batches for value in batch.column('requests')] == [0, 1, 2]
+    assert len(s3_client.ranges) == -(-len(data) // part_size)
+
+
+@pytest.mark.parametrize('part_size', [1, 4, 9, 16, 1024])
+def test_csv_parts_split_inside_quoted_newlines(part_size):
+    values = ['first line\nsecond line', 'crlf\r\ninside', 'para\u2028graph', 'ctrl\x1cchar', 'no newline at end']
+    data = '"name","requests"\r\n' + ''.join(f'"{value}","{index}"\r\n' for index, value in enumerate(values))
+    batches, _ = _csv_rows(data.rstrip('\r\n').encode(), part_size)
+    assert batches[0].column('name') == values
+    assert batches[0].column('requests') == list(range(len(values)))
+
+
+def test_iter_lines_splits_only_on_line_feed():
+    parts = ['a\u2028b\n'.encode()[:2], 'a\u2028b\n'.encode()[2:], b'c\rd\n', b'tail']
+    assert list(_iter_lines(parts)) == ['a\u2028b\n', 'c\rd\n', 'tail']
+    # 마지막 조각이 불완전한 UTF-8이면 대체 문자 없이 예외
+    with pytest.raises(UnicodeDecodeError):
+        list(_iter_lines([b'\xed\x95']))
@@ -0,0 +1,116 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+
+from rollups import ANALYSES, ROLLUPS, RollupManager, rollup_insert_sql
+
+AGGREGATE_RE = re.compile(r'^(COUNT|SUM)\(')
+
+
+def _hours(first, count):
+    start = datetime.strptime(first, '%Y-%m-%d-%H')
+    return [(start + timedelta(hours=offset)).strftime('%Y-%m-%d-%H') for offset in range(count)]
+
+
+def _split_top_level(text):
+    """괄호/문자열 밖의 쉼표로 나누기"""
+    items, depth, quoted, current = [], 0, False, ''
+    for char in text:
+        if char == "'":
+            quoted = not quoted
+        elif not quoted and char in '()':
+            depth += 1 if char == '(' else -1
+        elif not quoted and depth == 0 and char == ',':
+            items.append(current.strip())
+            current = ''
+            continue
+        current += char
+    items.append(current.strip())
+    return items
+
+
+def _group_by_matches_select(sql):
+    select = re.search(r'SELECT\s+(.*?)\s+FROM ', sql, re.S).group(1)
+    group_by = re.search(r'GROUP BY ([\d, ]+)', sql).group(1)
+    columns = _split_top_level(select)
+    expected = [position for position, column in enumerate(columns, 1) if not AGGREGATE_RE.match(column)]
+    return [int(position) for position in group_by.split(',')] == expected
+
+
+def _hour_predicate(condition):
+    def covers(hour):
+        return eval(condition, {'dt': hour[:10], 'hour': hour[11:13]})
+    return covers
+
+
+def _branches(sql):
+    """analysis_sql -> (롤업 구간 판정 함수 또는 None, 원본 구간 시작 시각 또는 None)"""
+    rollup = re.search(r'FROM db\.access_logs_hourly_\w+ WHERE (.*)', sql)
+    covers_rollup = None
+    if rollup:
+        condition = rollup.group(1).replace('"hour"', 'hour').replace(' = ', ' == ')
+        condition = compile(condition.replace(' OR ', ' or ').replace(' AND ', ' and '), '<sql>', 'eval')
+        covers_rollup = _hour_predicate(condition)
+    raw = re.search(r"FROM db\.access_logs WHERE .*?>= TIMESTAMP '(\d{4}-\d{2}-\d{2} \d{2}):00:00 UTC'", sql)
+    raw_from = raw.group(1).replace(' ', '-') if raw else None
+    assert 'FROM db.access_logs GROUP BY' in sql or raw_from
+    return covers_rollup, raw_from
+
+
+@pytest.mark.parametrize('analysis', list(ANALYSES))
+@pytest.mark.parametrize('open_from, since_hour', [
+    ('2024-01-02-05', None),
+    ('2024-01-02-00', '2024-01-01-20'),
+    ('2024-01-01-20', '2024-01-02-03'),
+    (None, '2024-01-01-12'),
+    (None, None),
+])
+def test_analysis_counts_each_hour_once(analysis, open_from, since_hour):
+    manager = RollupManager(None, 's3://logs/raw/', 's3://logs/rollups/')
+    sql = manager.analysis_sql(analysis, 'db', 'access_logs', 'access_logs', open_from, since_hour=since_hour)
+    covers_rollup, raw_from = _branches(sql)
+    assert (covers_rollup is None) == (open_from is None)
+    for hour in _hours('2024-01-01-00', 72):
+        wanted = since_hour is None or hour >= since_hour
+        from_rollup = covers_rollup is not None and covers_rollup(hour)
+        from_raw = raw_from is None or hour >= raw_from
+        # 롤업은 open_from 전까지, 원본은 open_from부터: 구간이 겹치거나 빠지지 않음
+        assert from_rollup + from_raw == wanted, hour
+        if from_rollup:
+            assert hour < open_from
+
+
+@pytest.mark.parametrize('name', list(ROLLUPS))
+def test_group_by_positions_match_select_list(name):
+    sql = rollup_insert_sql('db', 'rollup', 'raw', name, '2024-01-01-00', '2024-01-01-03', 1)
+    assert _group_by_matches_select(sql)
+
+
+@pytest.mark.parametrize('analysis', list(ANALYSES))
+def test_raw_branch_group_by_positions_match_select_list(analysis):
+    manager = RollupManager(None, 's3://logs/raw/', 's3://logs/rollups/')
+    sql = manager.analysis_sql(analysis, 'db', 'access_logs', 'access_logs', '2024-01-02-05')
+    raw_branch = sql[sql.index('UNION ALL') + len('UNION ALL'):sql.index(') AS combined')]
+    assert _group_by_matches_select(raw_branch)
+
+
+def test_open_from_falls_back_to_earliest_missing_record_hour(monkeypatch):
+    manager = RollupManager(None, 's3://logs/raw/', 's3://logs/rollups/', settle_hours=1)
+    completed = {name: set(_hours('2024-01-01-00', 6)) - {'2024-01-01-03'} for name in ROLLUPS}
+    completed['ips'].discard('2024-01-01-05')
+    for name, tracker in manager.trackers.items():
+        monkeypatch.setattr(tracker, 'completed_hours', lambda hours=completed[name]: set(hours))
+
+    # 모든 롤업에서 완료된 마지막 시간(04시) 다음부터
+    assert manager.open_from() == '2024-01-01-05'
+    assert manager.open_from(['status', 'keys']) == '2024-01-01-06'
+    # 03시에 레코드가 있을 수 있는 객체(04시 전송)가 있으면 03시부터 원본에서 읽음
+    raw_objects = {'2024-01-01-04': ['raw/2024-01-01-04-10-00-AAAA']}
+    assert manager.open_from(['status', 'keys'], raw_objects) == '2024-01-01-03'
+    # 누락 시간이 열린 구간 뒤이면 열린 구간 시작 유지
+    assert manager.open_from(raw_objects={'2024-01-01-09': ['raw/2024-01-01-09-00-00-AAAA']}) == '2024-01-01-05'
+
+    for tracker in manager.trackers.values():
+        monkeypatch.setattr(tracker, 'completed_hours', set)
+    assert manager.open_from(raw_objects=raw_objects) is None
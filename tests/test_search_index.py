@@ -0,0 +1,135 @@
+import io
+import random
+from datetime import datetime
+
+import pytest
+
+pytest.importorskip('botocore')
+
+from generate_traffic import LogLineGenerator  # noqa: E402
+from log_parser import parse_text, sortable_datetime  # noqa: E402
+from search_index import (  # noqa: E402
+    INDEX_SUFFIX, BloomFilter, ObjectIndex, SearchIndexBuilder, SearchIndexCache, bloom_positions,
+    matching_rows,
+)
+
+
+class StubS3:
+    """list_objects_v2(StartAfter)/get_object/put_object만 흉내 내는 S3 모의 객체"""
+
+    def __init__(self, objects=None):
+        self.objects = dict(objects or {})
+        self.listings = []
+
+    def get_paginator(self, name):
+        assert name == 'list_objects_v2'
+        return self
+
+    def paginate(self, Bucket, Prefix, StartAfter=None):
+        keys = sorted(key for (bucket, key) in self.objects
+                      if bucket == Bucket and key.startswith(Prefix) and key > (StartAfter or ''))
+        self.listings.append((Prefix, StartAfter, len(keys)))
+        yield {'Contents': [{'Key': key, 'Size': len(self.objects[Bucket, key]), 'ETag': '"etag"'}
+                            for key in keys]}
+
+    def get_object(self, Bucket, Key, Range=None):
+        data = self.objects[Bucket, Key]
+        return {'Body': io.BytesIO(data), 'ContentLength': len(data)}
+
+    def put_object(self, Bucket, Key, Body):
+        self.objects[Bucket, Key] = Body
+
+
+def _batch(lines, hour=0, seed=0):
+    generator = LogLineGenerator(rate=1, seed=seed, start=datetime(2024, 1, 1, hour))
+    return parse_text(''.join(generator.lines(lines)))
+
+
+def _index(key, batch):
+    return ObjectIndex('logs', key, 100, 'etag').update(batch).finish()
+
+
+def test_bloom_filter_has_no_false_negatives_and_near_target_rate():
+    rng = random.Random(1)
+    values = [f"value-{rng.getrandbits(64):x}" for _ in range(2000)]
+    bloom = BloomFilter.for_capacity(len(values), 0.01)
+    for value in values:
+        bloom.add(value)
+    assert all(value in bloom for value in values)
+    others = [f"other-{index}" for index in range(20000)]
+    measured = sum(value in bloom for value in others) / len(others)
+    # 비트 수를 2의 거듭제곱으로 올리므로 목표 이하, 예상 비율 근처
+    assert measured <= 0.01 * 1.5
+    assert measured == pytest.approx(bloom.false_positive_rate(len(values)), abs=0.005)
+
+
+def test_bloom_positions_are_distinct_and_in_range():
+    for value_hash in (0, 1, 2 ** 64 - 1, 0x123456789ABCDEF0):
+        positions = bloom_positions(value_hash, 512, 7)
+        assert len(set(positions)) == 7
+        assert all(0 <= position < 512 for position in positions)
+
+
+def test_object_index_round_trip():
+    batch = _batch(500)
+    index = _index('logs/2024-01-01-00-10-00-AAAA', batch)
+    restored = ObjectIndex.from_bytes(index.to_bytes())
+    assert (restored.key, restored.size, restored.etag, restored.rows) == (index.key, 100, 'etag', 500)
+    times = sorted(sortable_datetime(value) for value in batch.columns['requestdatetime'])
+    assert (restored.first_time, restored.last_time) == (times[0], times[-1])
+    for name, bloom in index.filters.items():
+        assert bytes(restored.filters[name].bits) == bytes(bloom.bits)
+    assert all(value in restored.filters['requestid'] for value in batch.columns['requestid'])
+
+
+def test_candidates_prune_by_time_range_and_bloom_filter():
+    cache = SearchIndexCache(':memory:')
+    batches = {f"app/2024-01-01-{hour:02d}-10-00-AAAA": _batch(200, hour, seed=hour) for hour in range(3)}
+    for key, batch in batches.items():
+        cache.add(_index(key, batch))
+    cache.add(_index('other/2024-01-01-00-10-00-AAAA', _batch(10)))
+    cache.add(ObjectIndex('logs', 'app/2024-01-01-05-00-00-EMPTY').finish())
+
+    keys = list(batches)
+    requestid = batches[keys[1]].columns['requestid'][7]
+    objects, stats = cache.candidates('logs', 'app/', {'requestid': requestid})
+    assert [key for key, _ in objects] == [keys[1]]
+    assert stats == {'objects': 4, 'in_time_range': 3, 'candidates': 1}
+
+    objects, stats = cache.candidates('logs', 'app/', start='2024-01-01 01:00:00', end='2024-01-01 01:59:59')
+    assert [key for key, _ in objects] == [keys[1]]
+    # 시간 범위 밖이면 Bloom 필터가 일치해도 제외
+    assert cache.candidates('logs', 'app/', {'requestid': requestid}, start='2024-01-01 02:00:00')[0] == []
+    with pytest.raises(ValueError):
+        cache.candidates('logs', 'app/', {'httpstatus': '200'})
+
+
+def test_matching_rows():
+    batch = _batch(100)
+    row = 42
+    criteria = {'requestid': batch.columns['requestid'][row], 'key': batch.columns['key'][row]}
+    assert matching_rows(batch, criteria) == [row]
+    when = sortable_datetime(batch.columns['requestdatetime'][row])
+    assert row in matching_rows(batch, {}, when, when)
+    assert matching_rows(batch, criteria, start='2025-01-01 00:00:00') == []
+
+
+def test_builder_lists_only_after_the_watermark():
+    lines = ''.join(LogLineGenerator(seed=5).lines(20)).encode()
+    s3_client = StubS3({('logs', f"raw/2024-01-01-{hour:02d}-00-00-AAAA"): lines for hour in range(6)})
+    cache = SearchIndexCache(':memory:', lookback_minutes=15)
+    builder = SearchIndexBuilder(s3_client, 's3://logs/raw/', 's3://logs/index/', cache=cache, max_workers=2)
+
+    assert len(builder.build(max_objects=4)) == 4
+    assert cache.watermark('s3://logs/raw/') == 'raw/2024-01-01-03-00-00-AAAA'
+    assert builder.build() == ['raw/2024-01-01-04-00-00-AAAA', 'raw/2024-01-01-05-00-00-AAAA']
+
+    s3_client.objects['logs', 'raw/2024-01-01-06-00-00-AAAA'] = lines
+    s3_client.listings.clear()
+    assert builder.build() == ['raw/2024-01-01-06-00-00-AAAA']
+    # 원본과 인덱스 모두 워터마크(15분 앞당김) 이후만 목록 조회
+    assert s3_client.listings == [
+        ('index/', 'index/2024-01-01-04-45-00', 1),
+        ('raw/', 'raw/2024-01-01-04-45-00', 2),
+    ]
+    assert ('logs', f"index/2024-01-01-06-00-00-AAAA{INDEX_SUFFIX}") in s3_client.objects
@@ -0,0 +1,142 @@
+import io
+import random
+from datetime import datetime
+
+import pytest
+
+from generate_traffic import LogLineGenerator
+from log_parser import parse_text
+from sketches import SKETCH_NAME, HeavyHitters, HyperLogLog, LogSketch, SketchBuilder, TDigest
+
+
+class StubS3:
+    """list_objects_v2(StartAfter)/get_object만 흉내 내는 S3 모의 객체"""
+
+    def __init__(self, objects):
+        self.objects = objects
+        self.fetched = []
+
+    def get_paginator(self, name):
+        assert name == 'list_objects_v2'
+        return self
+
+    def paginate(self, Bucket, Prefix, StartAfter=None):
+        keys = sorted(key for (bucket, key) in self.objects
+                      if bucket == Bucket and key.startswith(Prefix) and key > (StartAfter or ''))
+        yield {'Contents': [{'Key': key, 'Size': len(self.objects[Bucket, key])} for key in keys]}
+
+    def get_object(self, Bucket, Key):
+        self.fetched.append(Key)
+        return {'Body': io.BytesIO(self.objects[Bucket, Key])}
+
+
+def _parts(values, parts):
+    step = -(-len(values) // parts)
+    return [values[start:start + step] for start in range(0, len(values), step)]
+
+
+def _batch(lines, hour, seed):
+    generator = LogLineGenerator(rate=1, seed=seed, start=datetime(2024, 1, 1, hour))
+    return parse_text(''.join(generator.lines(lines)))
+
+
+def test_hll_merge_equals_single_build():
+    rng = random.Random(1)
+    values = [f"10.0.{rng.randrange(256)}.{rng.randrange(256)}" for _ in range(30000)]
+    single = HyperLogLog()
+    single.add_many(values)
+    merged = HyperLogLog()
+    for part in _parts(values, 7):
+        sketch = HyperLogLog()
+        sketch.add_many(part)
+        merged.merge(sketch)
+    assert merged.registers == single.registers
+    exact = len(set(values))
+    assert merged.count() == pytest.approx(exact, rel=3 * merged.relative_error())
+    with pytest.raises(ValueError):
+        merged.merge(HyperLogLog(precision=10))
+
+
+def test_heavy_hitters_merge_equals_single_build():
+    rng = random.Random(2)
+    keys = [f"key{int(rng.paretovariate(1.1))}" for _ in range(20000)]
+    single = HeavyHitters(capacity=50)
+    single.add_many(keys)
+    merged = HeavyHitters(capacity=50)
+    for part in _parts(keys, 5):
+        sketch = HeavyHitters(capacity=50)
+        sketch.add_many(part)
+        merged.merge(sketch)
+    assert [list(counters) for counters in merged.counters] == [list(counters) for counters in single.counters]
+    assert merged.total == single.total == len(keys)
+    # 카운터가 같으므로 추정 횟수도 같고, 실제 횟수 이상
+    assert merged.top(10) == single.top(10)
+    exact = {key: keys.count(key) for key, _ in merged.top(10)}
+    assert all(estimate >= exact[key] for key, estimate in merged.top(10))
+
+
+def test_tdigest_merge_is_close_to_single_build():
+    rng = random.Random(3)
+    values = [rng.lognormvariate(3, 1) for _ in range(50000)]
+    single = TDigest()
+    single.add_many(values)
+    merged = TDigest()
+    for part in _parts(values, 24):
+        sketch = TDigest()
+        sketch.add_many(part)
+        merged.merge(sketch)
+    assert merged.count == single.count == len(values)
+    assert (merged.min, merged.max) == (min(values), max(values))
+    ordered = sorted(values)
+    for q in (0.5, 0.9, 0.99):
+        # 병합 결과와 단일 생성 결과 모두 순위 오차 1% 이내
+        for digest in (merged, single):
+            rank = sum(1 for value in ordered if value <= digest.quantile(q)) / len(ordered)
+            assert rank == pytest.approx(q, abs=0.01)
+
+
+def test_sketch_round_trips():
+    rng = random.Random(4)
+    hll = HyperLogLog()
+    hll.add_many([str(rng.getrandbits(32)) for _ in range(1000)])
+    assert HyperLogLog.from_dict(hll.to_dict()).registers == hll.registers
+
+    hitters = HeavyHitters(capacity=10)
+    hitters.add_many([f"key{rng.randrange(50)}" for _ in range(1000)])
+    restored = HeavyHitters.from_dict(hitters.to_dict())
+    assert restored.counters == hitters.counters
+    assert (restored.total, restored.top(10)) == (hitters.total, hitters.top(10))
+
+    digest = TDigest()
+    digest.add_many([rng.random() for _ in range(5000)])
+    restored = TDigest.from_dict(digest.to_dict())
+    assert restored.quantile(0.9) == digest.quantile(0.9)
+    assert (restored.count, restored.min, restored.max) == (digest.count, digest.min, digest.max)
+    # 빈 t-digest는 min/max 없이 저장
+    assert TDigest.from_dict(TDigest().to_dict()).quantile(0.5) is None
+
+    sketch = LogSketch().update(_batch(300, 0, seed=5))
+    restored = LogSketch.from_bytes(sketch.to_bytes())
+    assert restored.summary() == sketch.summary()
+
+
+def test_builder_load_merges_hourly_files_in_range():
+    hours = ['2024-01-01-22', '2024-01-01-23', '2024-01-02-00', '2024-01-02-01']
+    sketches = {hour: LogSketch().update(_batch(200, int(hour[-2:]), seed=index))
+                for index, hour in enumerate(hours)}
+    objects = {('logs', f"sketches/dt={hour[:10]}/hour={hour[11:]}/{SKETCH_NAME}"): sketch.to_bytes()
+               for hour, sketch in sketches.items()}
+    objects['logs', 'sketches/dt=2024-01-01/hour=23/_COMPACTED'] = b''
+    s3_client = StubS3(objects)
+    builder = SketchBuilder(s3_client, 's3://logs/raw/', 's3://logs/sketches/')
+
+    loaded = builder.load('2024-01-01-23', '2024-01-02-00', max_workers=2)
+    assert sorted(s3_client.fetched) == [
+        f"sketches/dt=2024-01-01/hour=23/{SKETCH_NAME}",
+        f"sketches/dt=2024-01-02/hour=00/{SKETCH_NAME}",
+    ]
+    expected = LogSketch().merge(sketches['2024-01-01-23']).merge(sketches['2024-01-02-00'])
+    assert loaded.rows == 400
+    assert loaded.remoteip.registers == expected.remoteip.registers
+    assert loaded.summary() == expected.summary()
+    assert builder.load('2024-01-03-00', '2024-01-03-23').rows == 0